@@ -0,0 +1,240 @@
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+from bloom_filter import BloomFilter
+from generate_mock_data import draw_unionid, generate_customer_row, generate_customer_rows_batch, generate_wechat_nickname
+from customer_columns import generate_customer_columns
+from nickname_sampler import NICKNAMES
+import generate_service_order_data
+from mock_loader import SqlFileSink, ensure_sqlite_table
+from mock_schema import CUSTOMER_COLUMNS, CUSTOMER_TABLE, ORDER_COLUMNS, ORDER_TABLE, STORE_IDS
+from order_rollups import ROLLUP_TABLES, OrderRollups
+from sql_encoder import encode_sql_values, encode_tsv_lines, sql_literal
+from order_ids import make_order_id
+
+# Compare rows/sec of the per-row customer loop against the batched column path
+
+BATCH_SIZE = 1000
+
+# Function to time a callable over num_records rows and return rows/sec
+def rows_per_second(generate_batch, num_records):
+    started = time.perf_counter()
+    for i in range(0, num_records, BATCH_SIZE):
+        generate_batch(i, min(BATCH_SIZE, num_records - i))
+    return num_records / (time.perf_counter() - started)
+
+# Function to print rows/sec for each customer generation path
+def bench_customers(num_records, seed):
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+
+    results = {
+        'per-row loop': rows_per_second(
+            lambda i, n: [generate_customer_row(j) for j in range(i, i + n)], num_records),
+        'batched rows': rows_per_second(
+            lambda i, n: generate_customer_rows_batch(i, n, rng), num_records),
+        'batched columns only': rows_per_second(
+            lambda i, n: generate_customer_columns(i, n, rng), num_records),
+    }
+    baseline = results['per-row loop']
+    for name, rate in results.items():
+        print(f"{name:<22} {rate:>12,.0f} rows/sec  {rate / baseline:5.1f}x")
+
+# Function to print nicknames/sec of generate_wechat_nickname against the compiled batch sampler
+def bench_nicknames(num_records, seed):
+    random.seed(seed)
+    rng = np.random.default_rng(seed)
+    genders = NICKNAMES.draw_genders(rng, num_records).tolist()
+
+    results = {
+        'per-call nicknames': rows_per_second(
+            lambda i, n: [generate_wechat_nickname(gender) for gender in genders[i:i + n]], num_records),
+        'compiled batch': rows_per_second(
+            lambda i, n: NICKNAMES.nicknames(genders[i:i + n], rng), num_records),
+    }
+    baseline = results['per-call nicknames']
+    for name, rate in results.items():
+        print(f"{name:<22} {rate:>12,.0f} names/sec {rate / baseline:5.1f}x")
+
+# Function to print MB/s of the row-at-a-time literal formatting against the column encoders
+# (the round trip through every file sink is checked by tests/test_sinks.py)
+def bench_encoder(num_records, seed):
+    rows = generate_customer_rows_batch(0, num_records, np.random.default_rng(seed))
+    size_mb = len(encode_sql_values(rows).encode('utf-8')) / 1e6
+
+    def mb_per_second(encode):
+        started = time.perf_counter()
+        for i in range(0, num_records, BATCH_SIZE):
+            encode(rows[i:i + BATCH_SIZE])
+        return size_mb / (time.perf_counter() - started)
+
+    results = {
+        'per-row literals': mb_per_second(
+            lambda batch: ",\n".join("(" + ", ".join(map(sql_literal, row)) + ")" for row in batch)),
+        'sql encoder': mb_per_second(encode_sql_values),
+        'tsv encoder': mb_per_second(encode_tsv_lines),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        for name, path in (('sql file', 'bench.sql'), ('sql.gz file', 'bench.sql.gz')):
+            started = time.perf_counter()
+            with SqlFileSink(os.path.join(directory, path), CUSTOMER_TABLE, CUSTOMER_COLUMNS) as sink:
+                for i in range(0, num_records, BATCH_SIZE):
+                    sink.write_batch(rows[i:i + BATCH_SIZE])
+            results[name] = size_mb / (time.perf_counter() - started)
+    baseline = results['per-row literals']
+    for name, rate in results.items():
+        print(f"{name:<22} {rate:>12,.1f} MB/sec    {rate / baseline:5.1f}x")
+
+# Function to allocate num_ids order_ids, check they are all distinct and print ids/sec.
+# All ids share a handful of create_time seconds, the worst case for the old scheme.
+def bench_order_ids(num_ids, seed):
+    rng = random.Random(seed)
+    stores = [rng.choice(STORE_IDS) for _ in range(1000)]
+    create_times = [f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 00:00:00" for _ in range(1000)]
+
+    started = time.perf_counter()
+    order_ids = [make_order_id(stores[j % 1000], create_times[j % 997], 10000 + j) for j in range(num_ids)]
+    elapsed = time.perf_counter() - started
+
+    distinct = len(set(order_ids))
+    print(f"{'order ids':<22} {num_ids / elapsed:>12,.0f} ids/sec   {distinct:,} distinct of {num_ids:,}")
+    if distinct != num_ids:
+        raise SystemExit('duplicate order_id generated')
+
+# Dashboard reads as (name, query over the raw orders, same query over the rollup tables).
+# The first three return whole rollup tables, so they check every rollup row.
+ROLLUP_QUERIES = [
+    ('daily_store_revenue',
+     "SELECT substr(create_time, 1, 10), sotre_id, room_id, COUNT(*), SUM(ROUND(order_amount * 100)) "
+     "FROM app_service_order WHERE deleted = 0 GROUP BY 1, 2, 3 ORDER BY 1, 2, 3",
+     "SELECT day, sotre_id, room_id, orders, ROUND(revenue * 100) FROM daily_store_revenue ORDER BY 1, 2, 3"),
+    ('hourly_busy',
+     "SELECT substr(create_time, 1, 10), CAST(substr(create_time, 12, 2) AS INTEGER), COUNT(*) "
+     "FROM app_service_order WHERE deleted = 0 GROUP BY 1, 2 ORDER BY 1, 2",
+     "SELECT day, hour, orders FROM hourly_busy ORDER BY 1, 2"),
+    ('customer_month_active_days',
+     "SELECT unionid, substr(create_time, 1, 7), COUNT(DISTINCT substr(create_time, 1, 10)) "
+     "FROM app_service_order WHERE deleted = 0 GROUP BY 1, 2 ORDER BY 1, 2",
+     "SELECT unionid, month, active_days FROM customer_month_active_days ORDER BY 1, 2"),
+    ('revenueTrend',
+     "SELECT substr(create_time, 1, 10), COUNT(*), SUM(ROUND(order_amount * 100)) "
+     "FROM app_service_order WHERE deleted = 0 GROUP BY 1 ORDER BY 1",
+     "SELECT day, SUM(orders), SUM(ROUND(revenue * 100)) FROM daily_store_revenue GROUP BY 1 ORDER BY 1"),
+    ('busyHours',
+     "SELECT strftime('%w', create_time), CAST(substr(create_time, 12, 2) AS INTEGER), COUNT(*) "
+     "FROM app_service_order WHERE deleted = 0 GROUP BY 1, 2 ORDER BY 1, 2",
+     "SELECT strftime('%w', day), hour, SUM(orders) FROM hourly_busy GROUP BY 1, 2 ORDER BY 1, 2"),
+    ('serviceDistribution',
+     "SELECT room_id, COUNT(*), SUM(ROUND(order_amount * 100)) FROM app_service_order WHERE deleted = 0 "
+     "GROUP BY 1 ORDER BY 1",
+     "SELECT room_id, SUM(orders), SUM(ROUND(revenue * 100)) FROM daily_store_revenue GROUP BY 1 ORDER BY 1"),
+    ('frequentUsers',
+     "SELECT COUNT(DISTINCT unionid) FROM (SELECT unionid, COUNT(DISTINCT substr(create_time, 1, 10)) AS days "
+     "FROM app_service_order WHERE deleted = 0 GROUP BY unionid, substr(create_time, 1, 7)) WHERE days >= 4",
+     "SELECT COUNT(DISTINCT unionid) FROM customer_month_active_days WHERE active_days >= 4"),
+]
+
+# Function to generate num_records seasonal orders into SQLite while keeping the rollups,
+# check every dashboard read over the rollup tables returns exactly what the raw GROUP BY
+# does, and print how long each read takes both ways
+def bench_rollups(num_records, seed):
+    args = argparse.Namespace(arrivals='seasonal', room_capacity=0)
+    random.seed(seed)
+    unionids = generate_service_order_data.get_unionids_from_db()
+    generate_service_order_data.init_order_worker(
+        unionids, generate_service_order_data.build_arrival_plan(args, num_records, seed))
+    connection = sqlite3.connect(':memory:')
+    ensure_sqlite_table(connection, ORDER_TABLE, ORDER_COLUMNS)
+    insert = f"INSERT INTO {ORDER_TABLE} VALUES ({', '.join('?' * len(ORDER_COLUMNS))})"
+
+    rollups = OrderRollups()
+    maintained = 0.0
+    for start in range(0, num_records, 10000):
+        rows = generate_service_order_data.generate_order_chunk((seed, start // 10000, 0, min(10000, num_records - start)))
+        connection.executemany(insert, rows)
+        started = time.perf_counter()
+        rollups.add_rows(ORDER_TABLE, rows)
+        maintained += time.perf_counter() - started
+    for table, rows in rollups.tables().items():
+        columns = ROLLUP_TABLES[table][0]
+        ensure_sqlite_table(connection, table, columns)
+        connection.executemany(f"INSERT INTO {table} VALUES ({', '.join('?' * len(columns))})", rows)
+    print(f"{'rollup upkeep':<22} {num_records / maintained:>12,.0f} rows/sec")
+
+    for name, raw_query, rollup_query in ROLLUP_QUERIES:
+        started = time.perf_counter()
+        expected = connection.execute(raw_query).fetchall()
+        raw_seconds = time.perf_counter() - started
+        started = time.perf_counter()
+        actual = connection.execute(rollup_query).fetchall()
+        rollup_seconds = time.perf_counter() - started
+        if actual != expected:
+            raise SystemExit(f"{name} from the rollups differs from the raw orders")
+        print(f"{name:<27} {raw_seconds * 1000:>9.1f}ms raw {rollup_seconds * 1000:>8.1f}ms rollups "
+              f"{raw_seconds / rollup_seconds:7.1f}x")
+
+# False positive rates the uniqueness guard benchmark sizes its filters for
+GUARD_FP_RATES = (1e-3, 1e-4, 1e-6)
+
+# Function to fill Bloom filters sized for num_keys unionids at each target rate, count the false
+# positives among num_keys unionids never added (the rate at capacity) and among the keys while
+# they were added (what a generating run sees), and print keys/sec and memory per million keys
+# next to a Python set of the same strings
+def bench_uniqueness(num_keys, seed):
+    rng = random.Random(seed)
+    keys = [draw_unionid(rng) for _ in range(num_keys)]
+    fresh = [draw_unionid(rng) for _ in range(num_keys)]
+    per_million = 1e6 / num_keys
+
+    tracemalloc.start()
+    seen = set(keys)
+    set_bytes = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    set_bytes += sum(map(sys.getsizeof, keys))
+    print(f"{'python set':<22} {set_bytes * per_million / 1e6:>8.1f} MB per million keys")
+    del seen
+
+    for fp_rate in GUARD_FP_RATES:
+        bloom = BloomFilter(num_keys, fp_rate)
+        started = time.perf_counter()
+        repeats = sum(int((~bloom.add_new(keys[i:i + 10000])).sum()) for i in range(0, num_keys, 10000))
+        added = time.perf_counter() - started
+        started = time.perf_counter()
+        false_positives = sum(int(bloom.contains(fresh[i:i + 10000]).sum()) for i in range(0, num_keys, 10000))
+        checked = time.perf_counter() - started
+        if not all(bloom.contains(keys[i:i + 10000]).all() for i in range(0, num_keys, 10000)):
+            raise SystemExit('an added unionid was not found')
+        print(f"bloom fp {fp_rate:<13.0e} {bloom.bits.nbytes * per_million / 1e6:>8.1f} MB per million keys  "
+              f"k={bloom.k:<3} fp rate {false_positives / num_keys:.1e} ({false_positives:,} of {num_keys:,}, "
+              f"{repeats:,} while adding)  "
+              f"{num_keys / added:>10,.0f} adds/sec {num_keys / checked:>10,.0f} checks/sec")
+
+BENCHMARKS = {
+    'customers': lambda args: bench_customers(args.records, args.seed),
+    'nicknames': lambda args: bench_nicknames(args.records, args.seed),
+    'encoder': lambda args: bench_encoder(args.records, args.seed),
+    'order-ids': lambda args: bench_order_ids(args.order_ids, args.seed),
+    'rollups': lambda args: bench_rollups(args.records, args.seed),
+    'uniqueness': lambda args: bench_uniqueness(args.guard_keys, args.seed),
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the mock data generators')
+    parser.add_argument('benchmarks', nargs='*', help=f"benchmarks to run (default: all of {', '.join(BENCHMARKS)})")
+    parser.add_argument('--records', type=int, default=100000)
+    parser.add_argument('--order-ids', type=int, default=10000000, help='number of order_ids for the uniqueness check')
+    parser.add_argument('--guard-keys', type=int, default=1000000,
+                        help='number of keys for the uniqueness guard benchmark')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    for name in args.benchmarks or BENCHMARKS:
+        BENCHMARKS[name](args)
@@ -0,0 +1,119 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+
+# End-to-end throughput benchmark of the generators.
+# Every case runs the generator script with a fixed --seed at each scale point in
+# its own process (so peak RSS is per run) with --profile, and the profile reports
+# are collected into one JSON file. --compare checks rows/sec against an earlier
+# results file and exits with status 1 when a case got slower than --tolerance allows.
+# --rss-limit does the same for a run whose peak RSS went over the limit; generation
+# streams through bounded queues (mock_pipeline.py), so peak RSS should not grow with
+# the scale, e.g.
+#   python benchmark_suite.py orders --sink null --scales 1000000 50000000 --rss-limit 150
+
+SEED = 20240101
+SCALES = (10000, 100000, 1000000)
+DEFAULT_OUTPUT = 'benchmark_results.json'
+
+# Allowed rows/sec drop against the baseline before a case counts as a regression
+TOLERANCE = 0.15
+
+# Frequent users get 4-7 order days of 1-3 orders each, 11 orders on average
+ORDERS_PER_FREQUENT_USER = 11
+
+# Case name -> generator arguments for a scale of `rows` rows
+CASES = {
+    'customers': lambda rows: ['generate_mock_data.py', '--records', str(rows)],
+    'customers-batched': lambda rows: ['generate_mock_data.py', '--batched', '--records', str(rows)],
+    'orders': lambda rows: ['generate_service_order_data.py', '--records', str(rows)],
+    'frequent-orders': lambda rows: ['generate_frequent_orders.py',
+                                     '--users', str(max(rows // ORDERS_PER_FREQUENT_USER, 1))],
+}
+
+# Function to return the commit the benchmark ran on, if this is a git checkout
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Function to run one case at one scale and return its profile report
+def run_case(case, rows, args, directory):
+    script, *options = CASES[case](rows)
+    profile = os.path.join(directory, 'profile.json')
+    output = os.path.join(directory, 'bench.sql')
+    command = [sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), script), *options,
+               '--seed', str(args.seed), '--workers', str(args.workers), '--sink', args.sink,
+               '--output', output, '--profile', profile]
+    subprocess.run(command, cwd=directory, check=True, stdout=subprocess.DEVNULL)
+    with open(profile, encoding='utf-8') as f:
+        report = json.load(f)
+    for name in os.listdir(directory):
+        os.remove(os.path.join(directory, name))
+    return dict(report, case=case, scale=rows)
+
+# Function to print the rows/sec of results against baseline and return the regressed (case, scale) pairs
+def compare(results, baseline, tolerance):
+    previous = {(result['case'], result['scale']): result['rows_per_sec'] for result in baseline['results']}
+    regressions = []
+    for result in results:
+        key = (result['case'], result['scale'])
+        if key not in previous:
+            continue
+        ratio = result['rows_per_sec'] / previous[key]
+        flag = ''
+        if ratio < 1 - tolerance:
+            regressions.append(key)
+            flag = '  REGRESSION'
+        print(f"{key[0]:<18} {key[1]:>10,} {previous[key]:>12,.0f} -> {result['rows_per_sec']:>12,.0f} rows/sec "
+              f"{ratio:6.2f}x{flag}")
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark generator throughput at fixed seeds and scale points')
+    parser.add_argument('cases', nargs='*', help=f"cases to run (default: all of {', '.join(CASES)})")
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES, help='rows per run, e.g. 10000 10000000')
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--sink', choices=['sql', 'tsv', 'null'], default='sql')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT, help='JSON file for the results')
+    parser.add_argument('--compare', help='results file of an earlier run to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='allowed rows/sec drop against --compare, as a fraction')
+    parser.add_argument('--rss-limit', type=float, help='peak RSS in MB no run may go over')
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for case in args.cases or CASES:
+            for rows in args.scales:
+                result = run_case(case, rows, args, directory)
+                results.append(result)
+                stages = ', '.join(f"{stage} {totals['share']:.0%}" for stage, totals in result['stages'].items())
+                print(f"{case:<18} {rows:>10,} {result['rows_per_sec']:>12,.0f} rows/sec "
+                      f"{result['peak_rss_mb']:>7.0f} MB  {stages}")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({'commit': git_commit(), 'python': platform.python_version(), 'platform': platform.platform(),
+                   'cpu_count': os.cpu_count(), 'seed': args.seed, 'workers': args.workers, 'sink': args.sink,
+                   'results': results}, f, indent=2)
+
+    if args.rss_limit:
+        over = [result for result in results if result['peak_rss_mb'] > args.rss_limit]
+        for result in over:
+            print(f"{result['case']:<18} {result['scale']:>10,} peak RSS {result['peak_rss_mb']:.0f} MB "
+                  f"over the {args.rss_limit:.0f} MB limit")
+        if over:
+            raise SystemExit(f"{len(over)} run(s) over the RSS limit")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            raise SystemExit(f"{len(regressions)} case(s) slower than {args.tolerance:.0%} below the baseline")
@@ -0,0 +1,89 @@
+import json
+import math
+import os
+
+import numpy as np
+
+# Bloom filter over str keys, checked and updated a batch at a time (see uniqueness_guard.py).
+# A key is hashed to k of m bits by double hashing two 64-bit hashes of its UTF-8 bytes;
+# adding it sets them, so a key whose bits are all set has probably been added.
+# Sized for `capacity` keys at a false positive rate p: m = -capacity ln p / ln(2)^2
+# bits and k = m / capacity ln 2 hashes, i.e. 28.8 bits and k = 20 per key at 1e-6.
+
+# Seeds of the two hashes combined into the k bit positions (double hashing)
+HASH_SEEDS = (np.uint64(0x9e3779b97f4a7c15), np.uint64(0xc2b2ae3d27d4eb4f))
+
+POPCOUNT = np.array([bin(byte).count('1') for byte in range(256)], dtype=np.uint8)
+
+# Function to mix uint64 values (splitmix64 finalizer); arrays wrap around on overflow
+def mix(x):
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xbf58476d1ce4e5b9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94d049bb133111eb)
+    return x ^ (x >> np.uint64(31))
+
+# Function to hash a list of str keys to two uint64 arrays
+def key_hashes(keys):
+    encoded = [key.encode('utf-8') for key in keys]
+    width = max(8, -(-max(map(len, encoded), default=0) // 8) * 8)
+    words = np.array(encoded, dtype=f"S{width}").view('<u8').reshape(len(encoded), width // 8)
+    hashes = []
+    for seed in HASH_SEEDS:
+        h = np.full(len(encoded), seed, dtype=np.uint64)
+        for column in words.T:
+            h = mix(h ^ column)
+        hashes.append(h)
+    return hashes
+
+class BloomFilter:
+    def __init__(self, capacity, fp_rate, bits=None, count=0):
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.m = math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2)
+        self.k = max(1, round(self.m / capacity * math.log(2)))
+        self.bits = np.zeros(-(-self.m // 8), dtype=np.uint8) if bits is None else bits
+        self.count = count
+
+    # Function to return the (len(keys), k) bit positions of keys
+    def positions(self, keys):
+        h1, h2 = key_hashes(keys)
+        steps = np.arange(self.k, dtype=np.uint64)
+        return (h1[:, None] + steps * (h2 | np.uint64(1))[:, None]) % np.uint64(self.m)
+
+    # Function to tell for every key whether it was (probably) added before
+    def contains(self, keys):
+        if not keys:
+            return np.zeros(0, dtype=bool)
+        positions = self.positions(keys)
+        set_bits = (self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return set_bits.all(axis=1)
+
+    # Function to add keys and return a mask of the ones not seen before, in the filter or earlier in keys
+    def add_new(self, keys):
+        new = ~self.contains(keys)
+        seen = set()
+        new &= np.array([not (key in seen or seen.add(key)) for key in keys], dtype=bool)
+        positions = self.positions(keys).ravel()
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3),
+                         (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+        self.count += int(new.sum())
+        return new
+
+    # Function to estimate the false positive rate from the share of bits set
+    def estimated_fp_rate(self):
+        filled = POPCOUNT[self.bits].sum(dtype=np.int64) / self.m
+        return float(filled ** self.k)
+
+# Function to write named filters to one .npz file, replacing it in one step
+def save_filters(path, filters):
+    meta = {name: {'capacity': bloom.capacity, 'fp_rate': bloom.fp_rate, 'count': bloom.count}
+            for name, bloom in filters.items()}
+    temp_path = path + '.tmp.npz'
+    np.savez(temp_path, meta=np.array(json.dumps(meta)), **{name: bloom.bits for name, bloom in filters.items()})
+    os.replace(temp_path, path)
+
+# Function to read the filters written by save_filters
+def load_filters(path):
+    with np.load(path) as data:
+        meta = json.loads(str(data['meta']))
+        return {name: BloomFilter(info['capacity'], info['fp_rate'], data[name], info['count'])
+                for name, info in meta.items()}
@@ -0,0 +1,83 @@
+import numpy as np
+
+from nickname_sampler import NICKNAMES
+
+# Vectorized column generation for app_customer_info.
+# Every column for a batch, names included (nickname_sampler.py), is drawn in a
+# handful of numpy calls instead of one random call per field per row; the
+# distributions match generate_mock_data.py.
+
+# Birthdate windows - women tend to be younger in the dataset
+FEMALE_BIRTH_START = np.datetime64('1980-01-01')
+FEMALE_BIRTH_DAYS = (np.datetime64('2005-12-31') - FEMALE_BIRTH_START).astype(int)
+OTHER_BIRTH_START = np.datetime64('1960-01-01')
+OTHER_BIRTH_DAYS = (np.datetime64('2000-12-31') - OTHER_BIRTH_START).astype(int)
+
+# Default create_time/update_time window
+CREATE_START = '2022-01-01'
+CREATE_END = '2023-12-31'
+
+# Second digit of the phone number and the 8-digit suffix range
+PHONE_SECOND_DIGITS = np.array([3, 4, 5, 6, 7, 8, 9], dtype=np.int64)
+PHONE_SUFFIX_LOW = 10000000
+PHONE_SUFFIX_HIGH = 99999999
+
+# Function to generate count random 24-char hex ids (same shape as uuid4().hex[:24])
+def random_hex_ids(rng, count, prefix):
+    hex_digits = rng.bytes(12 * count).hex()
+    return [prefix + hex_digits[k:k + 24] for k in range(0, 24 * count, 24)]
+
+# Function to format datetime64[D] values, replacing missing ones with ''
+def format_dates(days, present):
+    formatted = np.datetime_as_string(days, unit='D')
+    return np.where(present, formatted, '').tolist()
+
+# Function to generate all vectorizable columns for count customers starting at first_id,
+# created on days in [create_start, create_end)
+def generate_customer_columns(first_id, count, rng, create_start=CREATE_START, create_end=CREATE_END):
+    customer_id = np.char.zfill(np.arange(first_id, first_id + count).astype(str), 8).tolist()
+
+    user_gender = NICKNAMES.draw_genders(rng, count)  # 0: unknown, 1: male, 2: female (85% female)
+    female = user_gender == 2
+
+    has_nickname = rng.random(count) > 0.2  # 80% chance to have a nickname
+    has_username = rng.random(count) > 0.6  # 40% chance to have a username
+    has_phone = rng.random(count) > 0.2  # 80% chance to have a phone
+    has_birthdate = rng.random(count) > 0.3  # 70% chance to have a birthdate
+
+    wechat_nickname = np.where(has_nickname, NICKNAMES.nicknames(user_gender, rng), '').tolist()
+    user_name = np.where(has_username, NICKNAMES.user_names(rng, count), '').tolist()
+
+    # Phone is '1' + one digit from 3-9 + an 8-digit suffix
+    phone = (10 ** 9
+             + rng.choice(PHONE_SECOND_DIGITS, size=count) * 10 ** 8
+             + rng.integers(PHONE_SUFFIX_LOW, PHONE_SUFFIX_HIGH + 1, size=count))
+    wechat_phone = np.where(has_phone, phone.astype(str), '').tolist()
+
+    # Birthdate offsets are drawn from [0, days) like random_date
+    birth_offset = np.where(female,
+                            rng.integers(0, FEMALE_BIRTH_DAYS, size=count),
+                            rng.integers(0, OTHER_BIRTH_DAYS, size=count))
+    birth_start = np.where(female, FEMALE_BIRTH_START, OTHER_BIRTH_START)
+    user_birthdate = format_dates(birth_start + birth_offset, has_birthdate)
+
+    # update_time is drawn between create_time and the end of the window
+    create_start = np.datetime64(create_start, 'D')
+    create_days = (np.datetime64(create_end, 'D') - create_start).astype(int)
+    create_offset = rng.integers(0, create_days, size=count)
+    update_offset = create_offset + rng.integers(0, create_days - create_offset)
+    create_time = [day + ' 00:00:00' for day in np.datetime_as_string(create_start + create_offset, unit='D').tolist()]
+    update_time = [day + ' 00:00:00' for day in np.datetime_as_string(create_start + update_offset, unit='D').tolist()]
+
+    return {
+        'customer_id': customer_id,
+        'unionid': random_hex_ids(rng, count, 'ojqzL'),
+        'mini_openid': random_hex_ids(rng, count, 'o4GyE5'),
+        'user_gender': user_gender.tolist(),
+        'wechat_nickname': wechat_nickname,
+        'user_name': user_name,
+        'wechat_phone': wechat_phone,
+        'user_birthdate': user_birthdate,
+        'create_time': create_time,
+        'update_time': update_time,
+    }
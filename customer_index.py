@@ -0,0 +1,53 @@
+import numpy as np
+
+# Compact in-memory index of generated customers.
+# A unionid is 'ojqzL' + 24 hex digits, i.e. 12 random bytes, so customers are
+# kept as one (n, 12) uint8 array instead of a Python str per row:
+# 10M customers take 120 MB, plus 80 MB for the order weights below.
+
+UNIONID_PREFIX = 'ojqzL'
+UNIONID_BYTES = 12
+
+class CustomerIndex:
+    def __init__(self, capacity):
+        self.ids = np.empty((capacity, UNIONID_BYTES), dtype=np.uint8)
+        self.size = 0
+        self.cdf = None
+
+    # Function to append unionid strings in customer order
+    def extend(self, unionids):
+        raw = bytes.fromhex(''.join(unionid[len(UNIONID_PREFIX):] for unionid in unionids))
+        count = len(raw) // UNIONID_BYTES
+        self.ids[self.size:self.size + count] = np.frombuffer(raw, dtype=np.uint8).reshape(count, UNIONID_BYTES)
+        self.size += count
+
+    # Function to write the customers to a .npy file
+    def save(self, path):
+        np.save(path, self.ids[:self.size])
+
+    # Function to read customers written by save, with room for extra more
+    @classmethod
+    def load(cls, path, extra=0):
+        ids = np.load(path)
+        index = cls(len(ids) + extra)
+        index.ids[:len(ids)] = ids
+        index.size = len(ids)
+        return index
+
+    # Function to turn customer positions back into unionid strings
+    def unionids(self, positions):
+        digits = self.ids[positions].tobytes().hex()
+        width = 2 * UNIONID_BYTES
+        return [UNIONID_PREFIX + digits[k:k + width] for k in range(0, len(digits), width)]
+
+    # Function to give every customer a power-law weight for how many orders they place.
+    # Weights are Pareto(alpha) distributed: a smaller alpha means a heavier tail of loyal customers.
+    def set_order_weights(self, alpha, rng):
+        weights = rng.pareto(alpha, self.size) + 1.0
+        self.cdf = np.cumsum(weights)
+
+    # Function to draw the customers of orders [start, start + count) by weight.
+    # Draws are independent, so start is not needed here.
+    def sample(self, start, count, rng):
+        positions = np.searchsorted(self.cdf, rng.random(count) * self.cdf[-1], side='right')
+        return self.unionids(np.minimum(positions, self.size - 1))
@@ -0,0 +1,234 @@
+import argparse
+import hashlib
+import importlib.util
+import json
+import os
+import shutil
+import time
+
+from mock_loader import sink_path, write_load_script
+from mock_schema import ROOM_IDS, STORE_IDS
+from parallel_generate import CHUNK_ROWS
+from sql_encoder import open_text, plain_path
+
+# Content-addressed cache of generated datasets (--cache).
+# A run is keyed by the sha256 of its full generation spec: generator, seed, row
+# counts and every other option that shapes the output, STORE_IDS/ROOM_IDS, the
+# chunk size and the source of the modules the generator runs. A run whose key is
+# cached copies the finished file instead of generating it. Generators whose first
+# rows do not depend on the total count are prefix-stable: they also share a
+# family key (the spec without the row count), and a run can take the whole
+# chunks it has in common with any cached run of its family, e.g. 10000 of 12345
+# rows from a 1M-row run, and generate only the rest - the same way a resumed db
+# load continues after its committed rows, so the file is byte-identical to a
+# fresh one. Finished files are added to the cache, and the least recently used
+# ones are evicted once the cache is over --cache-size.
+# Only the sql and tsv sinks are cached; runs without --seed or with --rollups,
+# --profile or --guard bypass the cache.
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'relle-mock-data')
+DEFAULT_CACHE_MB = 2048
+
+INDEX = 'index.json'
+
+# Option holding the row count of prefix-stable generators
+ROWS_ARGUMENT = 'records'
+
+# Options that do not change the generated file
+IGNORED_ARGUMENTS = {'output', 'db_url', 'job', 'commit_batches', 'workers', 'profile', 'rollups', 'cache',
+                     'cache_size', 'guard', 'guard_capacity', 'guard_fp_rate'}
+
+# Function to hash the source files of the given modules, without importing them
+def source_version(modules):
+    digest = hashlib.sha256()
+    for name in sorted(modules):
+        spec = importlib.util.find_spec(name)
+        digest.update(name.encode())
+        with open(spec.origin, 'rb') as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+# Function to hash a spec dict into a cache key
+def spec_key(spec):
+    return hashlib.sha256(json.dumps(spec, sort_keys=True).encode()).hexdigest()[:32]
+
+# Function to round rows down to whole chunks
+def whole_chunks(rows):
+    return rows - rows % CHUNK_ROWS
+
+class DatasetCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_CACHE_MB << 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self.index_path = os.path.join(directory, INDEX)
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                self.entries = json.load(f)
+        except FileNotFoundError:
+            self.entries = {}
+        # Entries whose file went missing are forgotten
+        self.entries = {key: entry for key, entry in self.entries.items() if os.path.exists(self.path(key))}
+
+    # Function to return the cached file of key
+    def path(self, key):
+        entry = self.entries.get(key)
+        return os.path.join(self.directory, entry['file']) if entry else ''
+
+    # Function to replace the index in one step, like generator_state.save_state
+    def save(self):
+        temp_path = self.index_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, indent=2)
+        os.replace(temp_path, self.index_path)
+
+    def touch(self, key):
+        self.entries[key]['last_used'] = time.time()
+        self.save()
+
+    # Function to return the cached entry of family with the most whole chunks in common with a run of rows
+    def best_prefix(self, family, rows):
+        best, best_rows = None, 0
+        for key, entry in self.entries.items():
+            if entry['family'] == family and entry['rows'] is not None:
+                common = min(whole_chunks(rows), whole_chunks(entry['rows']))
+                if common > best_rows:
+                    best, best_rows = key, common
+        return best, best_rows
+
+    # Function to copy the file at path into the cache under key
+    def store(self, key, family, rows, path, generator):
+        # Keeps the .sql/.tsv and .gz suffixes
+        name = key + os.path.splitext(plain_path(path))[1] + path[len(plain_path(path)):]
+        temp_path = os.path.join(self.directory, name + '.tmp')
+        shutil.copyfile(path, temp_path)
+        os.replace(temp_path, os.path.join(self.directory, name))
+        self.entries[key] = {'generator': generator, 'family': family, 'rows': rows, 'file': name,
+                             'bytes': os.path.getsize(path), 'last_used': time.time()}
+        self.evict(keep=key)
+        self.save()
+
+    # Function to remove least recently used entries until the cache fits in max_bytes
+    def evict(self, keep=None):
+        total = sum(entry['bytes'] for entry in self.entries.values())
+        for key in sorted(self.entries, key=lambda key: self.entries[key]['last_used']):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            total -= self.entries[key]['bytes']
+            os.remove(self.path(key))
+            del self.entries[key]
+
+# Function to copy the first rows rows of the cached .sql or .tsv file at path into an open file sink.
+# Batches never span chunks, so whole chunks end on a statement boundary of the sql file.
+def copy_rows(path, sink, rows):
+    with open_text(path) as file:
+        if plain_path(path).endswith('.tsv'):
+            for copied, line in enumerate(file):
+                if copied == rows:
+                    break
+                sink.file.write(line)
+            return
+        # The sink already wrote the USE / START TRANSACTION preamble
+        lines = iter(file)
+        for line in lines:
+            if line.startswith('INSERT'):
+                sink.file.write(line)
+                break
+        copied = 0
+        for line in lines:
+            sink.file.write(line)
+            if line.startswith('('):
+                copied += 1
+            elif copied == rows:
+                # The blank line closing the last copied statement
+                break
+
+# One generator run against the cache
+class CachedRun:
+    def __init__(self, cache, args, generator, sources, rows=None, table=None, columns=None):
+        self.cache = cache
+        self.generator = generator
+        self.rows = rows
+        self.table = table
+        self.columns = columns
+        self.path = sink_path(args)
+        spec = {'generator': generator, 'sources': source_version(sources), 'store_ids': STORE_IDS,
+                'room_ids': ROOM_IDS, 'chunk_rows': CHUNK_ROWS,
+                'args': {name: value for name, value in sorted(vars(args).items()) if name not in IGNORED_ARGUMENTS}}
+        self.key = spec_key(spec)
+        # A prefix-stable run keeps its row count out of the family key
+        if rows is not None:
+            del spec['args'][ROWS_ARGUMENT]
+        self.family = spec_key(spec)
+
+    # Function to copy the cached file of this run to the output path; returns False when it is not cached
+    def restore(self):
+        source = self.cache.path(self.key)
+        if not source:
+            return False
+        shutil.copyfile(source, self.path)
+        if plain_path(self.path).endswith('.tsv'):
+            write_load_script(self.path, self.table, self.columns)
+        self.cache.touch(self.key)
+        print(f"Reused cached dataset {self.key}")
+        return True
+
+    # Function to fill sink with the whole chunks a cached run of the same family has in common with this one
+    def prefill(self, sink):
+        if self.rows is None:
+            return
+        key, rows = self.cache.best_prefix(self.family, self.rows)
+        if key is None:
+            return
+        copy_rows(self.cache.path(key), sink, rows)
+        sink.committed_rows = rows
+        self.cache.touch(key)
+        print(f"Took {rows} of {self.rows} rows from cached dataset {key}")
+
+    # Function to add the finished output to the cache
+    def store(self):
+        self.cache.store(self.key, self.family, self.rows, self.path, self.generator)
+        print(f"Cached dataset as {self.key}")
+
+# Function to register the cache options on a generator's argument parser
+def add_cache_arguments(parser):
+    parser.add_argument('--cache', nargs='?', const=DEFAULT_CACHE_DIR,
+                        help=f"reuse and keep finished datasets in this directory (default {DEFAULT_CACHE_DIR})")
+    parser.add_argument('--cache-size', type=int, default=DEFAULT_CACHE_MB, help='cache size limit in MB')
+
+# Function to open this run's cache entry, or None when --cache is off or the run bypasses it.
+# rows is the row count of a prefix-stable run; table and columns are needed to restore tsv files.
+def open_cached_run(args, generator, sources, rows=None, table=None, columns=None):
+    if not args.cache or args.seed is None or sink_path(args) is None:
+        return None
+    # Guarded output also depends on the keys in the guard file
+    if getattr(args, 'rollups', None) or getattr(args, 'profile', None) or getattr(args, 'guard', None):
+        return None
+    cache = DatasetCache(args.cache, args.cache_size << 20)
+    return CachedRun(cache, args, generator, sources, rows, table, columns)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect or clear the generated dataset cache')
+    parser.add_argument('command', choices=['list', 'path', 'clear'],
+                        help='list: show the cached datasets; path: print the file of KEY; clear: remove everything')
+    parser.add_argument('key', nargs='?')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_DIR, help='cache directory')
+    args = parser.parse_args()
+
+    cache = DatasetCache(args.cache)
+    if args.command == 'list':
+        for key, entry in sorted(cache.entries.items(), key=lambda item: -item[1]['last_used']):
+            rows = '-' if entry['rows'] is None else f"{entry['rows']:,}"
+            print(f"{key}  {entry['generator']:<28} {rows:>12} rows {entry['bytes'] / 1e6:>9.1f} MB  "
+                  f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(entry['last_used']))}")
+    elif args.command == 'path':
+        if not cache.path(args.key):
+            raise SystemExit(f"{args.key} is not cached")
+        print(cache.path(args.key))
+    else:
+        for key in list(cache.entries):
+            os.remove(cache.path(key))
+        cache.entries = {}
+        cache.save()
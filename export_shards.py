@@ -0,0 +1,208 @@
+import argparse
+import json
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+from mock_loader import read_columns, read_rows
+from mock_schema import CUSTOMER_COLUMNS, CUSTOMER_TABLE, ORDER_COLUMNS, ORDER_TABLE
+
+# Export generated customers and orders as fixed-size shards for the frontend mock layer.
+# Instead of synthesizing every user and order in the browser, the UI loads a small
+# manifest.json and fetches only the shards overlapping the date range or page it shows.
+# Rows are sorted by create_time, so each shard covers one stretch of time; the manifest
+# records its row count and min/max create_time. Shards are columnar, either
+#   json  {"rows": n, "columns": {"<name>": [values...]}}
+#   bin   one little-endian typed array per column, each starting on an 8-byte boundary:
+#         int8/int32/float64 as is, time as uint32 seconds since 1970-01-01 (no time zone),
+#         str as uint32 offsets (rows + 1) into a UTF-8 block; the manifest gives the
+#         [byte offset, byte length] of every block
+# Low-cardinality strings (stores, rooms, contact names) are dict columns in both
+# layouts: uint16 codes into the column's "values" list in the manifest.
+# src/services/shardedDataService.ts reads both layouts. Sorting takes two passes
+# over the input: one over create_time to rank the rows, one that spills the rows
+# to their shard's temporary file. Besides the ranks, memory holds at most
+# MAX_PENDING_ROWS rows waiting to be spilled, then one shard at a time.
+
+# Columns exported per table, with their shard type
+SHARD_COLUMNS = {
+    CUSTOMER_TABLE: (('customer_id', 'str'), ('unionid', 'str'), ('wechat_nickname', 'str'), ('user_name', 'str'),
+                     ('wechat_phone', 'str'), ('user_gender', 'int8'), ('user_birthdate', 'str'),
+                     ('create_time', 'time'), ('update_time', 'time')),
+    ORDER_TABLE: (('id', 'int32'), ('order_id', 'str'), ('unionid', 'str'), ('sotre_id', 'dict'), ('room_id', 'dict'),
+                  ('order_amount', 'float64'), ('order_status', 'int32'), ('contact_name', 'dict'),
+                  ('create_time', 'time'), ('write_off', 'int8')),
+}
+TABLE_COLUMNS = {CUSTOMER_TABLE: CUSTOMER_COLUMNS, ORDER_TABLE: ORDER_COLUMNS}
+
+# numpy dtypes of the numeric shard types
+DTYPES = {'int8': '<i1', 'int32': '<i4', 'float64': '<f8', 'time': '<u4', 'dict': '<u2'}
+
+# dict columns hold at most this many distinct values
+MAX_DICT_VALUES = 1 << 16
+
+FORMATS = ('json', 'bin')
+
+DEFAULT_OUTPUT = os.path.join('public', 'mock-data')
+
+# Rows per shard; 5000 orders are about 450 KB of binary shard
+SHARD_ROWS = 5000
+
+# Rows held per shard before they are spilled to its temporary file
+SPILL_ROWS = 1000
+
+# Rows held over all shards; when they reach this, the largest buffers are spilled
+# until half of it is left, however many shards the table has
+MAX_PENDING_ROWS = 100000
+
+MANIFEST_VERSION = 1
+
+# Function to convert a raw field (Python value or string read back from a file) to its shard type
+def convert(value, kind):
+    if kind in ('str', 'dict'):
+        return '' if value is None else str(value)
+    if kind == 'time':
+        return str(value)
+    if kind == 'float64':
+        return float(value)
+    return int(value)
+
+# Function to pad bytearray data with zeros up to the next multiple of 8
+def align(data):
+    data.extend(bytes(-len(data) % 8))
+
+# Function to encode one shard's columns in the bin layout; returns the bytes and the block table
+def encode_bin(columns, types):
+    data = bytearray()
+    blocks = {}
+    for (name, kind), values in zip(types, columns):
+        if kind == 'str':
+            encoded = [value.encode('utf-8') for value in values]
+            offsets = np.zeros(len(encoded) + 1, dtype='<u4')
+            np.cumsum([len(value) for value in encoded], out=offsets[1:])
+            blocks[name] = [len(data), offsets.nbytes]
+            data += offsets.tobytes()
+            align(data)
+            blocks[name + '.data'] = [len(data), int(offsets[-1])]
+            data += b''.join(encoded)
+        else:
+            if kind == 'time':
+                values = np.array(values, dtype='datetime64[s]').astype(np.int64)
+            array = np.array(values).astype(DTYPES[kind])
+            blocks[name] = [len(data), array.nbytes]
+            data += array.tobytes()
+        align(data)
+    return bytes(data), blocks
+
+# Function to rank the rows of paths by create_time (stable, so equal times keep file order)
+def create_time_ranks(paths, columns):
+    create_time = columns.index('create_time')
+    times = [np.array(block[1], dtype='datetime64[s]')
+             for path in paths for block in read_columns(path, (0, create_time))]
+    times = np.concatenate(times) if times else np.array([], dtype='datetime64[s]')
+    ranks = np.empty(len(times), dtype=np.int64)
+    ranks[np.argsort(times, kind='stable')] = np.arange(len(times))
+    return ranks
+
+# Function to write the shards of one table into directory and return its manifest entry
+def export_table(table, paths, directory, output, shard_format, shard_rows=SHARD_ROWS):
+    types = SHARD_COLUMNS[table]
+    dicts = {name: {} for name, kind in types if kind == 'dict'}
+    positions = [TABLE_COLUMNS[table].index(name) for name, _ in types]
+    ranks = create_time_ranks(paths, TABLE_COLUMNS[table])
+    num_shards = -(-len(ranks) // shard_rows)
+
+    # Spill every row, tagged with its rank, to the temporary file of its shard
+    with tempfile.TemporaryDirectory(dir=output) as spill:
+        spill_paths = [os.path.join(spill, f"{shard}.pickle") for shard in range(num_shards)]
+        pending = [[] for _ in range(num_shards)]
+        pending_rows = 0
+
+        def flush(shard):
+            nonlocal pending_rows
+            with open(spill_paths[shard], 'ab') as f:
+                pickle.dump(pending[shard], f, pickle.HIGHEST_PROTOCOL)
+            pending_rows -= len(pending[shard])
+            pending[shard] = []
+
+        rows = (row for path in paths for row in read_rows(path, positions))
+        for rank, row in zip(ranks.tolist(), rows):
+            shard = rank // shard_rows
+            values = [convert(value, kind) for value, (_, kind) in zip(row, types)]
+            for position, (name, kind) in enumerate(types):
+                if kind == 'dict':
+                    values[position] = dicts[name].setdefault(values[position], len(dicts[name]))
+            pending[shard].append((rank, values))
+            pending_rows += 1
+            if len(pending[shard]) >= SPILL_ROWS:
+                flush(shard)
+            elif pending_rows >= MAX_PENDING_ROWS:
+                for largest in sorted(range(num_shards), key=lambda shard: len(pending[shard]), reverse=True):
+                    if pending_rows <= MAX_PENDING_ROWS // 2:
+                        break
+                    flush(largest)
+
+        for name, codes in dicts.items():
+            if len(codes) > MAX_DICT_VALUES:
+                raise SystemExit(f"{table}.{name} has {len(codes)} distinct values, more than a dict column holds")
+        os.makedirs(os.path.join(output, directory), exist_ok=True)
+        create_time = [name for name, _ in types].index('create_time')
+        shards = []
+        for shard in range(num_shards):
+            if pending[shard]:
+                flush(shard)
+            tagged = []
+            with open(spill_paths[shard], 'rb') as f:
+                while True:
+                    try:
+                        tagged += pickle.load(f)
+                    except EOFError:
+                        break
+            tagged.sort(key=lambda item: item[0])
+            columns = list(zip(*(values for _, values in tagged)))
+
+            name = f"{directory}/{shard:05d}.{shard_format}"
+            entry = {'file': name, 'rows': len(tagged),
+                     'min_create_time': columns[create_time][0], 'max_create_time': columns[create_time][-1]}
+            if shard_format == 'bin':
+                data, entry['blocks'] = encode_bin(columns, types)
+            else:
+                data = json.dumps({'rows': len(tagged),
+                                   'columns': {column: list(values) for (column, _), values in zip(types, columns)}},
+                                  ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+            with open(os.path.join(output, name), 'wb') as f:
+                f.write(data)
+            entry['bytes'] = len(data)
+            shards.append(entry)
+
+    return {'rows': len(ranks), 'shard_rows': shard_rows, 'sorted_by': 'create_time',
+            'columns': [dict(name=name, type=kind, **({'values': list(dicts[name])} if kind == 'dict' else {}))
+                        for name, kind in types],
+            'shards': shards}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export generated customers and orders as shards for the frontend')
+    parser.add_argument('--customers', nargs='*', default=[], help='app_customer_info .sql or .tsv files')
+    parser.add_argument('--orders', nargs='*', default=[], help='app_service_order .sql or .tsv files')
+    parser.add_argument('--output', default=DEFAULT_OUTPUT,
+                        help='directory for manifest.json and the shards (served by the dev server from public/)')
+    parser.add_argument('--format', choices=FORMATS, default='bin',
+                        help='json: columnar JSON shards; bin: typed-array shards')
+    parser.add_argument('--shard-rows', type=int, default=SHARD_ROWS, help='rows per shard')
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    manifest = {'version': MANIFEST_VERSION, 'format': args.format, 'tables': {}}
+    for table, paths, directory in ((CUSTOMER_TABLE, args.customers, 'customers'),
+                                    (ORDER_TABLE, args.orders, 'orders')):
+        if paths:
+            manifest['tables'][table] = export_table(table, paths, directory, args.output, args.format,
+                                                     args.shard_rows)
+    with open(os.path.join(args.output, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    for table, entry in manifest['tables'].items():
+        size = sum(shard['bytes'] for shard in entry['shards'])
+        print(f"{table}: {entry['rows']} rows in {len(entry['shards'])} shards, {size / 1e6:.1f} MB")
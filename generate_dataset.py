@@ -0,0 +1,117 @@
+import argparse
+
+import numpy as np
+
+import generate_mock_data
+import generate_service_order_data
+from customer_index import CustomerIndex
+from mock_loader import add_sink_arguments, batched, open_sink
+from generator_state import add_state_arguments, customers_path, load_state, save_state
+from mock_schema import CUSTOMER_COLUMNS, CUSTOMER_TABLE, ORDER_COLUMNS, ORDER_TABLE
+from order_arrivals import ORDER_WINDOW_END, ORDER_WINDOW_START
+from order_rollups import add_rollup_arguments, open_rollups
+from parallel_generate import CHUNK_ROWS, add_shard_arguments, derive_seed, new_master_seed, row_chunks, run_sharded
+
+# Generate customers and their orders in one run.
+# Customers are generated first and their unionids kept in a CustomerIndex;
+# orders are then drawn against that index, so every order joins to a row in
+# app_customer_info. Orders per customer follow a power law (--alpha).
+# With --state the run is recorded in a state file (generator_state.py), and
+# --delta N later adds only N more days of customers and orders after it.
+
+# Default Pareto shape of the orders-per-customer weights
+ORDERS_PER_CUSTOMER_ALPHA = 2.0
+
+# Function to generate count customers into sink while adding them to index.
+# All chunks are generated so the index is complete; rows a resumed db load already
+# committed are not written again.
+def generate_customers(args, sink, seed, index, count, first_id, window):
+    tasks = ((seed, chunk, 0, rows, args.batched) for chunk, _, rows in row_chunks(0, count))
+    for chunk, rows in enumerate(run_sharded(generate_mock_data.generate_customer_chunk, tasks, args.workers,
+                                             initializer=generate_mock_data.init_customer_worker,
+                                             initargs=(first_id, window))):
+        index.extend([row[1] for row in rows])
+        rows = rows[max(sink.committed_rows - chunk * CHUNK_ROWS, 0):]
+        for batch in batched(rows, args.batch_size):
+            sink.write_batch(batch)
+
+# Function to generate count orders against the customer index, placed by the arrival plan
+def generate_orders(args, sink, seed, index, count, first_id, window, plan):
+    tasks = ((seed, chunk, skip, rows) for chunk, skip, rows in row_chunks(sink.committed_rows, count))
+    for rows in run_sharded(generate_service_order_data.generate_order_chunk, tasks, args.workers,
+                            initializer=generate_service_order_data.init_order_worker,
+                            initargs=(None, plan, index, first_id, window)):
+        for batch in batched(rows, args.batch_size):
+            sink.write_batch(batch)
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate customers and orders that reference them')
+    parser.add_argument('--customers', type=int,
+                        help=f"number of customers (default {generate_mock_data.NUM_RECORDS}, "
+                             f"or the saved daily rate with --delta)")
+    parser.add_argument('--orders', type=int,
+                        help=f"number of orders (default {generate_service_order_data.NUM_RECORDS}, "
+                             f"or the saved daily rate with --delta)")
+    parser.add_argument('--alpha', type=float, default=ORDERS_PER_CUSTOMER_ALPHA,
+                        help='Pareto shape of orders per customer; smaller means more heavy buyers')
+    parser.add_argument('--batched', action='store_true', help='generate customer columns with numpy')
+    generate_service_order_data.add_arrival_arguments(parser)
+    add_shard_arguments(parser)
+    add_state_arguments(parser)
+    add_sink_arguments(parser, 'mock_data.sql')
+    parser.add_argument('--order-output', default='service_order_mock_data.sql', help='output file for the orders')
+    add_rollup_arguments(parser)
+    args = parser.parse_args()
+
+    if args.delta:
+        # Continue after the saved ids and watermark, with the saved customers to order from
+        if not args.state:
+            raise SystemExit('--delta needs the --state file of an earlier run')
+        state = load_state(args.state)
+        state['runs'] += 1
+        master_seed = derive_seed(state['seed'], f"delta-{state['runs']}")
+        window = (state['watermark'], str(np.datetime64(state['watermark'], 'D') + args.delta))
+        num_customers = args.customers if args.customers is not None else round(state['customers_per_day'] * args.delta)
+        num_orders = args.orders if args.orders is not None else round(state['orders_per_day'] * args.delta)
+        index = CustomerIndex.load(customers_path(args.state), extra=num_customers)
+        first_customer_id = state['last_customer_id'] + 1
+        first_order_id = state['last_order_id'] + 1
+        # Every delta run keeps its own db progress, so an interrupted one resumes where it stopped
+        args.job = args.job or f"delta-{state['runs']}"
+    else:
+        master_seed = args.seed if args.seed is not None else new_master_seed()
+        window = (ORDER_WINDOW_START, ORDER_WINDOW_END)
+        num_customers = args.customers if args.customers is not None else generate_mock_data.NUM_RECORDS
+        num_orders = args.orders if args.orders is not None else generate_service_order_data.NUM_RECORDS
+        index = CustomerIndex(num_customers)
+        first_customer_id = generate_mock_data.STARTING_ID
+        first_order_id = generate_service_order_data.STARTING_ID
+        days = int((np.datetime64(window[1], 'D') - np.datetime64(window[0], 'D')).astype(int))
+        state = {'seed': master_seed, 'runs': 0,
+                 'customers_per_day': num_customers / days, 'orders_per_day': num_orders / days}
+
+    # The arrival plan is checked before any sink is opened
+    order_seed = derive_seed(master_seed, 'orders')
+    plan = generate_service_order_data.build_arrival_plan(args, num_orders, order_seed, window, parser)
+    rollups = open_rollups(args)
+    with open_sink(args, CUSTOMER_TABLE, CUSTOMER_COLUMNS, rollups=rollups, rows=num_customers) as sink:
+        generate_customers(args, sink, derive_seed(master_seed, 'customers'), index, num_customers,
+                           first_customer_id, window)
+
+    index.set_order_weights(args.alpha, np.random.default_rng([order_seed, 0]))
+    with open_sink(args, ORDER_TABLE, ORDER_COLUMNS, output=args.order_output, rollups=rollups,
+                   rows=num_orders) as sink:
+        generate_orders(args, sink, order_seed, index, num_orders, first_order_id, window, plan)
+    if rollups:
+        rollups.write(args.rollups)
+
+    if args.state:
+        index.save(customers_path(args.state))
+        state.update(last_customer_id=first_customer_id + num_customers - 1,
+                     last_order_id=first_order_id + num_orders - 1, watermark=window[1])
+        save_state(args.state, state)
+
+    print(f"Generated {num_customers} customers and {num_orders} orders created {window[0]} - {window[1]}")
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,17 @@
 import random
 import string
-import time
 from datetime import datetime, timedelta
-import uuid
+import itertools
+
+from mock_loader import add_sink_arguments, batched, open_sink
+from mock_pipeline import run_pipeline, synthesize
+from mock_schema import ORDER_COLUMNS, ORDER_STATUSES, ORDER_TABLE, ROOM_IDS, STORE_IDS
+from dataset_cache import add_cache_arguments, open_cached_run
+from uniqueness_guard import add_guard_arguments, close_guard, open_guard, unique_rows
+from generator_profile import add_profile_arguments, finish_profile, start_profile
+from order_ids import make_order_id
+from order_rollups import add_rollup_arguments, open_rollups
+from parallel_generate import add_shard_arguments, chunk_seed, new_master_seed
 
 # 我们需要增加 3991 - 809 = 3182 个符合条件的用户
 ADDITIONAL_USERS_NEEDED = 3182
@@ -12,14 +21,15 @@ MIN_DAYS_WITH_ORDERS = 4
 
 # 从现有用户中选择一些用户，为他们生成额外的订单
 # 假设我们从 app_customer_info 表中选择用户
-def get_customer_ids():
-    # 这里应该从数据库中获取用户ID，但为了简化，我们生成一些随机ID
-    return [f"ojqzL{uuid.uuid4().hex[:24]}" for _ in range(ADDITIONAL_USERS_NEEDED)]
+def get_customer_ids(count=ADDITIONAL_USERS_NEEDED):
+    # 这里应该从数据库中获取用户ID，但为了简化，我们用带种子的随机数生成一些ID
+    return [f"ojqzL{random.getrandbits(96):024x}" for _ in range(count)]
 
-# 生成一个随机日期，确保在同一个月内
-def generate_dates_in_same_month(num_days, year=2023):
+# 生成一个随机日期，确保在同一个月内；不指定 month 时随机选择一个月
+def generate_dates_in_same_month(num_days, year=2023, month=None):
     # 随机选择一个月
-    month = random.randint(1, 12)
+    if month is None:
+        month = random.randint(1, 12)
     
     # 确定这个月有多少天
     if month in [4, 6, 9, 11]:
@@ -39,12 +49,6 @@ def generate_dates_in_same_month(num_days, year=2023):
     # 转换为日期对象
     return [datetime(year, month, day) for day in days]
 
-# 生成订单ID
-def generate_order_id(store_id):
-    timestamp = datetime.now().strftime("%y%m%d%H%M%S")
-    random_num = ''.join(random.choices(string.digits, k=3))
-    return f"{store_id}{timestamp}{random_num}"
-
 # 生成联系人姓名
 def generate_contact_name():
     first_names = ["张", "王", "李", "赵", "钱", "孙", "周", "吴", "郑", "王"]
@@ -59,91 +63,155 @@ def generate_phone_number():
     suffix = ''.join(random.choices(string.digits, k=8))
     return f"{prefix}{suffix}"
 
-# 常量
-STORE_IDS = ['SH0001', 'SH0002', 'SH0003']
-ROOM_IDS = ['01', '02', '03', '04', '05', '06']
-ORDER_STATUSES = [2, 4, 16, 1024]
+# 为每个用户生成多个订单，按 ORDER_COLUMNS 顺序逐行产出
+# months 可为每个用户指定下单的 (年, 月)，不指定时随机选择 2023 年的一个月
+def generate_frequent_order_rows(customer_ids, first_id, months=None):
+    order_id_counter = first_id
 
-# 生成SQL文件
-with open('frequent_orders_mock_data.sql', 'w', encoding='utf-8') as f:
-    f.write("USE relle_mall_release;\n\n")
-    f.write("START TRANSACTION;\n\n")
-    
-    # 获取用户ID
-    customer_ids = get_customer_ids()
-    
-    # 为每个用户生成多个订单
-    order_id_counter = 50000  # 起始ID，确保不与现有ID冲突
-    
-    batch_size = 1000
-    values_list = []
-    
     for user_index, unionid in enumerate(customer_ids):
         # 为每个用户生成4-7天的订单日期（在同一个月内）
         num_days = random.randint(MIN_DAYS_WITH_ORDERS, MIN_DAYS_WITH_ORDERS + 3)
-        order_dates = generate_dates_in_same_month(num_days)
-        
+        if months:
+            order_dates = generate_dates_in_same_month(num_days, *months[user_index])
+        else:
+            order_dates = generate_dates_in_same_month(num_days)
+
         # 为每天生成1-3个订单
         for date in order_dates:
             num_orders_per_day = random.randint(1, 3)
-            
+
             for _ in range(num_orders_per_day):
                 order_id_counter += 1
-                
+
                 # 生成订单数据
                 store_id = random.choice(STORE_IDS)
-                order_id = generate_order_id(store_id)
                 room_id = random.choice(ROOM_IDS)
-                
+
                 # 生成价格
                 origin_price = round(random.uniform(100, 2000), 2)
-                reduction_amount = round(random.uniform(0, origin_price * 0.3), 2) if random.random() < 0.3 else 0
+                reduction_amount = round(random.uniform(0, origin_price * 0.3), 2) if random.random() < 0.3 else 0.0
                 order_amount = origin_price - reduction_amount
-                
+
                 # 生成联系人信息
                 contact_name = generate_contact_name()
                 contact_phone = generate_phone_number()
-                
+
                 # 生成订单状态
                 order_status = random.choice(ORDER_STATUSES)
-                
+
                 # 在当天的随机时间
                 hour = random.randint(9, 21)
                 minute = random.randint(0, 59)
                 second = random.randint(0, 59)
                 create_time = date.replace(hour=hour, minute=minute, second=second)
-                
+
                 # 更新时间在创建时间之后
                 update_time = create_time + timedelta(minutes=random.randint(30, 180))
-                
+                create_time = create_time.strftime('%Y-%m-%d %H:%M:%S')
+
                 # 其他字段
                 create_by = unionid
                 update_by = random.choice([unionid, 'signIn', 'AutoCloseOrderJob'])
                 deleted = 0
                 modify_num = random.randint(0, 3)
                 customer_source = '小程序'
-                source_order_id = 'NULL'
+                source_order_id = None
                 write_off = 0
-                write_off_time = 'NULL'
-                write_off_user = "''"
-                
-                # 格式化SQL值
-                values = f"({order_id_counter}, '{order_id}', '{unionid}', '{store_id}', '{room_id}', {order_amount:.2f}, '{contact_name}', '{contact_phone}', {origin_price:.2f}, {reduction_amount:.2f}, {order_status}, '{create_time.strftime('%Y-%m-%d %H:%M:%S')}', '{create_by}', '{update_time.strftime('%Y-%m-%d %H:%M:%S')}', '{update_by}', {deleted}, {modify_num}, '{customer_source}', {source_order_id}, {write_off}, {write_off_time}, {write_off_user})"
-                values_list.append(values)
-                
-                # 每1000条记录写入一次
-                if len(values_list) >= batch_size:
-                    f.write("INSERT INTO `app_service_order` (`id`, `order_id`, `unionid`, `sotre_id`, `room_id`, `order_amount`, `contact_name`, `contact_phone`, `origin_price`, `reduction_amount`, `order_status`, `create_time`, `create_by`, `update_time`, `update_by`, `deleted`, `modify_num`, `customer_source`, `source_order_id`, `write_off`, `write_off_time`, `write_off_user`) VALUES\n")
-                    f.write(",\n".join(values_list))
-                    f.write(";\n\n")
-                    values_list = []
-    
-    # 写入剩余的记录
-    if values_list:
-        f.write("INSERT INTO `app_service_order` (`id`, `order_id`, `unionid`, `sotre_id`, `room_id`, `order_amount`, `contact_name`, `contact_phone`, `origin_price`, `reduction_amount`, `order_status`, `create_time`, `create_by`, `update_time`, `update_by`, `deleted`, `modify_num`, `customer_source`, `source_order_id`, `write_off`, `write_off_time`, `write_off_user`) VALUES\n")
-        f.write(",\n".join(values_list))
-        f.write(";\n\n")
-    
-    f.write("COMMIT;\n")
+                write_off_time = None
+                write_off_user = ''
+
+                # 订单号由门店、创建时间和全局订单ID组成，合并分片时由 merge_order_chunks 生成，这里先留空
+                yield (order_id_counter, None, unionid, store_id, room_id, order_amount, contact_name,
+                       contact_phone, origin_price, reduction_amount, order_status, create_time, create_by,
+                       update_time.strftime('%Y-%m-%d %H:%M:%S'), update_by, deleted, modify_num,
+                       customer_source, source_order_id, write_off, write_off_time, write_off_user)
+
+# 每个分片处理的用户数
+CUSTOMERS_PER_CHUNK = 500
+
+# 为 run_sharded 生成一个分片的订单，task 为 (master_seed, chunk, customer_ids)
+# 分片内的ID从1开始编号，合并时再加上前面分片的订单数并生成订单号
+def generate_frequent_order_chunk(task):
+    master_seed, chunk, customer_ids = task
+    random.seed(chunk_seed(master_seed, chunk))
+    return list(generate_frequent_order_rows(customer_ids, 0))
+
+# 为 run_sharded 生成一个分片的用户及其订单，task 为 (master_seed, chunk, count)
+# 用户ID由分片自己的种子生成，不必事先生成全部用户ID，内存不随 --users 增长
+def generate_user_order_chunk(task):
+    master_seed, chunk, count = task
+    random.seed(chunk_seed(master_seed, f"customers-{chunk}"))
+    return generate_frequent_order_chunk((master_seed, chunk, get_customer_ids(count)))
+
+# 把 num_users 个用户按 CUSTOMERS_PER_CHUNK 分配成分片任务
+def allocate_users(master_seed, num_users):
+    for chunk, start in enumerate(range(0, num_users, CUSTOMERS_PER_CHUNK)):
+        yield (master_seed, chunk, min(CUSTOMERS_PER_CHUNK, num_users - start))
+
+# 按分片顺序合并订单，把分片内的ID换算成全局连续的ID，并用它生成订单号（天然唯一）
+def merge_order_chunks(chunks, first_id):
+    order_id_counter = first_id
+    for rows in chunks:
+        for row in rows:
+            id = order_id_counter + row[0]
+            yield (id, make_order_id(row[3], row[11], id)) + row[2:]
+        order_id_counter += len(rows)
+
+# --profile 计时的阶段（见 generator_profile.py）
+PROFILE_STAGES = (
+    ('generate_frequent_orders', 'generate_contact_name', 'names'),
+    ('generate_frequent_orders', 'generate_phone_number', 'phones'),
+    ('generate_frequent_orders', 'generate_dates_in_same_month', 'dates'),
+    ('generate_frequent_orders', 'make_order_id', 'ids'),
+)
+
+# --guard 检查的键（见 uniqueness_guard.py）；订单号由订单ID生成，重复时只报告不重新生成
+GUARDED_COLUMNS = (('order_id', ORDER_COLUMNS.index('order_id'), None),)
+
+# 其源码计入 --cache 键的模块（见 dataset_cache.py）
+CACHE_SOURCES = ('generate_frequent_orders', 'order_ids', 'mock_loader', 'mock_schema', 'parallel_generate',
+                 'sql_encoder')
+
+# 生成订单并写入选定的输出
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='为高频用户生成 app_service_order 模拟数据')
+    add_shard_arguments(parser)
+    add_sink_arguments(parser, 'frequent_orders_mock_data.sql')
+    parser.add_argument('--users', type=int, default=ADDITIONAL_USERS_NEEDED, help='高频用户数')
+    add_rollup_arguments(parser)
+    add_cache_arguments(parser)
+    add_guard_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    master_seed = args.seed if args.seed is not None else new_master_seed()
+    start_profile(args, PROFILE_STAGES)
+
+    # 相同参数的结果已缓存时直接复制（订单按用户分片生成，不能按前缀派生）
+    cached = open_cached_run(args, 'generate_frequent_orders', CACHE_SOURCES, table=ORDER_TABLE, columns=ORDER_COLUMNS)
+    if cached and cached.restore():
+        return
+
+    guard = open_guard(args)
+    rollups = open_rollups(args)
+    with open_sink(args, ORDER_TABLE, ORDER_COLUMNS, rollups=rollups) as sink:
+        # 合并分片，跳过之前已提交的记录（仅 db 输出会有）；起始ID 50000，确保不与现有ID冲突
+        def merge(chunks):
+            rows = itertools.islice(merge_order_chunks(chunks, 50000), sink.committed_rows, None)
+            return batched(rows, args.batch_size)
+        stages = [synthesize(generate_user_order_chunk, args.workers), merge]
+        if guard:
+            stages.append(unique_rows(guard, GUARDED_COLUMNS))
+        run_pipeline(allocate_users(master_seed, args.users), *stages, sink=sink)
+    if cached:
+        cached.store()
+    close_guard(args, guard)
+    if rollups:
+        rollups.write(args.rollups)
+
+    print("Frequent orders mock data generated successfully!")
+    finish_profile(args, 'generate_frequent_orders')
 
-print("Frequent orders mock data generated successfully!")
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,14 @@
 import random
-import string
-import time
 from datetime import datetime, timedelta
-import uuid
-import re
+from itertools import accumulate
+
+from dataset_cache import add_cache_arguments, open_cached_run
+from uniqueness_guard import add_guard_arguments, close_guard, open_guard, unique_rows
+from generator_profile import add_profile_arguments, finish_profile, start_profile
+from mock_loader import add_sink_arguments, open_sink
+from mock_pipeline import allocate, rebatch, run_pipeline, synthesize
+from mock_schema import CUSTOMER_COLUMNS, CUSTOMER_TABLE, DEFAULT_AVATAR
+from parallel_generate import CHUNK_ROWS, add_shard_arguments, chunk_seed, new_master_seed
 
 # Number of records to generate
 NUM_RECORDS = 36320  # To reach 39,450 total (current 3,130 + 36,320 new)
@@ -11,6 +16,10 @@ NUM_RECORDS = 36320  # To reach 39,450 total (current 3,130 + 36,320 new)
 # Last customer ID in the database is 00000058, so we'll start from 00000059
 STARTING_ID = 59
 
+# Customers are created on days in [CREATE_START, CREATE_END)
+CREATE_START = datetime(2022, 1, 1)
+CREATE_END = datetime(2023, 12, 31)
+
 # Chinese surnames and given names for generating realistic names
 chinese_surnames = [
     "王", "李", "张", "刘", "陈", "杨", "黄", "赵", "吴", "周", "徐", "孙", "马", "朱", "胡", "林", "郭", "何", "高", "罗",
@@ -36,6 +45,27 @@ female_given_name_chars = '芳华美雅静淑惠珠莉娜婷婉娟妍媛妮琳
 # Emoji and special characters for WeChat nicknames
 emojis = '😊😂🥰😍😘💕❤️🌸🌹🌺🌷🌈🌟⭐️✨💫🔆🌞🌝🌙🌛🌜☀️🌤️⛅️🌥️☁️🌦️🌧️⛈️🌩️🌨️❄️☃️⛄️🔥💥✨🌟⚡️🌈☄️💫🌊🍓🍒🍎🍉🍊🍋🍌🍍🥭🍇🍏🍐🍑🍈🍋🍄🥝🥥🥑🥦🥬🥒🌽🌶️🥕🧄🧅🥔🍠🌰🥜'
 
+# Code points that extend the previous character instead of starting a new one:
+# variation selectors, skin tones, the keycap mark and tag characters
+def is_emoji_extender(char):
+    code = ord(char)
+    return code in (0xFE0E, 0xFE0F, 0x20E3) or 0x1F3FB <= code <= 0x1F3FF or 0xE0020 <= code <= 0xE007F
+
+# Function to split a string of emoji into grapheme clusters, so that "❤️" (heart +
+# variation selector) or a zero-width-joiner sequence stays one token
+def split_emoji(text):
+    tokens = []
+    joined = False
+    for char in text:
+        if tokens and (joined or is_emoji_extender(char) or char == '\u200d'):
+            tokens[-1] += char
+        else:
+            tokens.append(char)
+        joined = char == '\u200d'
+    return tokens
+
+emoji_tokens = split_emoji(emojis)
+
 # WeChat nickname prefixes and suffixes
 nickname_prefixes = ['小', '大', '帅', '美', '可爱', '甜甜', '萌萌', '酷酷', '乖乖', '暖暖', '软软', '呆呆', '笨笨', '懒懒', '傻傻', '酷酷', '潇洒', '温柔', '可爱', '迷人', '魅力', '优雅', '高贵', '知性', '清新', '淡雅', '时尚', '靓丽', '漂亮', '美丽', '可人', '娇媚', '妩媚', '婉约', '温婉', '贤淑', '端庄', '大方', '得体', '优美', '秀丽', '秀美', '秀气', '秀雅', '秀逸', '秀色', '秀外慧中', '秀色可餐', '秀色可餐', '秀色可餐']
 nickname_suffixes = ['宝宝', '贝贝', '公主', '王子', '小姐姐', '小哥哥', '小仙女', '小可爱', '小甜心', '小宝贝', '小天使', '小魔女', '小精灵', '小公举', '小公主', '小王子', '小仙子', '小魔王', '小天使', '小恶魔', '小妖精', '小妖女', '小妖男', '小魔女', '小魔男', '小仙女', '小仙男', '小公主', '小王子', '小天使', '小恶魔', '小妖精', '小妖女', '小妖男', '小魔女', '小魔男', '小仙女', '小仙男', '小公主', '小王子', '小天使', '小恶魔', '小妖精', '小妖女', '小妖男', '小魔女', '小魔男', '小仙女', '小仙男']
@@ -79,13 +109,43 @@ female_names = [
     '小娥', '小娴', '小婉', '小婷', '小媛', '小嫣', '小妍', '小妙', '小妃',
 ]
 
+# Gender codes and weights - 0: unknown, 1: male, 2: female (85% female).
+# Cumulative weights are built once instead of on every random.choices call.
+GENDERS = [0, 1, 2]
+GENDER_WEIGHTS = [0.05, 0.1, 0.85]
+GENDER_CUM_WEIGHTS = list(accumulate(GENDER_WEIGHTS))
+
+# Nickname shapes and how often each is used
+NICKNAME_TYPES = [
+    'name',          # Just a name
+    'prefix_name',   # Prefix + name
+    'name_suffix',   # Name + suffix
+    'popular',       # Popular nickname pattern
+    'emoji_name',    # Emoji + name
+    'name_emoji',    # Name + emoji
+    'full_custom'    # Fully customized
+]
+NICKNAME_TYPE_WEIGHTS = [0.15, 0.15, 0.15, 0.2, 0.1, 0.1, 0.15]
+NICKNAME_TYPE_CUM_WEIGHTS = list(accumulate(NICKNAME_TYPE_WEIGHTS))
+
+# Function to add emoji_count emoji around nickname, each one in front or behind at random
+def add_emojis(nickname, emoji_count):
+    front = []
+    back = []
+    for _ in range(emoji_count):
+        if random.random() < 0.5:
+            front.append(random.choice(emoji_tokens))
+        else:
+            back.append(random.choice(emoji_tokens))
+    return ''.join(reversed(front)) + nickname + ''.join(back)
+
 # Function to generate a random Chinese name
 def generate_chinese_name(gender=None):
     surname = random.choice(chinese_surnames)
 
     # Determine gender if not specified
     if gender is None:
-        gender = random.choices([0, 1, 2], weights=[0.05, 0.1, 0.85])[0]  # 85% female
+        gender = random.choices(GENDERS, cum_weights=GENDER_CUM_WEIGHTS)[0]  # 85% female
 
     # Generate given name based on gender
     if gender == 1:  # male
@@ -101,17 +161,9 @@ def generate_chinese_name(gender=None):
 def generate_wechat_nickname(gender=None):
     # Determine gender if not specified
     if gender is None:
-        gender = random.choices([0, 1, 2], weights=[0.05, 0.1, 0.85])[0]  # 85% female
-
-    nickname_type = random.choices([
-        'name',          # Just a name
-        'prefix_name',   # Prefix + name
-        'name_suffix',   # Name + suffix
-        'popular',       # Popular nickname pattern
-        'emoji_name',    # Emoji + name
-        'name_emoji',    # Name + emoji
-        'full_custom'    # Fully customized
-    ], weights=[0.15, 0.15, 0.15, 0.2, 0.1, 0.1, 0.15])[0]
+        gender = random.choices(GENDERS, cum_weights=GENDER_CUM_WEIGHTS)[0]  # 85% female
+
+    nickname_type = random.choices(NICKNAME_TYPES, cum_weights=NICKNAME_TYPE_CUM_WEIGHTS)[0]
 
     name = generate_chinese_name(gender)
 
@@ -126,10 +178,10 @@ def generate_wechat_nickname(gender=None):
     elif nickname_type == 'popular':
         return random.choice(popular_nicknames)
     elif nickname_type == 'emoji_name':
-        emoji = random.choice(emojis)
+        emoji = random.choice(emoji_tokens)
         return emoji + name
     elif nickname_type == 'name_emoji':
-        emoji = random.choice(emojis)
+        emoji = random.choice(emoji_tokens)
         return name + emoji
     elif nickname_type == 'full_custom':
         # Create a fully customized nickname
@@ -137,12 +189,7 @@ def generate_wechat_nickname(gender=None):
             # Use a popular nickname with emoji
             nickname = random.choice(popular_nicknames)
             if random.random() < 0.7:  # 70% chance to add emoji
-                emoji_count = random.randint(1, 3)
-                for _ in range(emoji_count):
-                    if random.random() < 0.5:
-                        nickname = random.choice(emojis) + nickname
-                    else:
-                        nickname = nickname + random.choice(emojis)
+                nickname = add_emojis(nickname, random.randint(1, 3))
             return nickname
         else:
             # Create a custom nickname with prefix/suffix
@@ -153,12 +200,7 @@ def generate_wechat_nickname(gender=None):
 
             # Add emoji
             if random.random() < 0.7:  # 70% chance to add emoji
-                emoji_count = random.randint(1, 2)
-                for _ in range(emoji_count):
-                    if random.random() < 0.5:
-                        nickname = random.choice(emojis) + nickname
-                    else:
-                        nickname = nickname + random.choice(emojis)
+                nickname = add_emojis(nickname, random.randint(1, 2))
             return nickname
 
 # Function to generate a female name
@@ -170,74 +212,166 @@ def generate_female_name():
         given_name = random.choice(female_names)
         return surname + given_name
 
-# Generate SQL file
-with open('mock_data.sql', 'w', encoding='utf-8') as f:
-    f.write("USE relle_mall_release;\n\n")
-    f.write("START TRANSACTION;\n\n")
-
-    batch_size = 1000
-    for i in range(0, NUM_RECORDS, batch_size):
-        batch_end = min(i + batch_size, NUM_RECORDS)
-        values_list = []
-
-        for j in range(i, batch_end):
-            # Generate unique IDs
-            customer_id = f"{STARTING_ID + j:08d}"
-            unionid = f"ojqzL{uuid.uuid4().hex[:24]}"
-            mini_openid = f"o4GyE5{uuid.uuid4().hex[:24]}"
-
-            # Determine gender - 85% female
-            user_gender = random.choices([0, 1, 2], weights=[0.05, 0.1, 0.85])[0]  # 0: unknown, 1: male, 2: female
-
-            # Generate user information
-            has_nickname = random.random() > 0.2  # 80% chance to have a nickname
-            if has_nickname:
-                wechat_nickname = generate_wechat_nickname(user_gender)
-                # Escape single quotes for SQL
-                wechat_nickname = wechat_nickname.replace("'", "\\'")
-                wechat_nickname = f"'{wechat_nickname}'"
-            else:
-                wechat_nickname = "''"
-
-            # Generate user_name (mostly female names)
-            has_username = random.random() > 0.6  # 40% chance to have a username
-            if has_username:
-                user_name = f"'{generate_female_name()}'"
-            else:
-                user_name = "''"
-
-            has_phone = random.random() > 0.2  # 80% chance to have a phone
-            wechat_phone = f"'1{random.choice(['3', '4', '5', '6', '7', '8', '9'])}{random.randint(10000000, 99999999)}'" if has_phone else "''"
-
-            has_birthdate = random.random() > 0.3  # 70% chance to have a birthdate
-            if has_birthdate:
-                # Women tend to be younger in the dataset
-                if user_gender == 2:  # female
-                    start_date = datetime(1980, 1, 1)
-                    end_date = datetime(2005, 12, 31)
-                else:
-                    start_date = datetime(1960, 1, 1)
-                    end_date = datetime(2000, 12, 31)
-                birthdate = random_date(start_date, end_date)
-                user_birthdate = f"'{birthdate.strftime('%Y-%m-%d')}'"
-            else:
-                user_birthdate = "''"
-
-            # Generate timestamps
-            start_time = datetime(2022, 1, 1)
-            end_time = datetime(2023, 12, 31)
-            create_time = random_date(start_time, end_time)
-            update_time = random_date(create_time, end_time)
-
-            # Format the values for SQL
-            values = f"(NULL, '{unionid}', '{mini_openid}', '{customer_id}', {wechat_nickname}, {wechat_phone}, '/relle-media/avatar/default.png', {user_name}, {user_gender}, {user_birthdate}, '/relle-media/avatar/default.png', '{unionid}', '{create_time.strftime('%Y-%m-%d %H:%M:%S')}', '{unionid}', '{update_time.strftime('%Y-%m-%d %H:%M:%S')}', 0)"
-            values_list.append(values)
-
-        # Write batch insert statement
-        f.write("INSERT INTO `app_customer_info` (`id`, `unionid`, `mini_openid`, `customer_id`, `wechat_nickname`, `wechat_phone`, `wechat_avatar_src`, `user_name`, `user_gender`, `user_birthdate`, `user_avatar_src`, `create_by`, `create_time`, `update_by`, `update_time`, `deleted`) VALUES\n")
-        f.write(",\n".join(values_list))
-        f.write(";\n\n")
-
-    f.write("COMMIT;\n")
-
-print("Mock data SQL script generated successfully!")
+# Functions to draw a unionid, mini_openid or phone number from rng (the random module or a random.Random).
+# The ids are 24 hex digits like uuid4().hex[:24], but drawn from the seeded generator.
+def draw_unionid(rng):
+    return f"ojqzL{rng.getrandbits(96):024x}"
+
+def draw_mini_openid(rng):
+    return f"o4GyE5{rng.getrandbits(96):024x}"
+
+def draw_phone(rng):
+    return f"1{rng.choice(['3', '4', '5', '6', '7', '8', '9'])}{rng.randint(10000000, 99999999)}"
+
+# Function to generate the customer_id, unionid and mini_openid of customer j
+def generate_customer_ids(j):
+    customer_id = f"{STARTING_ID + j:08d}"
+    unionid = draw_unionid(random)
+    mini_openid = draw_mini_openid(random)
+    return customer_id, unionid, mini_openid
+
+# Function to generate one customer row, one random call at a time
+def generate_customer_row(j):
+    # Generate unique IDs
+    customer_id, unionid, mini_openid = generate_customer_ids(j)
+
+    # Determine gender - 85% female
+    user_gender = random.choices(GENDERS, cum_weights=GENDER_CUM_WEIGHTS)[0]  # 0: unknown, 1: male, 2: female
+
+    # Generate user information
+    has_nickname = random.random() > 0.2  # 80% chance to have a nickname
+    wechat_nickname = generate_wechat_nickname(user_gender) if has_nickname else ''
+
+    # Generate user_name (mostly female names)
+    has_username = random.random() > 0.6  # 40% chance to have a username
+    user_name = generate_female_name() if has_username else ''
+
+    has_phone = random.random() > 0.2  # 80% chance to have a phone
+    wechat_phone = draw_phone(random) if has_phone else ''
+
+    has_birthdate = random.random() > 0.3  # 70% chance to have a birthdate
+    if has_birthdate:
+        # Women tend to be younger in the dataset
+        if user_gender == 2:  # female
+            start_date = datetime(1980, 1, 1)
+            end_date = datetime(2005, 12, 31)
+        else:
+            start_date = datetime(1960, 1, 1)
+            end_date = datetime(2000, 12, 31)
+        birthdate = random_date(start_date, end_date)
+        user_birthdate = birthdate.strftime('%Y-%m-%d')
+    else:
+        user_birthdate = ''
+
+    # Generate timestamps
+    create_time = random_date(CREATE_START, CREATE_END)
+    update_time = random_date(create_time, CREATE_END)
+
+    # Values in CUSTOMER_COLUMNS order
+    return (None, unionid, mini_openid, customer_id, wechat_nickname, wechat_phone, DEFAULT_AVATAR, user_name,
+            user_gender, user_birthdate, DEFAULT_AVATAR, unionid, create_time.strftime('%Y-%m-%d %H:%M:%S'),
+            unionid, update_time.strftime('%Y-%m-%d %H:%M:%S'), 0)
+
+# Function to generate the rows for a whole batch from column arrays (customer_columns.py)
+def generate_customer_rows_batch(start, count, rng):
+    from customer_columns import generate_customer_columns
+
+    columns = generate_customer_columns(STARTING_ID + start, count, rng,
+                                        CREATE_START.strftime('%Y-%m-%d'), CREATE_END.strftime('%Y-%m-%d'))
+    return [(None, unionid, mini_openid, customer_id, wechat_nickname, wechat_phone, DEFAULT_AVATAR, user_name,
+             user_gender, user_birthdate, DEFAULT_AVATAR, unionid, create_time, unionid, update_time, 0)
+            for customer_id, unionid, mini_openid, user_gender, wechat_nickname, user_name, wechat_phone,
+                user_birthdate, create_time, update_time in zip(
+                columns['customer_id'], columns['unionid'], columns['mini_openid'], columns['user_gender'],
+                columns['wechat_nickname'], columns['user_name'], columns['wechat_phone'],
+                columns['user_birthdate'], columns['create_time'], columns['update_time'])]
+
+# Function to move the first customer_id, e.g. in worker processes of a run that continues existing data
+def set_starting_id(first_id):
+    global STARTING_ID
+    STARTING_ID = first_id
+
+# Function to set up a worker process that continues after first_id, optionally with
+# a (start, end) 'YYYY-mm-dd' creation window
+def init_customer_worker(first_id, window=None):
+    global CREATE_START, CREATE_END
+    set_starting_id(first_id)
+    if window is not None:
+        CREATE_START, CREATE_END = (datetime.strptime(day, '%Y-%m-%d') for day in window)
+
+# Function to generate one chunk of customers for run_sharded.
+# task is (master_seed, chunk, skip, count, use_columns)
+def generate_customer_chunk(task):
+    master_seed, chunk, skip, count, use_columns = task
+    start = chunk * CHUNK_ROWS
+    random.seed(chunk_seed(master_seed, chunk))
+    if use_columns:
+        import numpy as np
+        rows = generate_customer_rows_batch(start, count, np.random.default_rng([master_seed, chunk]))
+    else:
+        rows = [generate_customer_row(j) for j in range(start, start + count)]
+    return rows[skip:]
+
+# Stages timed by --profile (generator_profile.py)
+PROFILE_STAGES = (
+    ('generate_mock_data', 'generate_customer_row', 'rows'),
+    ('generate_mock_data', 'generate_customer_ids', 'ids'),
+    ('generate_mock_data', 'generate_wechat_nickname', 'names'),
+    ('generate_mock_data', 'generate_female_name', 'names'),
+    ('generate_mock_data', 'random_date', 'dates'),
+    ('customer_columns', 'generate_customer_columns', 'columns'),
+    ('nickname_sampler', 'NICKNAMES.nicknames', 'names'),
+    ('nickname_sampler', 'NICKNAMES.user_names', 'names'),
+)
+
+# Keys kept unique by --guard (uniqueness_guard.py), with how to redraw a repeated one
+GUARDED_COLUMNS = (
+    ('unionid', CUSTOMER_COLUMNS.index('unionid'), draw_unionid),
+    ('mini_openid', CUSTOMER_COLUMNS.index('mini_openid'), draw_mini_openid),
+    ('phone', CUSTOMER_COLUMNS.index('wechat_phone'), draw_phone),
+)
+
+# Modules whose source is part of the --cache key (dataset_cache.py)
+CACHE_SOURCES = ('generate_mock_data', 'customer_columns', 'nickname_sampler', 'mock_loader', 'mock_schema',
+                 'parallel_generate', 'sql_encoder')
+
+# Function to generate the customers into the selected sink
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate app_customer_info mock data')
+    parser.add_argument('--records', type=int, default=NUM_RECORDS, help='number of customers to generate')
+    parser.add_argument('--batched', action='store_true', help='generate whole columns at once (requires numpy)')
+    add_shard_arguments(parser)
+    add_sink_arguments(parser, 'mock_data.sql')
+    add_cache_arguments(parser)
+    add_guard_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    master_seed = args.seed if args.seed is not None else new_master_seed()
+    start_profile(args, PROFILE_STAGES)
+
+    # Customers are generated row by row from per-chunk seeds, so every run is a prefix of a longer one
+    cached = open_cached_run(args, 'generate_mock_data', CACHE_SOURCES, args.records, CUSTOMER_TABLE, CUSTOMER_COLUMNS)
+    if cached and cached.restore():
+        return
+
+    guard = open_guard(args)
+    stages = [synthesize(generate_customer_chunk, args.workers)]
+    if guard:
+        stages.append(unique_rows(guard, GUARDED_COLUMNS))
+    with open_sink(args, CUSTOMER_TABLE, CUSTOMER_COLUMNS, rows=args.records) as sink:
+        if cached:
+            cached.prefill(sink)
+        # Resume after the rows an earlier db load already committed
+        run_pipeline(allocate(master_seed, sink.committed_rows, args.records, args.batched),
+                     *stages, rebatch(args.batch_size), sink=sink)
+    if cached:
+        cached.store()
+    close_guard(args, guard)
+
+    print("Mock data SQL script generated successfully!")
+    finish_profile(args, 'generate_mock_data')
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,16 @@
 import random
 import string
-import time
 from datetime import datetime, timedelta
-import uuid
+
+from mock_loader import add_sink_arguments, open_sink
+from mock_pipeline import allocate, rebatch, run_pipeline, synthesize
+from mock_schema import ORDER_COLUMNS, ORDER_STATUSES, ORDER_TABLE, ROOM_IDS, STORE_IDS
+from dataset_cache import add_cache_arguments, open_cached_run
+from uniqueness_guard import add_guard_arguments, close_guard, open_guard, unique_rows
+from generator_profile import add_profile_arguments, finish_profile, start_profile
+from order_ids import make_order_id
+from order_rollups import add_rollup_arguments, open_rollups
+from parallel_generate import CHUNK_ROWS, add_shard_arguments, chunk_seed, new_master_seed
 
 # Number of records to generate
 NUM_RECORDS = 37222  # To reach 41,491 total (current 4,269 + 37,222 new)
@@ -10,6 +18,10 @@ NUM_RECORDS = 37222  # To reach 41,491 total (current 4,269 + 37,222 new)
 # Last ID in the database
 STARTING_ID = 10000  # Using a much higher starting ID to avoid conflicts
 
+# Uniform arrivals fall on days in [ORDER_START, ORDER_END)
+ORDER_START = datetime(2022, 1, 1)
+ORDER_END = datetime(2023, 12, 31)
+
 # Function to generate a random date between start_date and end_date
 def random_date(start_date, end_date):
     time_between_dates = end_date - start_date
@@ -17,12 +29,6 @@ def random_date(start_date, end_date):
     random_number_of_days = random.randrange(days_between_dates)
     return start_date + timedelta(days=random_number_of_days)
 
-# Function to generate a random order ID
-def generate_order_id(store_id):
-    timestamp = datetime.now().strftime("%y%m%d%H%M%S")
-    random_num = ''.join(random.choices(string.digits, k=3))
-    return f"{store_id}{timestamp}{random_num}"
-
 # Function to generate a random phone number
 def generate_phone_number():
     prefix = random.choice(['130', '131', '132', '133', '134', '135', '136', '137', '138', '139',
@@ -34,13 +40,10 @@ def generate_phone_number():
 # Function to get unionid from app_customer_info table
 def get_unionids_from_db():
     # This is a placeholder. In a real scenario, you would query the database.
-    # For now, we'll generate random unionids
-    return [f"ojqzL{uuid.uuid4().hex[:24]}" for _ in range(1000)]
+    # For now, we'll generate random unionids (from the seeded generator)
+    return [f"ojqzL{random.getrandbits(96):024x}" for _ in range(1000)]
 
 # Constants based on the database analysis
-STORE_IDS = ['SH0001', 'SH0002', 'SH0003']
-ROOM_IDS = ['01', '02', '03', '04', '05', '06']
-ORDER_STATUSES = [2, 4, 16, 1024]  # Based on the distinct values in the database
 CUSTOMER_SOURCES = ['小程序']  # Default value from the database
 
 # Chinese names for contact_name
@@ -57,65 +60,184 @@ CHINESE_NAMES = [
     '刘芳', '陈娟', '杨静', '赵芳', '吴静', '郑娟', '王静', '李芳'
 ]
 
-# Get unionids (in a real scenario, you would query the database)
-unionids = get_unionids_from_db()
-
-# Generate SQL file
-with open('service_order_mock_data.sql', 'w', encoding='utf-8') as f:
-    f.write("USE relle_mall_release;\n\n")
-    f.write("START TRANSACTION;\n\n")
-
-    batch_size = 1000
-    for i in range(0, NUM_RECORDS, batch_size):
-        batch_end = min(i + batch_size, NUM_RECORDS)
-        values_list = []
-
-        for j in range(i, batch_end):
-            # Generate unique IDs and values
-            id = STARTING_ID + j
-            store_id = random.choice(STORE_IDS)
-            order_id = generate_order_id(store_id)
-            unionid = random.choice(unionids)
-            room_id = random.choice(ROOM_IDS)
-
-            # Generate prices
-            origin_price = round(random.uniform(100, 2000), 2)
-            reduction_amount = round(random.uniform(0, origin_price * 0.3), 2) if random.random() < 0.3 else 0
-            order_amount = origin_price - reduction_amount
-
-            # Generate contact information
-            contact_name = random.choice(CHINESE_NAMES)
-            contact_phone = generate_phone_number()
-
-            # Generate order status and related fields
-            order_status = random.choice(ORDER_STATUSES)
-
-            # Generate timestamps
-            start_time = datetime(2022, 1, 1)
-            end_time = datetime(2023, 12, 31)
-            create_time = random_date(start_time, end_time)
-            update_time = random_date(create_time, end_time)
-
-            # Other fields
-            create_by = unionid
-            update_by = random.choice([unionid, 'signIn', 'AutoCloseOrderJob'])
-            deleted = 0
-            modify_num = random.randint(0, 3)
-            customer_source = '小程序'
-            source_order_id = 'NULL'
-            write_off = 0
-            write_off_time = 'NULL'
-            write_off_user = "''"
-
-            # Format the values for SQL
-            values = f"({id}, '{order_id}', '{unionid}', '{store_id}', '{room_id}', {order_amount:.2f}, '{contact_name}', '{contact_phone}', {origin_price:.2f}, {reduction_amount:.2f}, {order_status}, '{create_time.strftime('%Y-%m-%d %H:%M:%S')}', '{create_by}', '{update_time.strftime('%Y-%m-%d %H:%M:%S')}', '{update_by}', {deleted}, {modify_num}, '{customer_source}', {source_order_id}, {write_off}, {write_off_time}, {write_off_user})"
-            values_list.append(values)
-
-        # Write batch insert statement
-        f.write("INSERT INTO `app_service_order` (`id`, `order_id`, `unionid`, `sotre_id`, `room_id`, `order_amount`, `contact_name`, `contact_phone`, `origin_price`, `reduction_amount`, `order_status`, `create_time`, `create_by`, `update_time`, `update_by`, `deleted`, `modify_num`, `customer_source`, `source_order_id`, `write_off`, `write_off_time`, `write_off_user`) VALUES\n")
-        f.write(",\n".join(values_list))
-        f.write(";\n\n")
-
-    f.write("COMMIT;\n")
-
-print("Mock data SQL script generated successfully!")
+# Function to generate one app_service_order row
+# arrival is an optional (store_id, room_id, create_time, update_time) from order_arrivals;
+# without it the store, room and dates are drawn uniformly
+def generate_order_row(j, unionid, arrival=None):
+    # Generate unique IDs and values
+    id = STARTING_ID + j
+    if arrival is None:
+        store_id = random.choice(STORE_IDS)
+        room_id = random.choice(ROOM_IDS)
+
+    # Generate prices
+    origin_price = round(random.uniform(100, 2000), 2)
+    reduction_amount = round(random.uniform(0, origin_price * 0.3), 2) if random.random() < 0.3 else 0.0
+    order_amount = origin_price - reduction_amount
+
+    # Generate contact information
+    contact_name = random.choice(CHINESE_NAMES)
+    contact_phone = generate_phone_number()
+
+    # Generate order status and related fields
+    order_status = random.choice(ORDER_STATUSES)
+
+    # Generate timestamps
+    if arrival is None:
+        create_time = random_date(ORDER_START, ORDER_END)
+        update_time = random_date(create_time, ORDER_END)
+        create_time = create_time.strftime('%Y-%m-%d %H:%M:%S')
+        update_time = update_time.strftime('%Y-%m-%d %H:%M:%S')
+    else:
+        store_id, room_id, create_time, update_time = arrival
+
+    # order_id embeds create_time and the row id, so it cannot collide
+    order_id = make_order_id(store_id, create_time, id)
+
+    # Other fields
+    create_by = unionid
+    update_by = random.choice([unionid, 'signIn', 'AutoCloseOrderJob'])
+    deleted = 0
+    modify_num = random.randint(0, 3)
+    customer_source = '小程序'
+    source_order_id = None
+    write_off = 0
+    write_off_time = None
+    write_off_user = ''
+
+    # Values in ORDER_COLUMNS order
+    return (id, order_id, unionid, store_id, room_id, order_amount, contact_name, contact_phone, origin_price,
+            reduction_amount, order_status, create_time, create_by, update_time, update_by, deleted, modify_num,
+            customer_source, source_order_id, write_off, write_off_time, write_off_user)
+
+# Per-process state shared by every chunk, set up by init_order_worker.
+# Orders either pick uniformly from a list of unionids or ask a customer source such as
+# customer_index.CustomerIndex for sample(start, count, rng) unionids.
+worker_unionids = None
+worker_customers = None
+worker_plan = None
+
+# window is an optional (start, end) 'YYYY-mm-dd' range for uniform arrivals
+def init_order_worker(unionids, plan, customers=None, first_id=None, window=None):
+    global worker_unionids, worker_customers, worker_plan, STARTING_ID, ORDER_START, ORDER_END
+    worker_unionids = unionids
+    worker_customers = customers
+    worker_plan = plan
+    if first_id is not None:
+        STARTING_ID = first_id
+    if window is not None:
+        ORDER_START, ORDER_END = (datetime.strptime(day, '%Y-%m-%d') for day in window)
+
+# Function to generate one chunk of orders for run_sharded.
+# task is (master_seed, chunk, skip, count)
+def generate_order_chunk(task):
+    master_seed, chunk, skip, count = task
+    start = chunk * CHUNK_ROWS
+    random.seed(chunk_seed(master_seed, chunk))
+    arrivals = [None] * count
+    if worker_plan is not None or worker_customers is not None:
+        import numpy as np
+        rng = np.random.default_rng([master_seed, chunk])
+    if worker_plan is not None:
+        from order_arrivals import arrival_rows
+        arrivals = arrival_rows(worker_plan, start, start + count, rng)
+    if worker_customers is None:
+        unionids = [random.choice(worker_unionids) for _ in range(count)]
+    else:
+        unionids = worker_customers.sample(start, count, rng)
+    rows = [generate_order_row(j, unionid, arrival)
+            for j, unionid, arrival in zip(range(start, start + count), unionids, arrivals)]
+    return rows[skip:]
+
+# Function to register the arrival model options
+def add_arrival_arguments(parser):
+    parser.add_argument('--arrivals', choices=['seasonal', 'uniform'], default='seasonal',
+                        help='seasonal: weekday/hour/month/store intensity curves (requires numpy); uniform: one random day per order')
+    parser.add_argument('--room-capacity', type=int, default=None,
+                        help='bookings per room per hour for seasonal arrivals (0 = unlimited)')
+
+# Function to plan the arrivals of num_orders orders, or None for uniform arrivals.
+# window is an optional (start, end) 'YYYY-mm-dd' range replacing the default order window;
+# with parser, orders that do not fit the room capacity are reported as a usage error.
+def build_arrival_plan(args, num_orders, master_seed, window=None, parser=None):
+    if args.arrivals != 'seasonal':
+        return None
+    import numpy as np
+    from order_arrivals import ORDER_WINDOW_END, ORDER_WINDOW_START, PLAN_STREAM, ROOM_CAPACITY, ArrivalModel
+
+    room_capacity = ROOM_CAPACITY if args.room_capacity is None else args.room_capacity
+    start, end = window or (ORDER_WINDOW_START, ORDER_WINDOW_END)
+    model = ArrivalModel(start, end, room_capacity=room_capacity)
+    try:
+        return model.plan(num_orders, np.random.default_rng([master_seed, PLAN_STREAM]))
+    except ValueError as error:
+        if parser is None:
+            raise
+        parser.error(f"{error} (--room-capacity {room_capacity})")
+
+# Stages timed by --profile (generator_profile.py)
+PROFILE_STAGES = (
+    ('generate_service_order_data', 'generate_order_row', 'rows'),
+    ('generate_service_order_data', 'generate_phone_number', 'phones'),
+    ('generate_service_order_data', 'random_date', 'dates'),
+    ('generate_service_order_data', 'make_order_id', 'ids'),
+    ('order_arrivals', 'arrival_rows', 'arrivals'),
+)
+
+# Keys checked by --guard (uniqueness_guard.py); order_ids are built from the row id, so repeats are only reported
+GUARDED_COLUMNS = (('order_id', ORDER_COLUMNS.index('order_id'), None),)
+
+# Modules whose source is part of the --cache key (dataset_cache.py)
+CACHE_SOURCES = ('generate_service_order_data', 'order_arrivals', 'order_ids', 'mock_loader', 'mock_schema',
+                 'parallel_generate', 'sql_encoder')
+
+# Function to generate the orders into the selected sink
+def main():
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Generate app_service_order mock data')
+    parser.add_argument('--records', type=int, default=NUM_RECORDS, help='number of orders to generate')
+    add_arrival_arguments(parser)
+    add_shard_arguments(parser)
+    add_sink_arguments(parser, 'service_order_mock_data.sql')
+    add_rollup_arguments(parser)
+    add_cache_arguments(parser)
+    add_guard_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+    master_seed = args.seed if args.seed is not None else new_master_seed()
+    start_profile(args, PROFILE_STAGES)
+
+    # Seasonal arrivals are planned for the whole run, so only uniform runs are prefixes of longer ones
+    cached = open_cached_run(args, 'generate_service_order_data', CACHE_SOURCES,
+                             args.records if args.arrivals == 'uniform' else None, ORDER_TABLE, ORDER_COLUMNS)
+    if cached and cached.restore():
+        return
+
+    # Get unionids (in a real scenario, you would query the database)
+    random.seed(chunk_seed(master_seed, 'unionids'))
+    unionids = get_unionids_from_db()
+    plan = build_arrival_plan(args, args.records, master_seed, parser=parser)
+
+    guard = open_guard(args)
+    stages = [synthesize(generate_order_chunk, args.workers, init_order_worker, (unionids, plan))]
+    if guard:
+        stages.append(unique_rows(guard, GUARDED_COLUMNS))
+    rollups = open_rollups(args)
+    with open_sink(args, ORDER_TABLE, ORDER_COLUMNS, rollups=rollups, rows=args.records) as sink:
+        if cached:
+            cached.prefill(sink)
+        # Resume after the rows an earlier db load (or the cache) already committed
+        run_pipeline(allocate(master_seed, sink.committed_rows, args.records), *stages,
+                     rebatch(args.batch_size), sink=sink)
+    if cached:
+        cached.store()
+    close_guard(args, guard)
+    if rollups:
+        rollups.write(args.rollups)
+
+    print("Mock data SQL script generated successfully!")
+    finish_profile(args, 'generate_service_order_data')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+import argparse
+import hashlib
+import json
+import os
+import random
+
+import numpy as np
+
+import generate_frequent_orders
+import generate_mock_data
+import generate_service_order_data
+from customer_index import CustomerIndex
+from generator_state import load_state, save_state
+from mock_loader import add_sink_arguments, batched, connection_factory, open_sink
+from mock_schema import CUSTOMER_COLUMNS, CUSTOMER_TABLE, ORDER_COLUMNS, ORDER_TABLE
+from order_analytics import OrderAggregator
+from order_rollups import add_rollup_arguments, open_rollups
+from parallel_generate import (CHUNK_ROWS, add_shard_arguments, chunk_seed, derive_seed, new_master_seed, row_chunks,
+                               run_sharded)
+
+# Target-driven generation.
+# Instead of hard-coding "3991 - 809 = 3182" style arithmetic and trimming the
+# surplus afterwards with a NOT IN delete, state the final totals, take a
+# snapshot of what the database already holds, and generate exactly the
+# difference in one pass:
+#   customers       new customers continuing after the highest customer_id
+#   frequent_users  new customers given >= 4 order days in one month; or
+#   frequent_users_by_month  {"2023-03": 120, ...}: new frequent users per month
+#   orders          frequent users' orders plus regular orders, continuing after the highest id
+#   revenue         order amounts are rescaled batch by batch so the total lands on the target
+# A db load is keyed by the target and --seed: the first run saves its snapshot as
+# <job>.snapshot.json, and running the same target and seed again reuses it and
+# skips the rows the interrupted load already committed.
+
+ORDER_AMOUNT = ORDER_COLUMNS.index('order_amount')
+ORIGIN_PRICE = ORDER_COLUMNS.index('origin_price')
+REDUCTION_AMOUNT = ORDER_COLUMNS.index('reduction_amount')
+
+# Fields of an order that hold its customer's unionid
+UNIONID_FIELDS = [ORDER_COLUMNS.index(column) for column in ('unionid', 'create_by', 'update_by')]
+
+# A customer with at most this many orders can never reach MIN_DAYS_WITH_ORDERS order days
+MAX_REGULAR_ORDERS_PER_CUSTOMER = generate_frequent_orders.MIN_DAYS_WITH_ORDERS - 1
+
+# Gives the regular orders their customers round-robin, so no customer gets more than
+# MAX_REGULAR_ORDERS_PER_CUSTOMER of them and none becomes a frequent user by accident
+class RoundRobinCustomers:
+    def __init__(self, index):
+        self.index = index
+
+    def sample(self, start, count, rng):
+        return self.index.unionids(np.arange(start, start + count) % self.index.size)
+
+# Function to read the current totals from a database. Orders are streamed through
+# OrderAggregator, which works the same on MySQL and on a SQLite stand-in.
+def read_snapshot(url):
+    connect, _ = connection_factory(url)
+    connection = connect()
+    cursor = connection.cursor()
+    cursor.execute(f"SELECT COUNT(*), COALESCE(MAX(CAST(customer_id AS SIGNED INTEGER)), 0) FROM {CUSTOMER_TABLE}")
+    customers, max_customer_id = cursor.fetchone()
+    cursor.execute(f"SELECT COUNT(*), COALESCE(MAX(id), 0) FROM {ORDER_TABLE}")
+    orders, max_order_id = cursor.fetchone()
+
+    aggregator = OrderAggregator()
+    cursor.execute(f"SELECT unionid, room_id, order_amount, create_time, deleted FROM {ORDER_TABLE}")
+    while True:
+        rows = cursor.fetchmany(100000)
+        if not rows:
+            break
+        aggregator.add_rows(rows, positions=range(5))
+    connection.close()
+    frequent_users, frequent_users_by_month = aggregator.frequent_users()
+
+    return {
+        'customers': int(customers),
+        'max_customer_id': int(max_customer_id),
+        'orders': int(orders),
+        'max_order_id': int(max_order_id),
+        'frequent_users': frequent_users,
+        'frequent_users_by_month': frequent_users_by_month,
+        'revenue': round(float(aggregator.day_revenue.sum()), 2),
+    }
+
+# Function to return the (year, month) of every new frequent user, month by month,
+# for a target of frequent users per 'YYYY-mm' month
+def plan_frequent_months(target_by_month, snapshot_by_month):
+    months = []
+    for key, count in sorted(target_by_month.items()):
+        try:
+            year, month = map(int, key.split('-'))
+        except ValueError:
+            raise SystemExit(f"frequent_users_by_month keys are 'YYYY-mm' months, not {key!r}")
+        missing = count - snapshot_by_month.get(key, 0)
+        if missing < 0:
+            raise SystemExit(f"the database already has {snapshot_by_month[key]} frequent users in {key}, "
+                             f"more than the target {count}")
+        months += [(year, month)] * missing
+    return months
+
+# Function to work out how many rows of each kind are still missing
+def plan_increment(target, snapshot):
+    names = [name for name in ('customers', 'orders', 'frequent_users') if name in target]
+    plan = {name: target[name] - snapshot[name] for name in names}
+    for name, missing in plan.items():
+        if missing < 0:
+            raise SystemExit(f"the database already has {snapshot[name]} {name}, more than the target {target[name]}")
+    # Every new frequent user is frequent in exactly one month
+    plan['frequent_months'] = None
+    if target.get('frequent_users_by_month') is not None:
+        plan['frequent_months'] = plan_frequent_months(target['frequent_users_by_month'],
+                                                       snapshot.get('frequent_users_by_month', {}))
+        if plan.setdefault('frequent_users', len(plan['frequent_months'])) != len(plan['frequent_months']):
+            raise SystemExit(f"frequent_users_by_month adds {len(plan['frequent_months'])} frequent users, "
+                             f"frequent_users {plan['frequent_users']}")
+    elif 'frequent_users' not in plan:
+        raise SystemExit('the target needs frequent_users or frequent_users_by_month')
+    if plan['frequent_users'] > plan['customers']:
+        raise SystemExit(f"{plan['frequent_users']} new frequent users need at least as many new customers")
+    plan['revenue'] = None if target.get('revenue') is None else round(target['revenue'] - snapshot['revenue'], 2)
+    if plan['revenue'] is not None:
+        if plan['revenue'] < 0:
+            raise SystemExit(f"the database already has {snapshot['revenue']} revenue, more than the target {target['revenue']}")
+        if plan['revenue'] and not plan['orders']:
+            raise SystemExit(f"{plan['revenue']} missing revenue needs at least one new order")
+    return plan
+
+# Function to rescale order amounts so that the revenue of the stream is exactly revenue.
+# After every batch the running total is brought to the same share of the target as the
+# share of rows written so far; the rounding remainder goes to the batch's last order.
+def rescale_revenue(batches, total_rows, revenue):
+    target_cents = round(revenue * 100)
+    done_rows = 0
+    done_cents = 0
+    for batch in batches:
+        done_rows += len(batch)
+        goal_cents = target_cents * done_rows // total_rows
+        factor = (goal_cents - done_cents) / sum(round(row[ORDER_AMOUNT] * 100) for row in batch)
+
+        prices = []
+        for row in batch:
+            origin = round(row[ORIGIN_PRICE] * 100 * factor)
+            reduction = round(row[REDUCTION_AMOUNT] * 100 * factor)
+            prices.append([origin, reduction])
+        prices[-1][0] += goal_cents - done_cents - sum(origin - reduction for origin, reduction in prices)
+        done_cents = goal_cents
+
+        scaled = []
+        for row, (origin, reduction) in zip(batch, prices):
+            row = list(row)
+            row[ORIGIN_PRICE] = origin / 100
+            row[REDUCTION_AMOUNT] = reduction / 100
+            row[ORDER_AMOUNT] = (origin - reduction) / 100
+            scaled.append(tuple(row))
+        yield scaled
+
+# Function to drop the first count rows of a stream of batches, for a resumed db load.
+# The batches are cut after revenue is rescaled, so the rows that remain are the same.
+def skip_rows(batches, count):
+    for batch in batches:
+        if count < len(batch):
+            yield batch[count:]
+        count = max(count - len(batch), 0)
+
+# Function to generate the missing customers into sink and return them as a CustomerIndex.
+# All chunks are generated so the index is complete; rows a resumed db load already
+# committed are not written again.
+def generate_customers(args, sink, seed, count, first_id):
+    index = CustomerIndex(count)
+    tasks = ((seed, chunk, skip, rows, args.batched) for chunk, skip, rows in row_chunks(0, count))
+    for chunk, rows in enumerate(run_sharded(generate_mock_data.generate_customer_chunk, tasks, args.workers,
+                                             initializer=generate_mock_data.set_starting_id, initargs=(first_id,))):
+        index.extend([row[1] for row in rows])
+        rows = rows[max(sink.committed_rows - chunk * CHUNK_ROWS, 0):]
+        for batch in batched(rows, args.batch_size):
+            sink.write_batch(batch)
+    return index
+
+# Function to stand in for the unionid of the i-th new customer until the customers exist
+def frequent_placeholder(i):
+    return f"frequent:{i}"
+
+# Function to generate one chunk of frequent users, each frequent in the (year, month) given for it.
+# task is (master_seed, chunk, customer_ids, months)
+def generate_monthly_frequent_chunk(task):
+    master_seed, chunk, customer_ids, months = task
+    random.seed(chunk_seed(master_seed, chunk))
+    return list(generate_frequent_orders.generate_frequent_order_rows(customer_ids, 0, months))
+
+# Function to generate the frequent users' orders before the customers exist. They are
+# drawn the same whatever the unionids are, so placeholders are filled in afterwards.
+# months, if given, holds the (year, month) each frequent user is frequent in.
+def generate_frequent(args, seed, count, first_id, months=None):
+    placeholders = [frequent_placeholder(i) for i in range(count)]
+    per_chunk = generate_frequent_orders.CUSTOMERS_PER_CHUNK
+    starts = enumerate(range(0, count, per_chunk))
+    if months:
+        chunks = run_sharded(generate_monthly_frequent_chunk,
+                             ((seed, chunk, placeholders[start:start + per_chunk], months[start:start + per_chunk])
+                              for chunk, start in starts), args.workers)
+    else:
+        chunks = run_sharded(generate_frequent_orders.generate_frequent_order_chunk,
+                             ((seed, chunk, placeholders[start:start + per_chunk]) for chunk, start in starts),
+                             args.workers)
+    return list(generate_frequent_orders.merge_order_chunks(chunks, first_id))
+
+# Function to check that the regular orders left after the frequent ones fit the plan;
+# returns their count and arrival plan
+def plan_regular_orders(args, parser, seed, plan, frequent_count):
+    regular = plan['orders'] - frequent_count
+    if regular < 0:
+        raise SystemExit(f"the {plan['frequent_users']} frequent users alone place {frequent_count} orders, "
+                         f"more than the {plan['orders']} missing orders")
+    if regular > MAX_REGULAR_ORDERS_PER_CUSTOMER * plan['customers']:
+        raise SystemExit(f"{regular} regular orders need at least {-(-regular // MAX_REGULAR_ORDERS_PER_CUSTOMER)} "
+                         f"new customers so that none becomes a frequent user")
+    arrival_plan = generate_service_order_data.build_arrival_plan(args, regular, derive_seed(seed, 'regular'),
+                                                                  parser=parser)
+    return regular, arrival_plan
+
+# Function to stream the frequent users' orders, with their unionids filled in, followed by the regular orders
+def generate_orders(args, seed, index, plan, frequent_orders, regular, arrival_plan, first_id):
+    count = plan['frequent_users']
+    unionids = dict(zip(map(frequent_placeholder, range(count)), index.unionids(np.arange(count))))
+    for batch in batched(frequent_orders, args.batch_size):
+        filled = []
+        for row in batch:
+            row = list(row)
+            for position in UNIONID_FIELDS:
+                row[position] = unionids.get(row[position], row[position])
+            filled.append(tuple(row))
+        yield filled
+
+    regular_seed = derive_seed(seed, 'regular')
+    tasks = ((regular_seed, chunk, skip, count) for chunk, skip, count in row_chunks(0, regular))
+    for rows in run_sharded(generate_service_order_data.generate_order_chunk, tasks, args.workers,
+                            initializer=generate_service_order_data.init_order_worker,
+                            initargs=(None, arrival_plan, RoundRobinCustomers(index),
+                                      first_id + len(frequent_orders) + 1)):
+        yield from batched(rows, args.batch_size)
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate exactly the rows needed to reach target totals')
+    parser.add_argument('target', help='JSON file with customers, orders, frequent_users (or frequent_users_by_month) '
+                                       'and optionally revenue')
+    parser.add_argument('--snapshot', required=True,
+                        help='JSON file with the current totals, or a database URL to read them from')
+    parser.add_argument('--save-snapshot', help='write the snapshot that was used to this JSON file')
+    parser.add_argument('--batched', action='store_true', help='generate customer columns with numpy')
+    generate_service_order_data.add_arrival_arguments(parser)
+    add_shard_arguments(parser)
+    add_sink_arguments(parser, 'mock_data.sql')
+    parser.add_argument('--order-output', default='service_order_mock_data.sql', help='output file for the orders')
+    add_rollup_arguments(parser)
+    args = parser.parse_args()
+    master_seed = args.seed if args.seed is not None else new_master_seed()
+
+    with open(args.target, encoding='utf-8') as f:
+        target = json.load(f)
+    # Progress is keyed by the target and seed, so that running them again continues an
+    # interrupted db load. The load's own committed rows would change a fresh snapshot and
+    # with it the plan, so the snapshot the load started from is kept next to the job.
+    if not args.job:
+        digest = hashlib.sha256(f"{json.dumps(target, sort_keys=True)}:{master_seed}".encode()).hexdigest()
+        args.job = f"target-{digest[:12]}"
+    job_snapshot = f"{args.job}.snapshot.json" if args.sink == 'db' else None
+    if job_snapshot and os.path.exists(job_snapshot):
+        snapshot = load_state(job_snapshot)
+        print(f"Continuing job {args.job} from the snapshot in {job_snapshot}")
+    elif args.snapshot.endswith('.json'):
+        with open(args.snapshot, encoding='utf-8') as f:
+            snapshot = json.load(f)
+    else:
+        snapshot = read_snapshot(args.snapshot)
+    if args.save_snapshot:
+        with open(args.save_snapshot, 'w', encoding='utf-8') as f:
+            json.dump(snapshot, f, indent=2)
+
+    plan = plan_increment(target, snapshot)
+    print(f"Generating {plan['customers']} customers, {plan['frequent_users']} of them frequent users, "
+          f"and {plan['orders']} orders")
+
+    # Everything that can reject the plan runs before any sink is opened. The frequent
+    # orders are generated up front to count them; they are held in memory anyway.
+    order_seed = derive_seed(master_seed, 'orders')
+    frequent_orders = generate_frequent(args, order_seed, plan['frequent_users'], snapshot['max_order_id'],
+                                        plan['frequent_months'])
+    regular, arrival_plan = plan_regular_orders(args, parser, order_seed, plan, len(frequent_orders))
+
+    if job_snapshot:
+        save_state(job_snapshot, snapshot)
+        print(f"Seed {master_seed}, job {args.job}: after an interruption, run again with --seed {master_seed}")
+
+    rollups = open_rollups(args)
+    with open_sink(args, CUSTOMER_TABLE, CUSTOMER_COLUMNS, rollups=rollups, rows=plan['customers']) as sink:
+        index = generate_customers(args, sink, derive_seed(master_seed, 'customers'), plan['customers'],
+                                   snapshot['max_customer_id'] + 1)
+
+    batches = generate_orders(args, order_seed, index, plan, frequent_orders, regular, arrival_plan,
+                              snapshot['max_order_id'])
+    if plan['revenue'] is not None and plan['orders']:
+        batches = rescale_revenue(batches, plan['orders'], plan['revenue'])
+    with open_sink(args, ORDER_TABLE, ORDER_COLUMNS, output=args.order_output, rollups=rollups,
+                   rows=plan['orders']) as sink:
+        for batch in skip_rows(batches, sink.committed_rows):
+            sink.write_batch(batch)
+    if rollups:
+        rollups.write(args.rollups)
+
+    print("Target data generated successfully!")
+
+if __name__ == '__main__':
+    main()
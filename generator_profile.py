@@ -0,0 +1,167 @@
+import functools
+import importlib
+import json
+import os
+import resource
+import sys
+import time
+
+# Opt-in instrumentation for the generators (--profile).
+# A generator lists its stages as (module, attribute, stage) triples, e.g. the
+# nickname synthesis or date math functions; when profiling is enabled each of
+# those functions is replaced by a wrapper that counts calls and time, so with
+# profiling off nothing is wrapped and nothing is paid. Stages nest: a row stage
+# includes the names and dates drawn for the row. run_sharded brings the stage
+# times of worker processes back with every chunk, and open_sink counts the rows
+# and time of every batch written. The report adds rows/sec, bytes written and
+# the peak RSS of the generator and its workers.
+
+# Stages every generator has
+SINK_STAGES = (
+    ('mock_loader', 'encode_sql_values', 'encode'),
+    ('mock_loader', 'encode_tsv_lines', 'encode'),
+)
+
+# Function to import a stage's module; the generator run as a script is __main__, not its module name
+def resolve_module(name):
+    main = sys.modules.get('__main__')
+    if os.path.splitext(os.path.basename(getattr(main, '__file__', '') or ''))[0] == name:
+        return main
+    return importlib.import_module(name)
+
+# Function to return max RSS in MB as reported by getrusage (kilobytes on Linux, bytes on macOS)
+def max_rss_mb(who):
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1 << 20) if sys.platform == 'darwin' else rss / 1024
+
+class Profiler:
+    def __init__(self):
+        self.enabled = False
+        self.specs = ()
+        self.stages = {}
+        self.rows = 0
+        self.paths = []
+        self.started = None
+        self.pid = None
+
+    # Function to start profiling with the given (module, attribute, stage) specs
+    def enable(self, specs):
+        self.enabled = True
+        self.specs = tuple(specs)
+        self.started = time.perf_counter()
+        self.pid = os.getpid()
+        for module, attribute, stage in self.specs + SINK_STAGES:
+            try:
+                owner = resolve_module(module)
+            except ImportError:
+                # e.g. the numpy-based modules when numpy is not installed
+                continue
+            *path, name = attribute.split('.')
+            for part in path:
+                owner = getattr(owner, part)
+            setattr(owner, name, self.timed(getattr(owner, name), stage))
+
+    # Function to wrap function so its calls count towards stage
+    def timed(self, function, stage):
+        totals = self.stages.setdefault(stage, [0, 0.0])
+        perf_counter = time.perf_counter
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            started = perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                totals[0] += 1
+                totals[1] += perf_counter() - started
+        return wrapper
+
+    # Function to return the stage totals gathered since the last call and start again from zero
+    def take_stages(self):
+        taken = {stage: tuple(totals) for stage, totals in self.stages.items() if totals[0]}
+        for totals in self.stages.values():
+            totals[0] = 0
+            totals[1] = 0.0
+        return taken
+
+    # Function to add stage totals taken in another process (or by take_stages here)
+    def merge_stages(self, taken):
+        for stage, (calls, seconds) in taken.items():
+            totals = self.stages.setdefault(stage, [0, 0.0])
+            totals[0] += calls
+            totals[1] += seconds
+
+    # Function to count the rows and time of every batch written to sink, and its output file
+    def track_sink(self, sink):
+        if getattr(sink, 'path', None):
+            self.paths.append(sink.path)
+        write_batch = self.timed(sink.write_batch, 'write')
+
+        def counted(rows, *encoded):
+            self.rows += len(rows)
+            write_batch(rows, *encoded)
+        sink.write_batch = counted
+        return sink
+
+    # Function to build the report of the run so far
+    def report(self, name, args=None):
+        seconds = time.perf_counter() - self.started
+        stages = self.take_stages()
+        return {
+            'generator': name,
+            'args': {key: value for key, value in vars(args).items() if key != 'profile'} if args else {},
+            'rows': self.rows,
+            'seconds': round(seconds, 3),
+            'rows_per_sec': round(self.rows / seconds, 1) if seconds else None,
+            'bytes_written': sum(os.path.getsize(path) for path in self.paths if os.path.exists(path)) if self.paths else None,
+            'peak_rss_mb': round(max_rss_mb(resource.RUSAGE_SELF), 1),
+            'peak_worker_rss_mb': round(max_rss_mb(resource.RUSAGE_CHILDREN), 1),
+            'stages': {stage: {'calls': calls, 'seconds': round(stage_seconds, 3),
+                               'share': round(stage_seconds / seconds, 3) if seconds else None}
+                       for stage, (calls, stage_seconds) in sorted(stages.items(), key=lambda item: -item[1][1])},
+        }
+
+PROFILER = Profiler()
+
+# Runs a chunk function with profiling on in whichever process it lands in and
+# returns the chunk together with the stage totals it added
+class ProfiledTask:
+    def __init__(self, function, specs):
+        self.function = function
+        self.specs = specs
+
+    def __call__(self, task):
+        if PROFILER.pid != os.getpid():
+            # A worker: forked ones inherit the parent's totals, spawned ones start unwrapped
+            if PROFILER.enabled:
+                PROFILER.take_stages()
+                PROFILER.pid = os.getpid()
+            else:
+                PROFILER.enable(self.specs)
+        result = self.function(task)
+        return result, PROFILER.take_stages()
+
+# Function to register the profiling option on a generator's argument parser
+def add_profile_arguments(parser):
+    parser.add_argument('--profile', nargs='?', const='-',
+                        help='time the generation stages; write the report to this JSON file (or only print it)')
+
+# Function to enable profiling if --profile was given
+def start_profile(args, specs):
+    if args.profile:
+        PROFILER.enable(specs)
+
+# Function to print the profile report and write it to the --profile file
+def finish_profile(args, name):
+    if not args.profile:
+        return
+    report = PROFILER.report(name, args)
+    bytes_written = report['bytes_written']
+    print(f"{report['rows']} rows in {report['seconds']:.2f}s, {report['rows_per_sec']:,.0f} rows/sec, "
+          f"{'-' if bytes_written is None else f'{bytes_written / 1e6:.1f} MB'} written, "
+          f"peak RSS {report['peak_rss_mb']:.0f} MB (workers {report['peak_worker_rss_mb']:.0f} MB)")
+    for stage, totals in report['stages'].items():
+        print(f"  {stage:<12} {totals['seconds']:>9.3f}s {totals['share']:>6.1%} {totals['calls']:>12,} calls")
+    if args.profile != '-':
+        with open(args.profile, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,37 @@
+import json
+import os
+
+# State of a generated dataset, kept between runs so that a later run can add
+# "one more day of traffic" (--delta) instead of regenerating everything:
+#   seed               master seed of the first run; delta run n is seeded with derive_seed(seed, 'delta-n')
+#   runs               number of delta runs so far
+#   last_customer_id   highest customer_id written
+#   last_order_id      highest app_service_order.id written
+#   watermark          'YYYY-mm-dd'; every create_time written so far is before this day
+#   customers_per_day  traffic a delta run repeats unless told otherwise
+#   orders_per_day
+# The customers' unionids are kept next to the state file as a CustomerIndex .npy file.
+
+DEFAULT_STATE = 'mock_state.json'
+
+# Function to locate the saved customer index of a state file
+def customers_path(state_path):
+    return os.path.splitext(state_path)[0] + '.customers.npy'
+
+def load_state(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+# Function to replace the state file in one step, so an interrupted run leaves the old one intact
+def save_state(path, state):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(temp_path, path)
+
+# Function to register the state options on a generator's argument parser
+def add_state_arguments(parser):
+    parser.add_argument('--state', help=f"state file to write after a full run and to continue from with --delta "
+                                        f"(e.g. {DEFAULT_STATE})")
+    parser.add_argument('--delta', type=int, metavar='DAYS',
+                        help='only generate DAYS more days of customers and orders after the saved watermark')
@@ -0,0 +1,293 @@
+import argparse
+import gzip
+import json
+import os
+import shlex
+import shutil
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from mock_schema import CUSTOMER_TABLE, DATABASE, ORDER_TABLE, insert_header
+from sql_encoder import GZIP_SUFFIX, encode_sql_values, open_text, sql_literal
+
+# Partitioned output for parallel imports (--sink partitioned) and the import orchestrator.
+# Instead of one script in one transaction, the rows of a table go to --partitions files
+# by id range, each committing every --commit-batches batches, so they can be imported
+# side by side (mock_data.part000.sql, ...). Next to them the sink writes
+#   mock_data.pre.sql        saves and drops the table's secondary indexes
+#   mock_data.post.sql       rebuilds them
+#   mock_data.manifest.json  files, row counts and id range of every partition
+# The partitions turn off unique_checks and foreign_key_checks for their session.
+# The index definitions are read from information_schema when the pre script runs
+# and kept in the mock_deferred_indexes table until the post script rebuilds them,
+# so the scripts work whatever indexes the tables have. Running the pre script twice
+# (after an aborted import) is harmless. A failed generator run writes no manifest.
+#   python import_partitions.py mock_data.manifest.json service_order_mock_data.manifest.json --jobs 4
+# runs every pre script, imports all partitions --jobs at a time with the mysql
+# client, runs the post scripts (also when an import failed) and checks the row
+# count of every id range against the manifest.
+
+DEFAULT_PARTITIONS = 8
+DEFAULT_JOBS = 4
+DEFAULT_MYSQL = 'mysql -u root'
+
+# Column the partitions of a table are cut by; customers get their id from AUTO_INCREMENT
+PARTITION_KEYS = {CUSTOMER_TABLE: 'customer_id', ORDER_TABLE: 'id'}
+
+DEFERRED_INDEXES = 'mock_deferred_indexes'
+
+PRE_SCRIPT = """USE {database};
+
+SET SESSION group_concat_max_len = 1048576;
+
+CREATE TABLE IF NOT EXISTS `{deferred}` (
+    `table_name` VARCHAR(64) NOT NULL,
+    `index_name` VARCHAR(64) NOT NULL,
+    `definition` TEXT NOT NULL,
+    PRIMARY KEY (`table_name`, `index_name`)
+);
+
+-- Keep the definition of every secondary index (a second run keeps the first run's)
+INSERT IGNORE INTO `{deferred}` (`table_name`, `index_name`, `definition`)
+SELECT TABLE_NAME, INDEX_NAME,
+       CONCAT(CASE WHEN MAX(INDEX_TYPE) = 'FULLTEXT' THEN 'FULLTEXT INDEX'
+                   WHEN MAX(NON_UNIQUE) = 0 THEN 'UNIQUE INDEX' ELSE 'INDEX' END,
+              ' `', INDEX_NAME, '` (',
+              GROUP_CONCAT(CONCAT('`', COLUMN_NAME, '`', IFNULL(CONCAT('(', SUB_PART, ')'), ''))
+                           ORDER BY SEQ_IN_INDEX SEPARATOR ', '), ')')
+FROM information_schema.STATISTICS
+WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '{table}' AND INDEX_NAME <> 'PRIMARY'
+GROUP BY TABLE_NAME, INDEX_NAME;
+
+-- Drop the secondary indexes the table still has
+SET @drop_indexes = NULL;
+SELECT CONCAT('ALTER TABLE `{table}` ', GROUP_CONCAT(CONCAT('DROP INDEX `', INDEX_NAME, '`') SEPARATOR ', '))
+INTO @drop_indexes
+FROM (SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+      WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '{table}' AND INDEX_NAME <> 'PRIMARY') AS indexes;
+SET @drop_indexes = IFNULL(@drop_indexes, 'DO 0');
+PREPARE drop_indexes FROM @drop_indexes;
+EXECUTE drop_indexes;
+DEALLOCATE PREPARE drop_indexes;
+"""
+
+POST_SCRIPT = """USE {database};
+
+SET SESSION group_concat_max_len = 1048576;
+
+-- Rebuild the saved indexes in one ALTER TABLE (one pass over the table)
+SET @add_indexes = NULL;
+SELECT CONCAT('ALTER TABLE `{table}` ', GROUP_CONCAT(CONCAT('ADD ', `definition`) SEPARATOR ', '))
+INTO @add_indexes
+FROM `{deferred}`
+WHERE `table_name` = '{table}' AND `index_name` NOT IN (
+    SELECT INDEX_NAME FROM information_schema.STATISTICS WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = '{table}');
+SET @add_indexes = IFNULL(@add_indexes, 'DO 0');
+PREPARE add_indexes FROM @add_indexes;
+EXECUTE add_indexes;
+DEALLOCATE PREPARE add_indexes;
+
+DELETE FROM `{deferred}` WHERE `table_name` = '{table}';
+"""
+
+# Function to return the file of output with the given part inserted before .sql, e.g. mock_data.part003.sql
+def partition_file(output, part):
+    base, extension = os.path.splitext(output)
+    return f"{base}.{part}{extension or '.sql'}"
+
+# Function to return the manifest file of output
+def manifest_path(output):
+    return os.path.splitext(output)[0] + '.manifest.json'
+
+# Writes the rows of one table into partitions of rows_per_partition rows
+class PartitionedSqlSink:
+    committed_rows = 0
+
+    def __init__(self, output, table, columns, rows, partitions=DEFAULT_PARTITIONS, commit_batches=10,
+                 gzip_output=False, database=DATABASE):
+        self.output = output
+        self.table = table
+        self.header = insert_header(table, columns)
+        self.key_column = PARTITION_KEYS.get(table, columns[0])
+        self.key = columns.index(self.key_column)
+        self.rows_per_partition = max(-(-rows // max(partitions, 1)), 1)
+        self.commit_batches = commit_batches
+        self.suffix = GZIP_SUFFIX if gzip_output else ''
+        self.database = database
+        self.partitions = []
+        self.file = None
+        self.written = 0
+        self.batches = 0
+        # The manifest of an earlier run would describe partitions this run overwrites
+        if os.path.exists(manifest_path(output)):
+            os.remove(manifest_path(output))
+        for part, script in (('pre', PRE_SCRIPT), ('post', POST_SCRIPT)):
+            with open(partition_file(output, part), 'w', encoding='utf-8') as f:
+                f.write(script.format(database=database, table=table, deferred=DEFERRED_INDEXES))
+
+    # Function to start the next partition file
+    def open_partition(self):
+        self.close_partition()
+        path = partition_file(self.output, f"part{len(self.partitions):03d}") + self.suffix
+        self.file = open_text(path, 'w')
+        self.file.write(f"USE {self.database};\n\n")
+        self.file.write("SET unique_checks = 0;\nSET foreign_key_checks = 0;\n\n")
+        self.file.write("START TRANSACTION;\n\n")
+        self.partitions.append({'file': os.path.basename(path), 'rows': 0, 'first': None, 'last': None})
+        self.batches = 0
+
+    def close_partition(self):
+        if self.file:
+            self.file.write("COMMIT;\n")
+            self.file.close()
+            self.file = None
+
+    def encode(self, rows):
+        return self.header + encode_sql_values(rows) + ";\n\n"
+
+    def write_batch(self, rows, encoded=None):
+        while rows:
+            if self.file is None or self.written == len(self.partitions) * self.rows_per_partition:
+                self.open_partition()
+            room = len(self.partitions) * self.rows_per_partition - self.written
+            if len(rows) > room:
+                # A batch crossing into the next partition is split and each part encoded on its own
+                part, rows, encoded = rows[:room], rows[room:], None
+            else:
+                part, rows = rows, []
+            self.file.write(self.encode(part) if encoded is None else encoded)
+            partition = self.partitions[-1]
+            if partition['first'] is None:
+                partition['first'] = part[0][self.key]
+            partition['last'] = part[-1][self.key]
+            partition['rows'] += len(part)
+            self.written += len(part)
+            self.batches += 1
+            if self.batches % self.commit_batches == 0:
+                self.file.write("COMMIT;\n\nSTART TRANSACTION;\n\n")
+
+    def close(self):
+        self.close_partition()
+        manifest = {'database': self.database, 'table': self.table, 'key': self.key_column,
+                    'rows': self.written, 'pre': os.path.basename(partition_file(self.output, 'pre')),
+                    'post': os.path.basename(partition_file(self.output, 'post')), 'partitions': self.partitions}
+        with open(manifest_path(self.output), 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+
+    def __enter__(self):
+        return self
+
+    # Function to close the open partition after a failed run without COMMIT or manifest,
+    # so import_partitions.py refuses the partial output
+    def abort(self):
+        if self.file:
+            self.file.close()
+            self.file = None
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+# Function to run one mysql client with the script at path (gzip or not) as its input
+def run_script(mysql, path):
+    with (gzip.open(path, 'rb') if path.endswith(GZIP_SUFFIX) else open(path, 'rb')) as script:
+        process = subprocess.Popen(mysql, stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+        try:
+            shutil.copyfileobj(script, process.stdin)
+            process.stdin.close()
+        except BrokenPipeError:
+            # The client stopped reading (an error); its exit status tells what happened
+            pass
+        error = process.stderr.read().decode('utf-8', 'replace')
+        if process.wait():
+            raise RuntimeError(f"{os.path.basename(path)}: {error.strip() or f'mysql exited with {process.returncode}'}")
+
+# Function to return the rows of the table of manifest in the id range of partition
+def count_rows(mysql, manifest, partition):
+    key = manifest['key']
+    query = (f"SELECT COUNT(*) FROM `{manifest['database']}`.`{manifest['table']}` "
+             f"WHERE `{key}` BETWEEN {sql_literal(partition['first'])} AND {sql_literal(partition['last'])}")
+    result = subprocess.run(mysql + ['-N', '-B', '-e', query], capture_output=True, text=True)
+    if result.returncode:
+        raise RuntimeError(result.stderr.strip())
+    return int(result.stdout.split()[0])
+
+# Function to import every partition of manifests jobs at a time between the pre and post scripts;
+# returns the partitions that failed
+def import_manifests(mysql, manifests, jobs, defer_indexes=True):
+    scripts = [(os.path.dirname(path), manifest) for path, manifest in manifests]
+    if defer_indexes:
+        for directory, manifest in scripts:
+            run_script(mysql, os.path.join(directory, manifest['pre']))
+            print(f"{manifest['table']}: secondary indexes dropped")
+
+    def run_partition(path):
+        started = time.perf_counter()
+        run_script(mysql, path)
+        return time.perf_counter() - started
+
+    failed = []
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as pool:
+            futures = [(manifest, partition, pool.submit(run_partition, os.path.join(directory, partition['file'])))
+                       for directory, manifest in scripts for partition in manifest['partitions']]
+            for manifest, partition, future in futures:
+                try:
+                    seconds = future.result()
+                    print(f"{partition['file']}: {partition['rows']:,} rows in {seconds:.1f}s")
+                except RuntimeError as error:
+                    failed.append(partition['file'])
+                    print(f"FAILED {error}")
+    finally:
+        # Indexes are rebuilt even after a failed import, so the table stays usable
+        if defer_indexes:
+            for directory, manifest in scripts:
+                started = time.perf_counter()
+                run_script(mysql, os.path.join(directory, manifest['post']))
+                print(f"{manifest['table']}: secondary indexes rebuilt in {time.perf_counter() - started:.1f}s")
+    return failed
+
+# Function to compare the imported row count of every partition with its manifest; returns the mismatches
+def verify_manifests(mysql, manifests):
+    mismatches = []
+    for _, manifest in manifests:
+        imported = 0
+        for partition in manifest['partitions']:
+            rows = count_rows(mysql, manifest, partition)
+            imported += rows
+            if rows != partition['rows']:
+                mismatches.append(partition['file'])
+                print(f"{partition['file']}: {rows:,} rows in {manifest['key']} {partition['first']} - "
+                      f"{partition['last']}, the manifest says {partition['rows']:,}")
+        print(f"{manifest['table']}: {imported:,} of {manifest['rows']:,} rows verified")
+    return mismatches
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Import partitioned mock data concurrently and verify it')
+    parser.add_argument('manifests', nargs='+', help='.manifest.json files written by --sink partitioned')
+    parser.add_argument('--jobs', type=int, default=DEFAULT_JOBS, help='partitions imported at the same time')
+    parser.add_argument('--mysql', default=DEFAULT_MYSQL,
+                        help='mysql client command; pass the password through MYSQL_PWD or an option file, '
+                             'since several clients run at once')
+    parser.add_argument('--keep-indexes', action='store_true', help='do not drop and rebuild secondary indexes')
+    parser.add_argument('--verify-only', action='store_true', help='only check the row counts')
+    args = parser.parse_args()
+
+    mysql = shlex.split(args.mysql)
+    manifests = []
+    for path in args.manifests:
+        if not os.path.exists(path):
+            parser.error(f"{path} does not exist; the generator run that writes it failed or has not finished")
+        with open(path, encoding='utf-8') as f:
+            manifests.append((path, json.load(f)))
+
+    started = time.perf_counter()
+    failed = [] if args.verify_only else import_manifests(mysql, manifests, args.jobs, not args.keep_indexes)
+    if not args.verify_only:
+        print(f"Imported in {time.perf_counter() - started:.1f}s")
+    mismatches = verify_manifests(mysql, manifests)
+    if failed or mismatches:
+        raise SystemExit(f"{len(failed)} partition(s) failed, {len(mismatches)} row count mismatch(es)")
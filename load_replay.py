@@ -0,0 +1,413 @@
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import random
+from urllib.parse import parse_qs, urlparse
+
+import numpy as np
+
+from mock_loader import read_columns
+from mock_schema import CUSTOMER_COLUMNS, ORDER_COLUMNS
+from order_analytics import AGGREGATED_COLUMNS, OrderAggregator
+
+# Load replay against a local HTTP stand-in for the dashboard API.
+# `serve` loads generated customers and orders and answers the request shapes
+# of src/services/api.ts, orderService.ts and userService.ts over HTTP/1.1
+# keep-alive. `replay` drives a weighted mix of those shapes at a fixed or
+# linearly ramping QPS over a bounded pool of keep-alive connections and writes
+# p50/p95/p99 latency, latency histograms and per-second throughput as JSON.
+# Requests are sent on an open-loop schedule and latency is measured from the
+# scheduled send time, so waiting for a free connection counts against it.
+# Only the standard library's asyncio is used for HTTP.
+
+DEFAULT_PORT = 8765
+
+# Request shapes: the frontend call each one stands for and its default share of the mix
+REQUEST_SHAPES = {
+    'dashboard': ('fetchDashboardData', 1.0),
+    'orders': ('fetchOrderData', 2.0),
+    'users': ('fetchUserData', 1.0),
+    'orders_by_date': ('getOrdersByDateRange', 3.0),
+    'top_services': ('getTopSellingServices', 1.0),
+    'loyal_users': ('getMostLoyalUsers', 1.0),
+    'mock_config': ('setMockDataConfig', 0.1),
+}
+
+PAGE_SIZE = 100
+DATE_RANGE_LIMIT = 500
+
+# Upper edges (ms) of the latency histogram buckets
+LATENCY_BUCKETS_MS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, math.inf]
+
+ORDER_FIELDS = ('id', 'order_id', 'unionid', 'sotre_id', 'room_id', 'order_amount', 'order_status', 'create_time')
+CUSTOMER_FIELDS = ('customer_id', 'unionid', 'wechat_nickname', 'wechat_phone', 'create_time')
+
+# Function to read the given columns of generated files into one list per column
+def load_columns(paths, all_columns, names):
+    positions = [all_columns.index(name) for name in names]
+    columns = [[] for _ in names]
+    for path in paths:
+        for block in read_columns(path, positions):
+            for column, values in zip(columns, block):
+                column.extend(values)
+    return dict(zip(names, columns))
+
+# In-memory data behind the stand-in API
+class StandIn:
+    def __init__(self, customer_paths, order_paths):
+        self.customers = load_columns(customer_paths, CUSTOMER_COLUMNS, CUSTOMER_FIELDS)
+        self.orders = load_columns(order_paths, ORDER_COLUMNS, ORDER_FIELDS)
+        for name, convert in (('id', int), ('order_amount', float), ('order_status', int)):
+            self.orders[name] = list(map(convert, self.orders[name]))
+        self.config = {'userCount': len(self.customers['customer_id']), 'orderCount': len(self.orders['id'])}
+
+        create_times = np.array(self.orders['create_time'], dtype='datetime64[s]')
+        self.by_time = np.argsort(create_times, kind='stable')
+        self.sorted_times = create_times[self.by_time]
+
+        # Aggregates the dashboard, top services and loyal users are served from
+        aggregator = OrderAggregator()
+        for path in order_paths:
+            for columns in read_columns(path, AGGREGATED_COLUMNS):
+                aggregator.add_fields(*columns)
+        self.dashboard_stats = aggregator.dashboard()
+        unionids, counts = np.unique(np.array(self.orders['unionid'], dtype=object), return_counts=True)
+        loyal = np.argsort(-counts, kind='stable')[:1000]
+        self.loyal_users = [{'unionid': unionid, 'orderCount': int(count)}
+                            for unionid, count in zip(unionids[loyal].tolist(), counts[loyal].tolist())]
+
+    def order(self, k):
+        return {name: self.orders[name][k] for name in ORDER_FIELDS}
+
+    def customer(self, k):
+        return {name: self.customers[name][k] for name in CUSTOMER_FIELDS}
+
+    def meta(self, query):
+        days = np.datetime_as_string(self.sorted_times[[0, -1]], unit='D').tolist() if len(self.sorted_times) else []
+        return {'users': len(self.customers['customer_id']), 'orders': len(self.orders['id']), 'days': days}
+
+    # fetchDashboardData: totals and trends plus the latest users and orders
+    def dashboard(self, query):
+        recent = self.by_time[-5:][::-1].tolist()
+        stats = self.dashboard_stats
+        return dict(
+            totalOrders=stats['totalOrders'], totalRevenue=stats['totalRevenue'],
+            frequentUsers=stats['frequentUsers'], orderTrend=stats['orderTrend'][-30:],
+            revenueTrend=stats['revenueTrend'][-30:], busyHours=stats['busyHours'],
+            serviceDistribution=stats['serviceDistribution'],
+            recentOrders=[self.order(k) for k in recent],
+            recentUsers=[self.customer(k) for k in range(max(len(self.customers['customer_id']) - 5, 0),
+                                                         len(self.customers['customer_id']))][::-1],
+        )
+
+    # fetchOrderData (one page) and getOrdersByDateRange
+    def orders_page(self, query):
+        limit = int(query.get('limit', PAGE_SIZE))
+        if 'start' in query:
+            first, last = np.searchsorted(self.sorted_times, [np.datetime64(query['start'], 's'),
+                                                              np.datetime64(query['end'], 's')])
+            picked = self.by_time[first:min(last, first + limit)].tolist()
+            return {'total': int(last - first), 'orders': [self.order(k) for k in picked]}
+        offset = int(query.get('offset', 0))
+        picked = range(offset, min(offset + limit, len(self.orders['id'])))
+        return {'total': len(self.orders['id']), 'orders': [self.order(k) for k in picked]}
+
+    # fetchUserData (one page)
+    def users_page(self, query):
+        offset = int(query.get('offset', 0))
+        limit = int(query.get('limit', PAGE_SIZE))
+        picked = range(offset, min(offset + limit, len(self.customers['customer_id'])))
+        return {'total': len(self.customers['customer_id']), 'users': [self.customer(k) for k in picked]}
+
+    # getTopSellingServices
+    def top_services(self, query):
+        services = sorted(self.dashboard_stats['serviceDistribution'], key=lambda service: -service['count'])
+        return services[:int(query.get('limit', 5))]
+
+    # getMostLoyalUsers
+    def loyal(self, query):
+        return self.loyal_users[:int(query.get('limit', 10))]
+
+    # setMockDataConfig
+    def set_config(self, query, body):
+        self.config.update(json.loads(body or b'{}'))
+        return self.config
+
+    def routes(self):
+        return {
+            ('GET', '/api/meta'): self.meta,
+            ('GET', '/api/dashboard'): self.dashboard,
+            ('GET', '/api/orders'): self.orders_page,
+            ('GET', '/api/users'): self.users_page,
+            ('GET', '/api/services/top'): self.top_services,
+            ('GET', '/api/users/loyal'): self.loyal,
+        }
+
+# Function to read one HTTP/1.1 message head and body from reader; returns (first line, headers, body)
+async def read_message(reader):
+    first_line = await reader.readline()
+    if not first_line:
+        return None
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get('content-length', 0)))
+    return first_line.decode('latin-1').rstrip('\r\n'), headers, body
+
+# Function to serve the stand-in on host:port until cancelled
+async def serve(stand_in, host, port, ready=None):
+    routes = stand_in.routes()
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                message = await read_message(reader)
+                if message is None:
+                    break
+                request_line, headers, body = message
+                method, target, _ = request_line.split(' ', 2)
+                url = urlparse(target)
+                query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+                status = '200 OK'
+                route = routes.get((method, url.path))
+                try:
+                    if (method, url.path) == ('POST', '/api/mock-config'):
+                        result = stand_in.set_config(query, body)
+                    elif route is None:
+                        status, result = '404 Not Found', {'error': url.path}
+                    else:
+                        result = route(query)
+                except (KeyError, ValueError) as error:
+                    status, result = '400 Bad Request', {'error': str(error)}
+                payload = json.dumps(result, ensure_ascii=False).encode('utf-8')
+                writer.write(f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                             f"Content-Length: {len(payload)}\r\n\r\n".encode('latin-1') + payload)
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    server = await asyncio.start_server(handle, host, port)
+    if ready is not None:
+        ready.set()
+    async with server:
+        await server.serve_forever()
+
+# Keep-alive HTTP connection
+class Connection:
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def request(self, method, path, body=b''):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        try:
+            self.writer.write(f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\nContent-Length: {len(body)}\r\n"
+                              f"Content-Type: application/json\r\n\r\n".encode('latin-1') + body)
+            await self.writer.drain()
+            message = await read_message(self.reader)
+            if message is None:
+                raise ConnectionError('connection closed by the server')
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.close()
+            raise
+        status_line, _, response = message
+        return int(status_line.split(' ', 2)[1]), response
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+# Fixed-size pool of keep-alive connections, opened lazily
+class ConnectionPool:
+    def __init__(self, host, port, size):
+        self.idle = asyncio.Queue()
+        for _ in range(size):
+            self.idle.put_nowait(Connection(host, port))
+
+    async def request(self, method, path, body=b''):
+        connection = await self.idle.get()
+        try:
+            return await connection.request(method, path, body)
+        finally:
+            self.idle.put_nowait(connection)
+
+    def close(self):
+        while not self.idle.empty():
+            self.idle.get_nowait().close()
+
+# Function to build the (method, path, body) of one request of the given shape
+def build_request(shape, meta, rng):
+    if shape == 'dashboard':
+        return 'GET', '/api/dashboard', b''
+    if shape == 'orders':
+        return 'GET', f"/api/orders?offset={rng.randrange(max(meta['orders'], 1))}&limit={PAGE_SIZE}", b''
+    if shape == 'users':
+        return 'GET', f"/api/users?offset={rng.randrange(max(meta['users'], 1))}&limit={PAGE_SIZE}", b''
+    if shape == 'orders_by_date':
+        first, last = (np.datetime64(day, 'D') for day in meta['days'])
+        start = first + rng.randrange(int((last - first).astype(int)) + 1)
+        end = start + rng.choice([1, 7, 30])
+        return 'GET', f"/api/orders?start={start}&end={end}&limit={DATE_RANGE_LIMIT}", b''
+    if shape == 'top_services':
+        return 'GET', '/api/services/top?limit=5', b''
+    if shape == 'loyal_users':
+        return 'GET', '/api/users/loyal?limit=10', b''
+    body = json.dumps({'userCount': rng.randrange(100, 10000), 'orderCount': rng.randrange(100, 10000)})
+    return 'POST', '/api/mock-config', body.encode('utf-8')
+
+# Function to give the send time (seconds from start) of request number n when the
+# rate ramps linearly from qps to ramp_to over duration seconds
+def send_time(n, qps, ramp_to, duration):
+    slope = (ramp_to - qps) / duration
+    if abs(slope) < 1e-12:
+        return n / qps
+    return (math.sqrt(qps * qps + 2 * slope * n) - qps) / slope
+
+# Function to parse a --mix value such as "dashboard=1,orders_by_date=5"
+def parse_mix(text):
+    weights = {shape: weight for shape, (_, weight) in REQUEST_SHAPES.items()}
+    if text:
+        for item in text.split(','):
+            shape, _, weight = item.partition('=')
+            if shape not in REQUEST_SHAPES:
+                raise SystemExit(f"unknown request shape {shape}; choose from {', '.join(REQUEST_SHAPES)}")
+            weights[shape] = float(weight)
+    return {shape: weight for shape, weight in weights.items() if weight > 0}
+
+# Function to summarize latencies (seconds) as percentiles and a histogram in ms
+def latency_summary(latencies):
+    if not latencies:
+        return {'count': 0}
+    ms = np.asarray(latencies) * 1000
+    counts = np.histogram(ms, bins=[0] + LATENCY_BUCKETS_MS)[0]
+    return {
+        'count': len(ms),
+        'p50_ms': round(float(np.percentile(ms, 50)), 3),
+        'p95_ms': round(float(np.percentile(ms, 95)), 3),
+        'p99_ms': round(float(np.percentile(ms, 99)), 3),
+        'max_ms': round(float(ms.max()), 3),
+        'histogram_ms': {('inf' if edge == math.inf else str(edge)): int(count)
+                         for edge, count in zip(LATENCY_BUCKETS_MS, counts)},
+    }
+
+# Function to replay the mix against host:port and return the report
+async def replay(host, port, qps, ramp_to, duration, connections, mix, seed):
+    pool = ConnectionPool(host, port, connections)
+    _, body = await pool.request('GET', '/api/meta')
+    meta = json.loads(body)
+    rng = random.Random(seed)
+    shapes, weights = zip(*mix.items())
+    latencies = {shape: [] for shape in shapes}
+    errors = {shape: 0 for shape in shapes}
+    completed_per_second = [0] * (int(duration) + 1)
+    loop = asyncio.get_running_loop()
+
+    async def send(shape, request, scheduled):
+        try:
+            status, _ = await pool.request(*request)
+            failed = status >= 400
+        except (ConnectionError, asyncio.IncompleteReadError, OSError):
+            failed = True
+        finished = loop.time()
+        if failed:
+            errors[shape] += 1
+        else:
+            latencies[shape].append(finished - scheduled)
+        second = int(finished - started)
+        if second < len(completed_per_second):
+            completed_per_second[second] += 1
+
+    tasks = []
+    started = loop.time()
+    for n in range(int(duration * (qps + ramp_to) / 2)):
+        scheduled = started + send_time(n, qps, ramp_to, duration)
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        shape = rng.choices(shapes, weights)[0]
+        tasks.append(asyncio.ensure_future(send(shape, build_request(shape, meta, rng), scheduled)))
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - started
+    pool.close()
+
+    sent = len(tasks)
+    return {
+        'target': {'qps': qps, 'ramp_to': ramp_to, 'duration_s': duration, 'connections': connections, 'mix': mix},
+        'sent': sent,
+        'errors': sum(errors.values()),
+        'elapsed_s': round(elapsed, 3),
+        'achieved_qps': round(sent / elapsed, 1),
+        'latency': latency_summary([latency for values in latencies.values() for latency in values]),
+        'by_shape': {shape: dict(latency_summary(latencies[shape]), errors=errors[shape],
+                                 call=REQUEST_SHAPES[shape][0]) for shape in shapes},
+        'completed_per_second': completed_per_second,
+    }
+
+# Function to run the stand-in server in its own process (target of multiprocessing.Process)
+def run_server(customer_paths, order_paths, host, port, ready):
+    stand_in = StandIn(customer_paths, order_paths)
+    asyncio.run(serve(stand_in, host, port, ready))
+
+def main():
+    parser = argparse.ArgumentParser(description='Replay dashboard API traffic against a local stand-in')
+    parser.add_argument('command', choices=['serve', 'replay'],
+                        help='serve: run the stand-in; replay: drive traffic (starts a stand-in unless --url is given)')
+    parser.add_argument('--customers', nargs='+', default=['mock_data.sql'], help='generated customer files')
+    parser.add_argument('--orders', nargs='+', default=['service_order_mock_data.sql'], help='generated order files')
+    parser.add_argument('--url', help='stand-in to replay against, e.g. http://127.0.0.1:8765')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--qps', type=float, default=100, help='requests per second (at the start when ramping)')
+    parser.add_argument('--ramp-to', type=float, help='requests per second at the end of the run (default: --qps)')
+    parser.add_argument('--duration', type=float, default=30, help='seconds of traffic')
+    parser.add_argument('--connections', type=int, default=16, help='keep-alive connections in the pool')
+    parser.add_argument('--mix', help=f"request shape weights, e.g. dashboard=1,orders_by_date=5 "
+                                      f"(shapes: {', '.join(REQUEST_SHAPES)})")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='load_replay.json', help='JSON report')
+    args = parser.parse_args()
+
+    if args.command == 'serve':
+        print(f"Serving on http://127.0.0.1:{args.port}")
+        asyncio.run(serve(StandIn(args.customers, args.orders), '127.0.0.1', args.port))
+        return
+
+    server = None
+    if args.url:
+        url = urlparse(args.url)
+        host, port = url.hostname, url.port or 80
+    else:
+        host, port = '127.0.0.1', args.port
+        ready = multiprocessing.Event()
+        server = multiprocessing.Process(target=run_server, daemon=True,
+                                         args=(args.customers, args.orders, host, port, ready))
+        server.start()
+        if not ready.wait(600):
+            raise SystemExit('the stand-in did not start')
+
+    try:
+        report = asyncio.run(replay(host, port, args.qps, args.ramp_to or args.qps, args.duration,
+                                    args.connections, parse_mix(args.mix), args.seed))
+    finally:
+        if server is not None:
+            server.terminate()
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    latency = report['latency']
+    print(f"{report['sent']} requests at {report['achieved_qps']} qps, {report['errors']} errors, "
+          f"p50 {latency.get('p50_ms')} ms, p95 {latency.get('p95_ms')} ms, p99 {latency.get('p99_ms')} ms")
+
+if __name__ == '__main__':
+    main()
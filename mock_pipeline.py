@@ -0,0 +1,127 @@
+import queue
+import threading
+
+from mock_loader import batched
+from parallel_generate import row_chunks, run_sharded
+
+# Streaming generation pipeline shared by the generators.
+# A run is a chain of stages, each a function from one iterator to the next:
+#   allocate    id allocation: the chunk tasks (master_seed, chunk, skip, count, ...)
+#   synthesize  entity synthesis: row lists from a chunk function (run_sharded)
+#   rebatch     batches of batch_size rows
+#   encode      (rows, text) pairs, encoded by the sink (file sinks only)
+#   write       the sink
+# run_pipeline joins the stages with bounded queues and runs every stage's input
+# in its own thread, so encoding and (gzip) writing overlap generation. At most
+# QUEUE_SIZE items wait between two stages and run_sharded keeps 2 * workers
+# chunks in flight, so memory stays flat however many rows are generated.
+# The stages work from Python as well as from the scripts, e.g.
+#   with SqlFileSink('orders.sql', ORDER_TABLE, ORDER_COLUMNS) as sink:
+#       run_pipeline(allocate(seed, 0, 10**6), synthesize(generate_order_chunk), rebatch(1000), sink=sink)
+
+QUEUE_SIZE = 4
+
+# Marks the end of a stage's output in its queue
+DONE = object()
+
+# Carries an exception raised in a stage's thread to the stage reading from it
+class StageError:
+    def __init__(self, error):
+        self.error = error
+
+# Function to iterate items in a background thread through a queue of at most size items
+def bounded(items, size=QUEUE_SIZE):
+    buffer = queue.Queue(maxsize=size)
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(DONE)
+        except BaseException as error:
+            put(StageError(error))
+        finally:
+            # Stops the stages upstream of this one too
+            close = getattr(items, 'close', None)
+            if close:
+                close()
+
+    producer = threading.Thread(target=produce, daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is DONE:
+                return
+            if isinstance(item, StageError):
+                raise item.error
+            yield item
+    finally:
+        # Lets the producer give up if this stage stops early, and waits for it, so no
+        # stage is still generating (and drawing from the shared random state) afterwards
+        stopped.set()
+        producer.join()
+
+# Function to allocate rows [first_row, num_rows) as chunk tasks; extra is appended to every task
+def allocate(master_seed, first_row, num_rows, *extra):
+    for chunk, skip, count in row_chunks(first_row, num_rows):
+        yield (master_seed, chunk, skip, count, *extra)
+
+# Function to make the stage that turns chunk tasks into row lists with generate_chunk
+def synthesize(generate_chunk, workers=1, initializer=None, initargs=()):
+    def stage(tasks):
+        return run_sharded(generate_chunk, tasks, workers, initializer, initargs)
+    return stage
+
+# Function to make the stage that cuts each row list into batches of batch_size rows
+def rebatch(batch_size):
+    def stage(chunks):
+        for rows in chunks:
+            yield from batched(rows, batch_size)
+    return stage
+
+# Function to make the stage that encodes batches for sink, if it encodes its own batches
+def encode(sink):
+    encode_rows = getattr(sink, 'encode', None)
+
+    def stage(batches):
+        for rows in batches:
+            yield rows, (None if encode_rows is None else encode_rows(rows))
+    return stage
+
+# Function to write (rows, encoded) pairs to sink and return the number of rows written
+def write(sink, items):
+    written = 0
+    for rows, encoded in items:
+        if encoded is None:
+            sink.write_batch(rows)
+        else:
+            sink.write_batch(rows, encoded)
+        written += len(rows)
+    return written
+
+# Function to run source through stages into sink with bounded queues between them.
+# Returns the number of rows written; when a stage or the sink fails, every stage has
+# stopped by the time the error is raised.
+def run_pipeline(source, *stages, sink, queue_size=QUEUE_SIZE):
+    queues = [bounded(source, queue_size)]
+    for stage in stages + (encode(sink),):
+        queues.append(bounded(stage(queues[-1]), queue_size))
+    try:
+        return write(sink, queues[-1])
+    finally:
+        # Downstream first: closing a queue waits for the thread reading the one before it.
+        # A failed stage's traceback can keep its input queue open, so every queue is closed.
+        for items in reversed(queues):
+            items.close()
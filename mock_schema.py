@@ -0,0 +1,35 @@
+# Table layouts shared by the mock data generators, loaders and encoders
+
+DATABASE = 'relle_mall_release'
+
+CUSTOMER_TABLE = 'app_customer_info'
+CUSTOMER_COLUMNS = (
+    'id', 'unionid', 'mini_openid', 'customer_id', 'wechat_nickname', 'wechat_phone', 'wechat_avatar_src',
+    'user_name', 'user_gender', 'user_birthdate', 'user_avatar_src', 'create_by', 'create_time', 'update_by',
+    'update_time', 'deleted',
+)
+
+# `sotre_id` is the column name as it exists in the production schema
+ORDER_TABLE = 'app_service_order'
+ORDER_COLUMNS = (
+    'id', 'order_id', 'unionid', 'sotre_id', 'room_id', 'order_amount', 'contact_name', 'contact_phone',
+    'origin_price', 'reduction_amount', 'order_status', 'create_time', 'create_by', 'update_time', 'update_by',
+    'deleted', 'modify_num', 'customer_source', 'source_order_id', 'write_off', 'write_off_time', 'write_off_user',
+)
+
+# Width of app_service_order.order_id (VARCHAR(32)); the old store + second + 3 random
+# digits ids took 21 characters, order_ids.py takes 24 up to id 999999 and one more per digit
+ORDER_ID_MAX_LENGTH = 32
+
+DEFAULT_AVATAR = '/relle-media/avatar/default.png'
+
+STORE_IDS = ['SH0001', 'SH0002', 'SH0003']
+ROOM_IDS = ['01', '02', '03', '04', '05', '06']
+ORDER_STATUSES = [2, 4, 16, 1024]  # Based on the distinct values in the database
+CUSTOMER_SOURCE = '小程序'  # Default value from the database
+
+# Function to build the column list of an INSERT statement
+def insert_header(table, columns):
+    column_list = ', '.join(f"`{column}`" for column in columns)
+    return f"INSERT INTO `{table}` ({column_list}) VALUES\n"
+
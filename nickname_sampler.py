@@ -0,0 +1,112 @@
+import numpy as np
+
+import generate_mock_data as vocab
+
+# Precompiled samplers for wechat_nickname and user_name.
+# The vocabularies of generate_mock_data.py are turned into numpy object arrays
+# once (emoji already split into grapheme clusters), weighted choices use alias
+# tables, and a whole batch of names is drawn with one call per component.
+# Strings are then joined with elementwise object-array additions instead of
+# one random call and one concatenation at a time; the distributions match
+# generate_wechat_nickname, generate_chinese_name and generate_female_name.
+
+# Most emoji the full_custom nickname shape adds
+MAX_EMOJIS = 3
+
+# Weighted choice in O(1) per draw (Vose's alias method)
+class AliasTable:
+    def __init__(self, weights):
+        scaled = np.asarray(weights, dtype=float)
+        scaled = scaled * len(scaled) / scaled.sum()
+        self.prob = np.ones(len(scaled))
+        self.alias = np.arange(len(scaled))
+
+        small = [i for i, weight in enumerate(scaled) if weight < 1.0]
+        large = [i for i, weight in enumerate(scaled) if weight >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.prob[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] -= 1.0 - scaled[less]
+            (small if scaled[more] < 1.0 else large).append(more)
+
+    # Function to draw size indexes into the weights
+    def sample(self, rng, size):
+        slots = rng.integers(0, len(self.prob), size)
+        return np.where(rng.random(size) < self.prob[slots], slots, self.alias[slots])
+
+# Function to turn a vocabulary into an object array, so indexing returns Python strs
+def strings(values):
+    array = np.empty(len(values), dtype=object)
+    array[:] = list(values)
+    return array
+
+class NicknameSampler:
+    def __init__(self):
+        self.surnames = strings(vocab.chinese_surnames)
+        self.male_chars = strings(vocab.male_given_name_chars)
+        self.female_chars = strings(vocab.female_given_name_chars)
+        self.emojis = strings(vocab.emoji_tokens)
+        self.prefixes = strings(vocab.nickname_prefixes)
+        self.suffixes = strings(vocab.nickname_suffixes)
+        self.popular = strings(vocab.popular_nicknames)
+        self.female_names = strings(vocab.female_names)
+        self.genders = np.asarray(vocab.GENDERS)
+        self.gender_table = AliasTable(vocab.GENDER_WEIGHTS)
+        self.type_table = AliasTable(vocab.NICKNAME_TYPE_WEIGHTS)
+
+    # Function to draw from a vocabulary uniformly
+    def pick(self, values, rng, size):
+        return values[rng.integers(0, len(values), size)]
+
+    # Function to draw count gender codes with GENDER_WEIGHTS
+    def draw_genders(self, rng, count):
+        return self.genders[self.gender_table.sample(rng, count)]
+
+    # Function to generate a batch of names like generate_chinese_name(gender)
+    def chinese_names(self, genders, rng):
+        count = len(genders)
+        male = np.asarray(genders) == 1
+        first = np.where(male, self.pick(self.male_chars, rng, count), self.pick(self.female_chars, rng, count))
+        second = np.where(male, self.pick(self.male_chars, rng, count), self.pick(self.female_chars, rng, count))
+        second[rng.random(count) < 0.5] = ''  # 1 or 2 given name characters
+        return self.pick(self.surnames, rng, count) + first + second
+
+    # Function to generate a batch of nicknames like generate_wechat_nickname(gender)
+    def nicknames(self, genders, rng):
+        count = len(genders)
+        names = self.chinese_names(genders, rng)
+        kinds = self.type_table.sample(rng, count)
+        prefixed = self.pick(self.prefixes, rng, count) + names
+        suffixed = names + self.pick(self.suffixes, rng, count)
+        popular = self.pick(self.popular, rng, count)
+        emojis = self.pick(self.emojis, rng, (count, MAX_EMOJIS))
+        in_front = rng.random((count, MAX_EMOJIS)) < 0.5
+
+        # full_custom: a popular nickname or a prefixed/suffixed name, 70% of them with 1-3 or 1-2 emoji
+        from_popular = rng.random(count) < 0.5
+        custom = np.where(from_popular, popular, np.where(rng.random(count) < 0.5, prefixed, suffixed))
+        emoji_counts = np.where(from_popular, rng.integers(1, 4, count), rng.integers(1, 3, count))
+        emoji_counts[rng.random(count) >= 0.7] = 0
+
+        nicknames = np.select(
+            [kinds == 0, kinds == 1, kinds == 2, kinds == 3, kinds == 4, kinds == 5],
+            [names, prefixed, suffixed, popular, emojis[:, 0] + names, names + emojis[:, 0]],
+            custom)
+        # Emoji are added one at a time, each in front of or behind what is there so far
+        for slot in range(MAX_EMOJIS):
+            adding = (kinds == 6) & (emoji_counts > slot)
+            front = adding & in_front[:, slot]
+            back = adding & ~in_front[:, slot]
+            nicknames[front] = emojis[front, slot] + nicknames[front]
+            nicknames[back] = nicknames[back] + emojis[back, slot]
+        return nicknames
+
+    # Function to generate a batch of user names like generate_female_name()
+    def user_names(self, rng, count):
+        names = self.pick(self.female_names, rng, count)
+        compound = rng.random(count) >= 0.7  # 30% chance for a compound name
+        names[compound] = self.pick(self.surnames, rng, int(compound.sum())) + names[compound]
+        return names
+
+NICKNAMES = NicknameSampler()
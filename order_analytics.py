@@ -0,0 +1,164 @@
+import argparse
+import json
+import operator
+import time
+
+import numpy as np
+
+from mock_loader import read_columns
+from mock_schema import ORDER_COLUMNS
+
+# In-process columnar aggregation over generated app_service_order rows.
+# Computes the "frequent users" metric of query_frequent_users.sql and the
+# dashboard aggregates of src/types/statistics.ts (orderTrend, revenueTrend,
+# busyHours, serviceDistribution) without a database. Rows are converted to
+# numpy columns a batch at a time and every aggregate is a bincount or a sort.
+
+# Columns the aggregates need, in the order add_rows expects them
+AGGREGATED_COLUMNS = tuple(ORDER_COLUMNS.index(name)
+                           for name in ('unionid', 'room_id', 'order_amount', 'create_time', 'deleted'))
+
+# Same threshold as query_frequent_users.sql
+MIN_DAYS_WITH_ORDERS = 4
+
+# Day names used by busyHours in src/services/api.ts, Monday first
+WEEKDAY_NAMES = ['周一', '周二', '周三', '周四', '周五', '周六', '周日']
+
+# Daily totals are kept for days 0 .. DAY_SLOTS-1 since 1970-01-01
+DAY_SLOTS = 1 << 16
+
+ROWS_PER_BATCH = 1000000
+
+# Function to drop duplicate (customer, day) pairs; the result is sorted by customer, then day
+def unique_pairs(customers, days):
+    order = np.lexsort((days, customers))
+    customers = customers[order]
+    days = days[order]
+    keep = np.ones(len(customers), dtype=bool)
+    keep[1:] = (customers[1:] != customers[:-1]) | (days[1:] != days[:-1])
+    return customers[keep], days[keep]
+
+class OrderAggregator:
+    def __init__(self):
+        self.orders = 0
+        self.day_orders = np.zeros(DAY_SLOTS, dtype=np.int64)
+        self.day_revenue = np.zeros(DAY_SLOTS)
+        self.busy_hours = np.zeros(7 * 24, dtype=np.int64)
+        self.rooms = {}
+        self.pair_customers = []
+        self.pair_days = []
+        self.pending_pairs = 0
+
+    # Function to add one batch of orders given as columns:
+    # customer keys (int64), create_time (datetime64[s]), order_amount (float) and room_id (str)
+    def add_columns(self, customers, create_times, amounts, rooms):
+        days = create_times.astype('datetime64[D]')
+        hours = (create_times - days).astype(np.int64) // 3600
+        days = days.astype(np.int64)
+
+        self.orders += len(days)
+        self.day_orders += np.bincount(days, minlength=DAY_SLOTS)
+        self.day_revenue += np.bincount(days, weights=amounts, minlength=DAY_SLOTS)
+        self.busy_hours += np.bincount((days + 3) % 7 * 24 + hours, minlength=7 * 24)  # 1970-01-01 was a Thursday
+
+        room_ids, room_index = np.unique(rooms, return_inverse=True)
+        room_orders = np.bincount(room_index, minlength=len(room_ids))
+        room_revenue = np.bincount(room_index, weights=amounts, minlength=len(room_ids))
+        for room_id, count, revenue in zip(room_ids.tolist(), room_orders.tolist(), room_revenue.tolist()):
+            totals = self.rooms.setdefault(room_id, [0, 0.0])
+            totals[0] += count
+            totals[1] += revenue
+
+        customers, days = unique_pairs(customers, days)
+        self.pair_customers.append(customers)
+        self.pair_days.append(days)
+        self.pending_pairs += len(customers)
+        if self.pending_pairs > 4 * ROWS_PER_BATCH:
+            self.compact_pairs()
+
+    # Function to add order rows, skipping deleted ones. positions locates the
+    # AGGREGATED_COLUMNS in each row; the default is full rows in ORDER_COLUMNS order.
+    def add_rows(self, rows, positions=AGGREGATED_COLUMNS):
+        if rows:
+            self.add_fields(*zip(*map(operator.itemgetter(*positions), rows)))
+
+    # Function to add orders given as one sequence per AGGREGATED_COLUMNS entry.
+    # Values may be Python values or the raw strings read back from a file.
+    def add_fields(self, unionids, room_ids, order_amounts, create_times, deleted):
+        live = np.array(deleted).astype(np.int64) == 0
+        self.add_columns(
+            np.fromiter(map(hash, unionids), dtype=np.int64, count=len(unionids))[live],
+            np.array(create_times, dtype='datetime64[s]')[live],
+            np.array(order_amounts).astype(float)[live],
+            np.array(room_ids)[live],
+        )
+
+    def compact_pairs(self):
+        if len(self.pair_customers) > 1:
+            customers, days = unique_pairs(np.concatenate(self.pair_customers), np.concatenate(self.pair_days))
+            self.pair_customers = [customers]
+            self.pair_days = [days]
+        self.pending_pairs = 0
+
+    # Function to count users with at least min_days distinct order days in some month,
+    # overall and per month (as query_frequent_users.sql does)
+    def frequent_users(self, min_days=MIN_DAYS_WITH_ORDERS):
+        self.compact_pairs()
+        if not self.pair_customers:
+            return 0, {}
+        customers, days = self.pair_customers[0], self.pair_days[0]
+        months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+
+        # Pairs are sorted by customer then day, so each (customer, month) is one run
+        starts = np.flatnonzero(np.r_[True, (customers[1:] != customers[:-1]) | (months[1:] != months[:-1])])
+        days_with_orders = np.diff(np.r_[starts, len(customers)])
+        frequent = starts[days_with_orders >= min_days]
+
+        month_ids, month_users = np.unique(months[frequent], return_counts=True)
+        by_month = {str(np.datetime64(int(month), 'M')): int(count) for month, count in zip(month_ids, month_users)}
+        return int(np.unique(customers[frequent]).size), by_month
+
+    # Function to build the dashboard aggregates in the shapes of src/types/statistics.ts
+    def dashboard(self, min_days=MIN_DAYS_WITH_ORDERS):
+        active_days = np.flatnonzero(self.day_orders)
+        trend_days = np.arange(active_days[0], active_days[-1] + 1) if len(active_days) else np.array([], dtype=np.int64)
+        dates = np.datetime_as_string(trend_days.astype('datetime64[D]')).tolist()
+        frequent_users, frequent_users_by_month = self.frequent_users(min_days)
+
+        return {
+            'totalOrders': self.orders,
+            'totalRevenue': round(float(self.day_revenue.sum()), 2),
+            'frequentUsers': frequent_users,
+            'frequentUsersByMonth': frequent_users_by_month,
+            'orderTrend': [{'date': date, 'value': int(value)}
+                           for date, value in zip(dates, self.day_orders[trend_days].tolist())],
+            'revenueTrend': [{'date': date, 'value': round(value, 2)}
+                             for date, value in zip(dates, self.day_revenue[trend_days].tolist())],
+            'busyHours': [{'day': WEEKDAY_NAMES[slot // 24], 'hour': slot % 24, 'count': int(count)}
+                          for slot, count in enumerate(self.busy_hours.tolist()) if count],
+            'serviceDistribution': [{'name': room_id, 'count': count, 'revenue': round(revenue, 2)}
+                                    for room_id, (count, revenue) in sorted(self.rooms.items())],
+        }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Aggregate generated app_service_order files without a database')
+    parser.add_argument('paths', nargs='+', help='.sql or .tsv files written by the order generators')
+    parser.add_argument('--min-days', type=int, default=MIN_DAYS_WITH_ORDERS,
+                        help='distinct order days in a month that make a user frequent')
+    parser.add_argument('--output', help='write the dashboard aggregates to this JSON file')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    aggregator = OrderAggregator()
+    for path in args.paths:
+        # Only the aggregated columns are parsed
+        for columns in read_columns(path, AGGREGATED_COLUMNS):
+            aggregator.add_fields(*columns)
+    stats = aggregator.dashboard(args.min_days)
+    elapsed = time.perf_counter() - started
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+    print(f"{stats['totalOrders']} orders, revenue {stats['totalRevenue']:.2f}, "
+          f"{stats['frequentUsers']} users with >= {args.min_days} order days in a month ({elapsed:.1f}s)")
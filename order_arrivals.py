@@ -0,0 +1,123 @@
+import numpy as np
+
+from mock_schema import ROOM_IDS, STORE_IDS
+
+# Arrival model for app_service_order.create_time.
+#
+# The order window is cut into (day, hour, store) cells. Each cell's intensity is
+#     weekday weight * month weight * hour weight * store load factor
+# and all order counts are drawn at once with a single multinomial. A cell can
+# hold at most len(ROOM_IDS) * room_capacity orders; overflow is redistributed
+# to cells with free rooms. Cells are laid out in time order, so order ids
+# follow create_time hour by hour, and any slice of orders can be resolved from the small
+# per-cell arrays without ever materializing all orders.
+
+ORDER_WINDOW_START = '2022-01-01'
+ORDER_WINDOW_END = '2023-12-31'
+
+# Relative intensity per hour of day; the stores open 09:00-22:00
+HOURLY_WEIGHTS = [
+    0, 0, 0, 0, 0, 0, 0, 0, 0,
+    0.4, 0.7, 0.9, 0.8, 0.9, 1.2, 1.3, 1.2, 1.0, 0.9, 1.1, 1.2, 0.8, 0.4,
+    0,
+]
+
+# Monday .. Sunday
+WEEKDAY_WEIGHTS = [0.8, 0.75, 0.8, 0.85, 1.0, 1.4, 1.3]
+
+# January .. December (Spring Festival dip, Double 11 and year-end peaks)
+MONTHLY_WEIGHTS = [0.9, 0.7, 0.95, 1.0, 1.05, 1.0, 1.1, 1.1, 1.0, 1.05, 1.2, 1.25]
+
+# Load factor per store, in STORE_IDS order
+STORE_LOAD = [1.0, 0.75, 0.5]
+
+# Bookings one room can take per hour; 0 disables the limit. With a limit of 1 the
+# order window holds about 170k orders, so large runs would need a wider window
+ROOM_CAPACITY = 0
+
+# Seed stream used for the plan, kept apart from the per-chunk streams
+PLAN_STREAM = 2 ** 32 - 1
+
+# Resolved arrivals: how many orders fall in every cell, and where each cell starts
+class ArrivalPlan:
+    def __init__(self, start, end, counts, room_offsets, num_stores, num_rooms):
+        self.start = start
+        self.end = end
+        self.counts = counts
+        self.cell_ends = np.cumsum(counts)
+        self.room_offsets = room_offsets
+        self.num_stores = num_stores
+        self.num_rooms = num_rooms
+
+    # Function to resolve orders [first, last) into store index, room index and create_time
+    def orders(self, first, last, rng):
+        rows = np.arange(first, last)
+        cells = np.searchsorted(self.cell_ends, rows, side='right')
+        counts = self.counts[cells]
+        rank = rows - (self.cell_ends[cells] - counts)
+
+        # Orders of one cell are spread over its hour in rank order, so create_time never decreases
+        hour_index = cells // self.num_stores
+        seconds = hour_index * 3600 + ((rank + rng.random(len(rows))) * 3600 / counts).astype(np.int64)
+
+        store = cells % self.num_stores
+        room = (rank + self.room_offsets[cells]) % self.num_rooms
+        return store, room, self.start + seconds.astype('timedelta64[s]')
+
+class ArrivalModel:
+    def __init__(self, start=ORDER_WINDOW_START, end=ORDER_WINDOW_END, hourly_weights=HOURLY_WEIGHTS,
+                 weekday_weights=WEEKDAY_WEIGHTS, monthly_weights=MONTHLY_WEIGHTS, store_load=STORE_LOAD,
+                 num_rooms=len(ROOM_IDS), room_capacity=ROOM_CAPACITY):
+        self.start = np.datetime64(start, 's')
+        self.end = np.datetime64(end, 's')
+        self.days = np.arange(np.datetime64(start, 'D'), np.datetime64(end, 'D'))
+        self.hourly_weights = np.asarray(hourly_weights, dtype=float)
+        self.weekday_weights = np.asarray(weekday_weights, dtype=float)
+        self.monthly_weights = np.asarray(monthly_weights, dtype=float)
+        self.store_load = np.asarray(store_load, dtype=float)
+        self.num_rooms = num_rooms
+        self.room_capacity = room_capacity
+
+    # Function to compute the normalized intensity of every (day, hour, store) cell
+    def cell_weights(self):
+        weekday = (self.days.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+        month = self.days.astype('datetime64[M]').astype(np.int64) % 12
+        day_weights = self.weekday_weights[weekday] * self.monthly_weights[month]
+        weights = (day_weights[:, None, None] * self.hourly_weights[None, :, None]
+                   * self.store_load[None, None, :]).ravel()
+        return weights / weights.sum()
+
+    # Function to decide how many of count orders land in each cell
+    def plan(self, count, rng):
+        weights = self.cell_weights()
+        counts = rng.multinomial(count, weights)
+
+        if self.room_capacity:
+            capacity = self.num_rooms * self.room_capacity
+            if count > capacity * np.count_nonzero(weights):
+                raise ValueError(f"{count} orders exceed the room capacity of the order window; "
+                                 f"raise the room capacity or widen the window")
+            while True:
+                excess = np.maximum(counts - capacity, 0).sum()
+                if excess == 0:
+                    break
+                counts = np.minimum(counts, capacity)
+                free = np.where(counts < capacity, weights, 0)
+                counts += rng.multinomial(excess, free / free.sum())
+
+        room_offsets = rng.integers(0, self.num_rooms, size=len(counts))
+        return ArrivalPlan(self.start, self.end, counts, room_offsets, len(self.store_load), self.num_rooms)
+
+# Function to format datetime64[s] values as 'YYYY-mm-dd HH:MM:SS' strings
+def format_times(times):
+    return [value[:10] + ' ' + value[11:] for value in np.datetime_as_string(times, unit='s').tolist()]
+
+# Function to resolve a slice of the plan into (store_id, room_id, create_time, update_time) tuples.
+# update_time falls anywhere between create_time and the end of the plan's window.
+def arrival_rows(plan, first, last, rng):
+    store, room, create_time = plan.orders(first, last, rng)
+    remaining = (plan.end - create_time).astype(np.int64)
+    update_time = create_time + (rng.random(len(remaining)) * remaining).astype('timedelta64[s]')
+    store_ids = np.asarray(STORE_IDS)[store].tolist()
+    room_ids = np.asarray(ROOM_IDS)[room].tolist()
+    return list(zip(store_ids, room_ids, format_times(create_time), format_times(update_time)))
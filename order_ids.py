@@ -0,0 +1,20 @@
+# order_id allocation for app_service_order.
+#
+# The old scheme was store_id + datetime.now() + 3 random digits, which allows
+# only 1000 ids per store per wall-clock second and collides long before a
+# multi-million-row load finishes. Here the layout stays
+#     store_id + yymmddHHMMSS + sequence
+# but the timestamp comes from the order's own create_time and the sequence is
+# the row's primary key. The prefix is fixed width, so two order_ids can only
+# be equal when their ids are equal: unique by construction, deterministic for
+# a given seed, and independent of which shard generated the row.
+
+# Minimum number of digits in the sequence part; larger ids simply get longer
+SEQUENCE_DIGITS = 6
+
+# Function to build an order_id from a 'YYYY-mm-dd HH:MM:SS' create_time and the row id.
+# Slicing the already formatted create_time avoids a strftime call per row.
+def make_order_id(store_id, create_time, sequence):
+    return (f"{store_id}{create_time[2:4]}{create_time[5:7]}{create_time[8:10]}"
+            f"{create_time[11:13]}{create_time[14:16]}{create_time[17:19]}{sequence:0{SEQUENCE_DIGITS}d}")
+
@@ -0,0 +1,203 @@
+import argparse
+import heapq
+import itertools
+import json
+import time
+
+import numpy as np
+
+import generate_service_order_data
+from mock_loader import batched
+from mock_schema import DATABASE, ORDER_COLUMNS, ORDER_TABLE, insert_header
+from parallel_generate import add_shard_arguments, chunk_seed, derive_seed, new_master_seed, row_chunks, run_sharded
+from sql_encoder import encode_sql_values, open_text, sql_literal
+
+# Order lifecycle simulator for app_service_order.
+# Instead of one static snapshot with a random order_status, every order is
+# walked through the states the production jobs move it through:
+#   created      order_status 2, modify_num 0, not written off (an INSERT)
+#   modified     the customer changes the booking; modify_num + 1, update_by = unionid
+#   signed_in    order_status 4 at the appointment, update_by = 'signIn'
+#   written_off  order_status 16 after the service; write_off = 1 by a store staff account
+#   auto_closed  order_status 1024 for no-shows, set by the hourly AutoCloseOrderJob
+# Orders come from the seasonal arrival model, hour by hour. When an order is
+# created its whole future is drawn at once and its events go on a heap; the heap is
+# drained up to the hour of each new order, so the output is one time-ordered stream
+# and memory holds only orders whose lifecycle is still open.
+
+STATUS_CREATED = 2
+STATUS_SIGNED_IN = 4
+STATUS_WRITTEN_OFF = 16
+STATUS_CLOSED = 1024
+
+# Chance of 0, 1, 2 or 3 booking changes
+MODIFY_NUM_WEIGHTS = [0.6, 0.25, 0.1, 0.05]
+
+# Booking lead time is exponential with this mean, capped at LEAD_HOURS_MAX
+LEAD_HOURS_MEAN = 36
+LEAD_HOURS_MAX = 14 * 24
+
+# Share of no-shows; AutoCloseOrderJob closes them at the first full hour AUTO_CLOSE_HOURS after the appointment
+NO_SHOW_SHARE = 0.1
+AUTO_CLOSE_HOURS = 24
+
+# Customers sign in up to this many minutes before or after the appointment
+SIGN_IN_JITTER_MINUTES = 15
+
+# A service takes between these many minutes before it is written off
+SERVICE_MINUTES = (60, 150)
+
+# Staff accounts per store that write orders off
+STAFF_PER_STORE = 4
+
+ID = ORDER_COLUMNS.index('id')
+ORDER_ID = ORDER_COLUMNS.index('order_id')
+UNIONID = ORDER_COLUMNS.index('unionid')
+STORE_ID = ORDER_COLUMNS.index('sotre_id')
+CREATE_TIME = ORDER_COLUMNS.index('create_time')
+UPDATE_BY = ORDER_COLUMNS.index('update_by')
+UPDATE_TIME = ORDER_COLUMNS.index('update_time')
+
+# Lifecycle columns of a freshly created order, by column position
+CREATED_VALUES = {ORDER_COLUMNS.index(column): value for column, value in (
+    ('order_status', STATUS_CREATED), ('modify_num', 0), ('write_off', 0),
+    ('write_off_time', None), ('write_off_user', ''))}
+
+# Function to format epoch seconds as 'YYYY-mm-dd HH:MM:SS'
+def format_time(seconds):
+    return time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(seconds))
+
+# Function to turn a generated order row into its just-created state
+def created_row(row):
+    row = list(row)
+    for position, value in CREATED_VALUES.items():
+        row[position] = value
+    row[UPDATE_BY] = row[UNIONID]
+    row[UPDATE_TIME] = row[CREATE_TIME]
+    return tuple(row)
+
+# Function to draw the lifecycle of a batch of orders created at created (epoch seconds).
+# Returns one list of (seconds, event, changes) per order, in time order.
+def draw_lifecycles(rows, created, rng):
+    count = len(rows)
+    modify_nums = rng.choice(len(MODIFY_NUM_WEIGHTS), size=count, p=MODIFY_NUM_WEIGHTS)
+    lead = np.minimum(rng.exponential(LEAD_HOURS_MEAN * 3600, count), LEAD_HOURS_MAX * 3600).astype(np.int64) + 3600
+    appointment = created + lead
+    modify_times = np.sort(created[:, None] + (rng.random((count, len(MODIFY_NUM_WEIGHTS) - 1))
+                                               * lead[:, None]).astype(np.int64), axis=1)
+    no_show = rng.random(count) < NO_SHOW_SHARE
+    closed = (appointment // 3600 + AUTO_CLOSE_HOURS + 1) * 3600
+    signed_in = np.maximum(appointment + rng.integers(-SIGN_IN_JITTER_MINUTES, SIGN_IN_JITTER_MINUTES + 1, count) * 60,
+                           modify_times[:, -1] + 1)
+    written_off = signed_in + rng.integers(SERVICE_MINUTES[0], SERVICE_MINUTES[1] + 1, count) * 60
+    staff = rng.integers(1, STAFF_PER_STORE + 1, count)
+
+    lifecycles = []
+    for k, row in enumerate(rows):
+        events = [(int(modify_times[k, n]), 'modified', {'modify_num': n + 1, 'update_by': row[UNIONID]})
+                  for n in range(int(modify_nums[k]))]
+        if no_show[k]:
+            events.append((int(closed[k]), 'auto_closed',
+                           {'order_status': STATUS_CLOSED, 'update_by': 'AutoCloseOrderJob'}))
+        else:
+            staff_user = f"{row[STORE_ID]}-staff{staff[k]}"
+            events.append((int(signed_in[k]), 'signed_in', {'order_status': STATUS_SIGNED_IN, 'update_by': 'signIn'}))
+            events.append((int(written_off[k]), 'written_off',
+                           {'order_status': STATUS_WRITTEN_OFF, 'write_off': 1,
+                            'write_off_time': format_time(int(written_off[k])),
+                            'write_off_user': staff_user, 'update_by': staff_user}))
+        lifecycles.append(events)
+    return lifecycles
+
+# Function to take the next event off the heap as (seconds, event, id, order_id, changes)
+def pop_event(pending):
+    seconds, _, event, order_row_id, order_id, changes = heapq.heappop(pending)
+    return seconds, event, order_row_id, order_id, changes
+
+# Function to turn batches of created orders into one time-ordered stream of
+# (seconds, event, id, order_id, changes); 'created' events carry the full row.
+# Orders must arrive hour by hour as the arrival plan lays them out (in any order
+# within an hour), so everything before the current order's hour is final.
+def lifecycle_events(batches, rng):
+    pending = []
+    sequence = itertools.count()
+    last_hour = None
+    for rows in batches:
+        created = np.array([row[CREATE_TIME] for row in rows], dtype='datetime64[s]').astype(np.int64)
+        hours = created // 3600
+        if (last_hour is not None and hours[0] < last_hour) or np.any(np.diff(hours) < 0):
+            raise ValueError('orders must arrive hour by hour; use seasonal arrivals')
+        last_hour = hours[-1]
+
+        for row, seconds, hour, events in zip(rows, created.tolist(), hours.tolist(),
+                                              draw_lifecycles(rows, created, rng)):
+            while pending and pending[0][0] < hour * 3600:
+                yield pop_event(pending)
+            heapq.heappush(pending, (seconds, next(sequence), 'created', row[ID], row[ORDER_ID], created_row(row)))
+            for event_seconds, event, changes in events:
+                heapq.heappush(pending, (event_seconds, next(sequence), event, row[ID], row[ORDER_ID], changes))
+    while pending:
+        yield pop_event(pending)
+
+# Function to render an event as an INSERT (created) or UPDATE statement
+def event_sql(seconds, event, order_row_id, order_id, changes, header=insert_header(ORDER_TABLE, ORDER_COLUMNS)):
+    if event == 'created':
+        return header + encode_sql_values([changes]) + ';\n'
+    assignments = ', '.join(f"`{column}` = {sql_literal(value)}" for column, value in changes.items())
+    return (f"UPDATE `{ORDER_TABLE}` SET {assignments}, `update_time` = '{format_time(seconds)}' "
+            f"WHERE `id` = {order_row_id};\n")
+
+# Function to render an event as one JSON line. Amounts are rounded to cents, as
+# sql_literal writes them, so both formats carry the same values.
+def event_json(seconds, event, order_row_id, order_id, changes):
+    if event == 'created':
+        changes = {column: round(value, 2) if isinstance(value, float) else value
+                   for column, value in zip(ORDER_COLUMNS, changes)}
+    else:
+        changes = dict(changes, update_time=format_time(seconds))
+    return json.dumps({'time': format_time(seconds), 'event': event, 'id': order_row_id, 'order_id': order_id,
+                       'values': changes}, ensure_ascii=False) + '\n'
+
+FORMATS = {'sql': event_sql, 'jsonl': event_json}
+
+def main():
+    parser = argparse.ArgumentParser(description='Simulate the app_service_order lifecycle as a time-ordered event stream')
+    parser.add_argument('--records', type=int, default=generate_service_order_data.NUM_RECORDS,
+                        help='number of orders created')
+    parser.add_argument('--start', help="first day orders are created, 'YYYY-mm-dd' (default: the order window)")
+    parser.add_argument('--days', type=int, default=1, help='days orders are created on when --start is given')
+    parser.add_argument('--room-capacity', type=int, default=None,
+                        help='bookings per room per hour (0 = unlimited)')
+    parser.add_argument('--format', choices=sorted(FORMATS), default='sql',
+                        help='sql: INSERT/UPDATE statements; jsonl: one JSON event per line')
+    parser.add_argument('--output', default='order_events.sql', help='output file; a .gz name is gzip-compressed')
+    add_shard_arguments(parser)
+    args = parser.parse_args()
+    args.arrivals = 'seasonal'
+    master_seed = args.seed if args.seed is not None else new_master_seed()
+
+    window = None
+    if args.start:
+        window = (args.start, str(np.datetime64(args.start, 'D') + args.days))
+    generate_service_order_data.random.seed(chunk_seed(master_seed, 'unionids'))
+    unionids = generate_service_order_data.get_unionids_from_db()
+    plan = generate_service_order_data.build_arrival_plan(args, args.records, master_seed, window, parser)
+
+    tasks = ((master_seed, chunk, skip, count) for chunk, skip, count in row_chunks(0, args.records))
+    orders = run_sharded(generate_service_order_data.generate_order_chunk, tasks, args.workers,
+                         initializer=generate_service_order_data.init_order_worker, initargs=(unionids, plan))
+    events = lifecycle_events(orders, np.random.default_rng(derive_seed(master_seed, 'lifecycle')))
+
+    render = FORMATS[args.format]
+    written = 0
+    with open_text(args.output, 'w') as f:
+        if args.format == 'sql':
+            f.write(f"USE {DATABASE};\n\n")
+        for block in batched(events, 10000):
+            f.write(''.join(render(*event) for event in block))
+            written += len(block)
+
+    print(f"Wrote {written} events for {args.records} orders to {args.output}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+import argparse
+import json
+import operator
+import time
+
+import numpy as np
+
+from mock_loader import batched, read_columns
+from mock_schema import CUSTOMER_COLUMNS, CUSTOMER_TABLE, DATABASE, ORDER_COLUMNS, ORDER_TABLE, insert_header
+from order_analytics import AGGREGATED_COLUMNS, MIN_DAYS_WITH_ORDERS, ROWS_PER_BATCH, WEEKDAY_NAMES, OrderAggregator, unique_pairs
+from sql_encoder import encode_sql_values, open_text
+
+# Pre-aggregated summary tables kept up to date while rows are generated.
+# Every batch a sink writes is also folded into the rollups below, so after one
+# pass over the output the dashboard can be served from tables the size of the
+# date range instead of scanning app_service_order:
+#   daily_store_revenue         orders and revenue per day, store and room (orderTrend,
+#                               revenueTrend, serviceDistribution, totals)
+#   hourly_busy                 orders per day and hour of day (busyHours)
+#   customer_month_active_days  distinct order days per customer and month (frequent users),
+#                               with day_bits: bit d - 1 set for every day d with orders
+#   daily_new_customers         customers created per day (userTrend)
+# Deleted orders are left out, as in query_frequent_users.sql. Revenue is summed
+# in integer cents, so the rollups equal a GROUP BY over the raw rows exactly.
+# The tables are written as upserts: counts and revenue add to existing rows,
+# which is exact as long as delta runs cover days no earlier run did. Active
+# days are not additive (two runs can both have orders from a customer on the
+# same day), so day_bits is merged with OR and active_days recounted from it.
+
+# Table name, columns (key columns first), number of key columns and column types
+ROLLUP_TABLES = {
+    'daily_store_revenue': (('day', 'sotre_id', 'room_id', 'orders', 'revenue'), 3,
+                            ('DATE', 'VARCHAR(32)', 'VARCHAR(32)', 'INT', 'DECIMAL(14,2)')),
+    'hourly_busy': (('day', 'hour', 'orders'), 2, ('DATE', 'TINYINT', 'INT')),
+    'customer_month_active_days': (('unionid', 'month', 'active_days', 'day_bits'), 2,
+                                   ('VARCHAR(64)', 'CHAR(7)', 'INT', 'INT UNSIGNED')),
+    'daily_new_customers': (('day', 'customers'), 1, ('DATE', 'INT')),
+}
+
+# Upsert expressions of the columns that are not summed. active_days is assigned
+# first, so it reads the stored day_bits before they are merged.
+MERGED_COLUMNS = {
+    'active_days': "BIT_COUNT(`day_bits` | VALUES(`day_bits`))",
+    'day_bits': "`day_bits` | VALUES(`day_bits`)",
+}
+
+# Columns the order rollups need, in the order add_order_fields expects them
+ROLLUP_COLUMNS = tuple(ORDER_COLUMNS.index(name)
+                       for name in ('unionid', 'sotre_id', 'room_id', 'order_amount', 'create_time', 'deleted'))
+CUSTOMER_CREATE_TIME = CUSTOMER_COLUMNS.index('create_time')
+CUSTOMER_ROLLUP_COLUMNS = (CUSTOMER_COLUMNS.index('id'), CUSTOMER_CREATE_TIME)
+
+# Store/room pairs are numbered below this many per day in the day key
+STORE_ROOM_SLOTS = 1 << 12
+
+ROWS_PER_INSERT = 1000
+
+# Function to add values grouped by integer key into totals, a dict of key -> list of sums
+def accumulate(totals, keys, *values):
+    unique, inverse = np.unique(keys, return_inverse=True)
+    sums = [np.bincount(inverse, minlength=len(unique)).tolist()]
+    sums += [np.bincount(inverse, weights=value, minlength=len(unique)).round().astype(np.int64).tolist()
+             for value in values]
+    for key, *added in zip(unique.tolist(), *sums):
+        current = totals.get(key)
+        if current is None:
+            totals[key] = added
+        else:
+            for k, value in enumerate(added):
+                current[k] += value
+
+# Function to format a day number (days since 1970-01-01) as 'YYYY-mm-dd'
+def day_string(day):
+    return str(np.datetime64(day, 'D'))
+
+class OrderRollups:
+    def __init__(self):
+        self.store_rooms = {}
+        self.customers = {}
+        self.day_store_room = {}
+        self.day_hour = {}
+        self.new_customers = {}
+        self.pair_customers = []
+        self.pair_days = []
+        self.pending_pairs = 0
+
+    # Function to add rows of table (app_service_order or app_customer_info) in column order
+    def add_rows(self, table, rows):
+        if not rows:
+            return
+        if table == ORDER_TABLE:
+            self.add_order_fields(*zip(*map(operator.itemgetter(*ROLLUP_COLUMNS), rows)))
+        elif table == CUSTOMER_TABLE:
+            self.add_customer_times([row[CUSTOMER_CREATE_TIME] for row in rows])
+
+    # Function to add orders given as one sequence per ROLLUP_COLUMNS entry.
+    # Values may be Python values or the raw strings read back from a file.
+    def add_order_fields(self, unionids, store_ids, room_ids, order_amounts, create_times, deleted):
+        live = np.array(deleted).astype(np.int64) == 0
+        create_times = np.array(create_times, dtype='datetime64[s]')[live]
+        days = create_times.astype('datetime64[D]')
+        hours = (create_times - days).astype(np.int64) // 3600
+        days = days.astype(np.int64)
+        cents = np.round(np.array(order_amounts).astype(float)[live] * 100)
+
+        store_rooms = np.fromiter((self.store_rooms.setdefault(pair, len(self.store_rooms))
+                                   for pair in zip(store_ids, room_ids)), dtype=np.int64, count=len(store_ids))[live]
+        accumulate(self.day_store_room, days * STORE_ROOM_SLOTS + store_rooms, cents)
+        accumulate(self.day_hour, days * 24 + hours)
+
+        customers = np.fromiter((self.customers.setdefault(unionid, len(self.customers)) for unionid in unionids),
+                                dtype=np.int64, count=len(unionids))[live]
+        customers, days = unique_pairs(customers, days)
+        self.pair_customers.append(customers)
+        self.pair_days.append(days)
+        self.pending_pairs += len(customers)
+        if self.pending_pairs > 4 * ROWS_PER_BATCH:
+            self.compact_pairs()
+
+    # Function to add customer create_time values
+    def add_customer_times(self, create_times):
+        accumulate(self.new_customers, np.array(create_times, dtype='datetime64[D]').astype(np.int64))
+
+    def compact_pairs(self):
+        if len(self.pair_customers) > 1:
+            customers, days = unique_pairs(np.concatenate(self.pair_customers), np.concatenate(self.pair_days))
+            self.pair_customers = [customers]
+            self.pair_days = [days]
+        self.pending_pairs = 0
+
+    # Function to wrap a sink so every batch written to it is also added to the rollups.
+    # Rows a resumed db load committed earlier would be missing, so that is refused.
+    def tracking(self, sink, table):
+        if sink.committed_rows:
+            sink.close()
+            raise SystemExit(f"--rollups needs the whole of {table} in one run; "
+                             f"this load resumes after {sink.committed_rows} committed rows")
+        return RollupSink(sink, lambda rows: self.add_rows(table, rows))
+
+    # Function to return the rows of every rollup table, keyed by table name, in ROLLUP_TABLES column order
+    def tables(self):
+        self.compact_pairs()
+        store_rooms = {code: pair for pair, code in self.store_rooms.items()}
+        tables = {
+            'daily_store_revenue': [
+                (day_string(key // STORE_ROOM_SLOTS), *store_rooms[key % STORE_ROOM_SLOTS], orders, cents / 100)
+                for key, (orders, cents) in sorted(self.day_store_room.items())],
+            'hourly_busy': [(day_string(key // 24), key % 24, orders) for key, (orders,) in sorted(self.day_hour.items())],
+            'customer_month_active_days': [],
+            'daily_new_customers': [(day_string(day), customers)
+                                    for day, (customers,) in sorted(self.new_customers.items())],
+        }
+        if self.pair_customers:
+            customers, days = self.pair_customers[0], self.pair_days[0]
+            months = days.astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+            # Pairs are sorted by customer then day, so each (customer, month) is one run
+            starts = np.flatnonzero(np.r_[True, (customers[1:] != customers[:-1]) | (months[1:] != months[:-1])])
+            active_days = np.diff(np.r_[starts, len(customers)])
+            # Days are distinct within a run, so summing their bits sets each once
+            day_of_month = days - months.astype('datetime64[M]').astype('datetime64[D]').astype(np.int64)
+            day_bits = np.add.reduceat(np.left_shift(1, day_of_month), starts)
+            unionids = list(self.customers)
+            tables['customer_month_active_days'] = [
+                (unionids[customer], str(np.datetime64(month, 'M')), days, bits)
+                for customer, month, days, bits in zip(customers[starts].tolist(), months[starts].tolist(),
+                                                       active_days.tolist(), day_bits.tolist())]
+        return tables
+
+    # Function to write the rollup tables as a SQL script of upserts (see MERGED_COLUMNS)
+    def write(self, path, database=DATABASE):
+        with open_text(path, 'w') as f:
+            f.write(f"USE {database};\n\nSTART TRANSACTION;\n\n")
+            for table, rows in self.tables().items():
+                columns, keys, types = ROLLUP_TABLES[table]
+                definitions = ', '.join(f"`{column}` {kind} NOT NULL" for column, kind in zip(columns, types))
+                key_list = ', '.join(f"`{column}`" for column in columns[:keys])
+                f.write(f"CREATE TABLE IF NOT EXISTS `{table}` ({definitions}, PRIMARY KEY ({key_list}));\n\n")
+                update = ', '.join(f"`{column}` = " + MERGED_COLUMNS.get(column, f"`{column}` + VALUES(`{column}`)")
+                                   for column in columns[keys:])
+                for batch in batched(rows, ROWS_PER_INSERT):
+                    f.write(insert_header(table, columns) + encode_sql_values(batch)
+                            + f"\nON DUPLICATE KEY UPDATE {update};\n\n")
+            f.write("COMMIT;\n")
+
+# Passes batches on to a sink and to the rollups
+class RollupSink:
+    committed_rows = 0
+
+    def __init__(self, sink, add_rows):
+        self.sink = sink
+        self.add_rows = add_rows
+
+    def write_batch(self, rows, *encoded):
+        self.sink.write_batch(rows, *encoded)
+        self.add_rows(rows)
+
+    # Everything else, e.g. encode, is the sink's
+    def __getattr__(self, name):
+        return getattr(self.sink, name)
+
+    def close(self):
+        self.sink.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return self.sink.__exit__(*exc_info)
+
+# Function to build the dashboard aggregates of OrderAggregator.dashboard (plus userTrend)
+# from rollup table rows, which may come from OrderRollups.tables() or a database.
+# The work is proportional to the days, stores and customer-months covered, not to the orders.
+def dashboard_from_rollups(tables, min_days=MIN_DAYS_WITH_ORDERS):
+    day_orders = {}
+    day_cents = {}
+    rooms = {}
+    for day, _, room_id, orders, revenue in tables['daily_store_revenue']:
+        cents = round(float(revenue) * 100)
+        day_orders[str(day)] = day_orders.get(str(day), 0) + orders
+        day_cents[str(day)] = day_cents.get(str(day), 0) + cents
+        totals = rooms.setdefault(room_id, [0, 0])
+        totals[0] += orders
+        totals[1] += cents
+
+    busy_hours = [0] * (7 * 24)
+    for day, hour, orders in tables['hourly_busy']:
+        busy_hours[(int(np.datetime64(str(day), 'D').astype(np.int64)) + 3) % 7 * 24 + int(hour)] += orders
+
+    frequent = set()
+    by_month = {}
+    for unionid, month, active_days, _ in tables['customer_month_active_days']:
+        if active_days >= min_days:
+            frequent.add(unionid)
+            by_month[month] = by_month.get(month, 0) + 1
+
+    if day_orders:
+        first, last = np.datetime64(min(day_orders), 'D'), np.datetime64(max(day_orders), 'D')
+        dates = np.datetime_as_string(np.arange(first, last + 1)).tolist()
+    else:
+        dates = []
+    return {
+        'totalOrders': sum(day_orders.values()),
+        'totalRevenue': sum(day_cents.values()) / 100,
+        'frequentUsers': len(frequent),
+        'frequentUsersByMonth': dict(sorted(by_month.items())),
+        'orderTrend': [{'date': date, 'value': day_orders.get(date, 0)} for date in dates],
+        'revenueTrend': [{'date': date, 'value': day_cents.get(date, 0) / 100} for date in dates],
+        'busyHours': [{'day': WEEKDAY_NAMES[slot // 24], 'hour': slot % 24, 'count': count}
+                      for slot, count in enumerate(busy_hours) if count],
+        'serviceDistribution': [{'name': room_id, 'count': count, 'revenue': cents / 100}
+                                for room_id, (count, cents) in sorted(rooms.items())],
+        'userTrend': [{'date': str(day), 'value': customers} for day, customers in tables['daily_new_customers']],
+    }
+
+# Function to register the rollup option on a generator's argument parser
+def add_rollup_arguments(parser):
+    parser.add_argument('--rollups', help='also write the pre-aggregated summary tables to this SQL file')
+
+# Function to start rollups when --rollups was given, else None
+def open_rollups(args):
+    return OrderRollups() if args.rollups else None
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build the rollup tables from generated order and customer files')
+    parser.add_argument('paths', nargs='+', help='.sql or .tsv files written by the order generators')
+    parser.add_argument('--customers', nargs='*', default=[], help='app_customer_info files for daily_new_customers')
+    parser.add_argument('--output', default='rollups.sql', help='SQL file for the rollup tables')
+    parser.add_argument('--check', action='store_true',
+                        help='also aggregate the raw orders and check the rollup dashboard matches exactly')
+    args = parser.parse_args()
+
+    rollups = OrderRollups()
+    aggregator = OrderAggregator() if args.check else None
+    for path in args.paths:
+        for columns in read_columns(path, ROLLUP_COLUMNS):
+            rollups.add_order_fields(*columns)
+            if aggregator is not None:
+                aggregator.add_fields(*(columns[ROLLUP_COLUMNS.index(position)] for position in AGGREGATED_COLUMNS))
+    for path in args.customers:
+        for _, create_times in read_columns(path, CUSTOMER_ROLLUP_COLUMNS):
+            rollups.add_customer_times(create_times)
+    rollups.write(args.output)
+
+    tables = rollups.tables()
+    started = time.perf_counter()
+    stats = dashboard_from_rollups(tables)
+    elapsed = time.perf_counter() - started
+    print(f"Wrote {sum(map(len, tables.values()))} rollup rows to {args.output}; "
+          f"dashboard from rollups in {elapsed * 1000:.1f}ms")
+    if aggregator is not None:
+        expected = aggregator.dashboard()
+        different = [key for key in expected if json.dumps(expected[key]) != json.dumps(stats[key])]
+        if different:
+            raise SystemExit(f"rollups differ from the raw aggregation in {', '.join(different)}")
+        print(f"Rollups match the raw aggregation of {expected['totalOrders']} orders")
@@ -0,0 +1,80 @@
+import hashlib
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from generator_profile import PROFILER, ProfiledTask
+
+# Sharded generation across a process pool.
+# Rows are cut into fixed-size chunks and every chunk is seeded from
+# (master seed, chunk index), never from the worker that happens to run it.
+# Chunks are merged back in order, so a master seed always produces the same
+# rows whatever --workers is set to.
+
+CHUNK_ROWS = 10000
+
+# Function to derive the seed for one chunk (str seeds are hashed deterministically by random.seed)
+def chunk_seed(master_seed, chunk):
+    return f"{master_seed}:{chunk}"
+
+# Function to derive an independent integer seed for one part of a run, e.g. 'orders'
+def derive_seed(master_seed, name):
+    return int.from_bytes(hashlib.sha256(f"{master_seed}:{name}".encode()).digest()[:4], 'big')
+
+# Function to pick a master seed when none is given
+def new_master_seed():
+    return int.from_bytes(os.urandom(4), 'big')
+
+# Function to split rows [first_row, num_rows) into chunk tasks.
+# Yields (chunk, skip, count): generate `count` rows of `chunk` and drop the first
+# `skip`, which happens only when resuming in the middle of a chunk.
+def row_chunks(first_row, num_rows, chunk_rows=CHUNK_ROWS):
+    for chunk_start in range(first_row - first_row % chunk_rows, num_rows, chunk_rows):
+        yield chunk_start // chunk_rows, max(first_row - chunk_start, 0), min(chunk_rows, num_rows - chunk_start)
+
+# Function to run generate_chunk over tasks and yield the results in task order.
+# At most workers * 2 chunks are in flight so finished rows never pile up in memory.
+# initializer(*initargs) runs once per process, for state too large to ship with every task.
+def run_sharded(generate_chunk, tasks, workers=1, initializer=None, initargs=()):
+    if PROFILER.enabled:
+        return profiled_chunks(generate_chunk, tasks, workers, initializer, initargs)
+    return sharded_chunks(generate_chunk, tasks, workers, initializer, initargs)
+
+def sharded_chunks(generate_chunk, tasks, workers, initializer, initargs):
+    if workers <= 1:
+        if initializer is not None:
+            initializer(*initargs)
+        for task in tasks:
+            yield generate_chunk(task)
+        return
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer, initargs=initargs) as pool:
+        in_flight = deque()
+        for task in tasks:
+            in_flight.append(pool.submit(generate_chunk, task))
+            if len(in_flight) >= workers * 2:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+# Function to run_sharded with profiling on in every process, adding each chunk's
+# stage totals to the profile and the time spent waiting for chunks as 'chunks'
+# (one call per chunk; the call that finds no chunk left is not counted)
+def profiled_chunks(generate_chunk, tasks, workers, initializer, initargs):
+    chunks = sharded_chunks(ProfiledTask(generate_chunk, PROFILER.specs), tasks, workers, initializer, initargs)
+    while True:
+        started = time.perf_counter()
+        try:
+            rows, stages = next(chunks)
+        except StopIteration:
+            return
+        PROFILER.merge_stages({'chunks': (1, time.perf_counter() - started)})
+        PROFILER.merge_stages(stages)
+        yield rows
+
+# Function to register the sharding options on a generator's argument parser
+def add_shard_arguments(parser):
+    parser.add_argument('--seed', type=int, default=None,
+                        help='master seed; the same seed gives the same rows for any number of workers')
+    parser.add_argument('--workers', type=int, default=1, help='number of generator processes')
@@ -3,6 +3,7 @@ import { Order } from '../types/order';
 import { Shop } from '../types/shop';
 import { generateMockData } from './mockDataService';
 import { generateRelleMallMockData } from './relleMallMockService';
+import { loadShardManifest, getShardedUsersPage, getShardedOrdersPage } from './shardedDataService';
 import { DashboardData, TrendData, ServiceData, BusyHoursData } from '../types/statistics';
 import { calculateUserStats, calculateOrderStats, generateTrendData } from '../utils/statisticsUtils';
 
@@ -21,24 +22,43 @@ let mockData = generateRelleMallMockData(mockDataConfig.userCount, mockDataConfi
 // Store shops data
 let shops = mockData.shops;
 
+// Whether a dataset exported by export_shards.py is served from public/mock-data.
+// When it is, users and orders are read from its shards (the configured counts,
+// oldest first) instead of the data generated in the browser.
+let shardedDataAvailable: Promise<boolean> | null = null;
+
+const hasShardedData = (): Promise<boolean> => {
+    if (!shardedDataAvailable) {
+        shardedDataAvailable = loadShardManifest().then(() => true, () => false);
+    }
+    return shardedDataAvailable;
+};
+
+const loadUsers = async (): Promise<User[]> => {
+    return (await hasShardedData()) ? getShardedUsersPage(0, mockDataConfig.userCount) : mockData.users;
+};
+
+const loadOrders = async (): Promise<Order[]> => {
+    return (await hasShardedData()) ? getShardedOrdersPage(0, mockDataConfig.orderCount) : mockData.orders;
+};
+
 export const fetchUserData = async (): Promise<User[]> => {
     // Simulate API call delay
     await new Promise(resolve => setTimeout(resolve, 500));
-    return mockData.users;
+    return loadUsers();
 };
 
 export const fetchOrderData = async (): Promise<Order[]> => {
     // Simulate API call delay
     await new Promise(resolve => setTimeout(resolve, 500));
-    return mockData.orders;
+    return loadOrders();
 };
 
 export const fetchDashboardData = async (): Promise<DashboardData> => {
     // Simulate API call delay
     await new Promise(resolve => setTimeout(resolve, 1000));
 
-    const users = mockData.users;
-    const orders = mockData.orders;
+    const [users, orders] = await Promise.all([loadUsers(), loadOrders()]);
 
     const userStats = calculateUserStats(users);
     const orderStats = calculateOrderStats(orders);
@@ -132,5 +152,7 @@ export const fetchShopData = async (): Promise<Shop[]> => {
 export const refreshMockData = () => {
     mockData = generateRelleMallMockData(mockDataConfig.userCount, mockDataConfig.orderCount);
     shops = mockData.shops;
+    // Look for an exported dataset again, in case one was added since
+    shardedDataAvailable = null;
     return mockData;
 };
\ No newline at end of file
@@ -0,0 +1,260 @@
+import { User } from '../types/user';
+import { Order } from '../types/order';
+
+// Lazy access to a pre-generated dataset exported by export_shards.py.
+// Only public/mock-data/manifest.json is loaded up front; shards are fetched when a
+// date range or page needs them and the most recently used ones are kept decoded.
+
+export interface ShardColumn {
+    name: string;
+    type: 'str' | 'dict' | 'int8' | 'int32' | 'float64' | 'time';
+    // Strings the codes of a dict column stand for
+    values?: string[];
+}
+
+export interface ShardInfo {
+    file: string;
+    rows: number;
+    bytes: number;
+    min_create_time: string;
+    max_create_time: string;
+    // [byte offset, byte length] of every column block (bin shards only)
+    blocks?: Record<string, [number, number]>;
+}
+
+export interface ShardTable {
+    rows: number;
+    shard_rows: number;
+    sorted_by: string;
+    columns: ShardColumn[];
+    shards: ShardInfo[];
+}
+
+export interface ShardManifest {
+    version: number;
+    format: 'json' | 'bin';
+    tables: Record<string, ShardTable>;
+}
+
+export type ShardRow = Record<string, string | number>;
+
+interface JsonShard {
+    rows: number;
+    columns: Record<string, (string | number)[]>;
+}
+
+export const CUSTOMER_TABLE = 'app_customer_info';
+export const ORDER_TABLE = 'app_service_order';
+
+const DEFAULT_BASE_URL = `${process.env.PUBLIC_URL || ''}/mock-data`;
+const MAX_CACHED_SHARDS = 32;
+
+let baseUrl = DEFAULT_BASE_URL;
+let manifestPromise: Promise<ShardManifest> | null = null;
+const shardCache = new Map<string, Promise<ShardRow[]>>();
+
+const fetchOk = async (url: string): Promise<Response> => {
+    const response = await fetch(url);
+    if (!response.ok) {
+        throw new Error(`Failed to load ${url}: ${response.status}`);
+    }
+    return response;
+};
+
+// Times are stored without a time zone; keep them as local wall-clock time
+const formatTime = (seconds: number): string => {
+    return new Date(seconds * 1000).toISOString().slice(0, 19).replace('T', ' ');
+};
+
+const toShardTime = (date: Date): string => {
+    const pad = (value: number) => String(value).padStart(2, '0');
+    return `${date.getFullYear()}-${pad(date.getMonth() + 1)}-${pad(date.getDate())} ` +
+        `${pad(date.getHours())}:${pad(date.getMinutes())}:${pad(date.getSeconds())}`;
+};
+
+const decodeBinShard = (buffer: ArrayBuffer, table: ShardTable, shard: ShardInfo): ShardRow[] => {
+    const blocks = shard.blocks || {};
+    const decoder = new TextDecoder();
+    const rows: ShardRow[] = [];
+    for (let i = 0; i < shard.rows; i++) {
+        rows.push({});
+    }
+
+    table.columns.forEach(column => {
+        const [offset, length] = blocks[column.name];
+        if (column.type === 'str') {
+            const offsets = new Uint32Array(buffer, offset, length / 4);
+            const [dataOffset, dataLength] = blocks[`${column.name}.data`];
+            const data = new Uint8Array(buffer, dataOffset, dataLength);
+            rows.forEach((row, i) => {
+                row[column.name] = decoder.decode(data.subarray(offsets[i], offsets[i + 1]));
+            });
+            return;
+        }
+        const values = column.type === 'int8' ? new Int8Array(buffer, offset, length)
+            : column.type === 'dict' ? new Uint16Array(buffer, offset, length / 2)
+            : column.type === 'int32' ? new Int32Array(buffer, offset, length / 4)
+            : column.type === 'float64' ? new Float64Array(buffer, offset, length / 8)
+            : new Uint32Array(buffer, offset, length / 4);
+        const dictionary = column.values || [];
+        rows.forEach((row, i) => {
+            row[column.name] = column.type === 'time' ? formatTime(values[i])
+                : column.type === 'dict' ? dictionary[values[i]]
+                : values[i];
+        });
+    });
+    return rows;
+};
+
+const decodeJsonShard = (shard: JsonShard, table: ShardTable): ShardRow[] => {
+    const rows: ShardRow[] = [];
+    for (let i = 0; i < shard.rows; i++) {
+        const row: ShardRow = {};
+        table.columns.forEach(column => {
+            const value = shard.columns[column.name][i];
+            row[column.name] = column.type === 'dict' ? (column.values || [])[value as number] : value;
+        });
+        rows.push(row);
+    }
+    return rows;
+};
+
+// Point the service at another dataset directory and forget everything loaded so far
+export const setShardBaseUrl = (url: string): void => {
+    baseUrl = url;
+    manifestPromise = null;
+    shardCache.clear();
+};
+
+export const loadShardManifest = (): Promise<ShardManifest> => {
+    if (!manifestPromise) {
+        manifestPromise = fetchOk(`${baseUrl}/manifest.json`).then(response => response.json());
+        manifestPromise.catch(() => {
+            manifestPromise = null;
+        });
+    }
+    return manifestPromise;
+};
+
+const getTable = async (name: string): Promise<ShardTable> => {
+    const manifest = await loadShardManifest();
+    const table = manifest.tables[name];
+    if (!table) {
+        throw new Error(`The shard manifest has no ${name} table`);
+    }
+    return table;
+};
+
+export const fetchShard = async (tableName: string, index: number): Promise<ShardRow[]> => {
+    const manifest = await loadShardManifest();
+    const table = await getTable(tableName);
+    const shard = table.shards[index];
+    const cached = shardCache.get(shard.file);
+    if (cached) {
+        // Move to the end so the least recently used shard is evicted first
+        shardCache.delete(shard.file);
+        shardCache.set(shard.file, cached);
+        return cached;
+    }
+
+    const url = `${baseUrl}/${shard.file}`;
+    const rows = manifest.format === 'bin'
+        ? fetchOk(url).then(response => response.arrayBuffer()).then(buffer => decodeBinShard(buffer, table, shard))
+        : fetchOk(url).then(response => response.json()).then(json => decodeJsonShard(json, table));
+    shardCache.set(shard.file, rows);
+    rows.catch(() => shardCache.delete(shard.file));
+    if (shardCache.size > MAX_CACHED_SHARDS) {
+        shardCache.delete(shardCache.keys().next().value as string);
+    }
+    return rows;
+};
+
+// Rows with startDate <= create_time <= endDate; only the shards overlapping the range are fetched
+export const fetchRowsByDateRange = async (tableName: string, startDate: Date, endDate: Date): Promise<ShardRow[]> => {
+    const table = await getTable(tableName);
+    const start = toShardTime(startDate);
+    const end = toShardTime(endDate);
+    const indexes: number[] = [];
+    table.shards.forEach((shard, index) => {
+        if (shard.max_create_time >= start && shard.min_create_time <= end) {
+            indexes.push(index);
+        }
+    });
+
+    const shards = await Promise.all(indexes.map(index => fetchShard(tableName, index)));
+    const rows: ShardRow[] = [];
+    shards.forEach(shardRows => {
+        shardRows.forEach(row => {
+            const createTime = row.create_time as string;
+            if (createTime >= start && createTime <= end) {
+                rows.push(row);
+            }
+        });
+    });
+    return rows;
+};
+
+// One page of rows in create_time order (page 0 is the oldest)
+export const fetchRowsPage = async (tableName: string, page: number, pageSize: number): Promise<ShardRow[]> => {
+    const table = await getTable(tableName);
+    const first = page * pageSize;
+    const last = Math.min(first + pageSize, table.rows);
+    const rows: ShardRow[] = [];
+    let shardStart = 0;
+    for (let index = 0; index < table.shards.length && shardStart < last; index++) {
+        const shardRows = table.shards[index].rows;
+        if (shardStart + shardRows > first) {
+            const loaded = await fetchShard(tableName, index);
+            rows.push(...loaded.slice(Math.max(first - shardStart, 0), last - shardStart));
+        }
+        shardStart += shardRows;
+    }
+    return rows;
+};
+
+// order_status: 2 booked, 4 signed in, 16 written off, 1024 closed by AutoCloseOrderJob
+const orderStatus = (status: number): Order['status'] => {
+    if (status === 4 || status === 16) {
+        return 'completed';
+    }
+    return status === 1024 ? 'canceled' : 'pending';
+};
+
+export const shardRowToUser = (row: ShardRow): User => {
+    const createdAt = (row.create_time as string).replace(' ', 'T');
+    const updatedAt = (row.update_time as string).replace(' ', 'T');
+    return {
+        id: row.customer_id as string,
+        name: (row.user_name || row.wechat_nickname) as string,
+        phone: row.wechat_phone as string,
+        createdAt,
+        updatedAt,
+        lastVisit: updatedAt,
+        unionid: row.unionid as string,
+        gender: row.user_gender as number,
+        birthdate: row.user_birthdate as string
+    };
+};
+
+export const shardRowToOrder = (row: ShardRow): Order => {
+    return {
+        id: row.order_id as string,
+        userId: row.unionid as string,
+        customerName: row.contact_name as string,
+        totalAmount: row.order_amount as number,
+        orderDate: (row.create_time as string).replace(' ', 'T'),
+        status: orderStatus(row.order_status as number)
+    };
+};
+
+export const getShardedOrdersByDateRange = async (startDate: Date, endDate: Date): Promise<Order[]> => {
+    return (await fetchRowsByDateRange(ORDER_TABLE, startDate, endDate)).map(shardRowToOrder);
+};
+
+export const getShardedOrdersPage = async (page: number, pageSize: number = 50): Promise<Order[]> => {
+    return (await fetchRowsPage(ORDER_TABLE, page, pageSize)).map(shardRowToOrder);
+};
+
+export const getShardedUsersPage = async (page: number, pageSize: number = 50): Promise<User[]> => {
+    return (await fetchRowsPage(CUSTOMER_TABLE, page, pageSize)).map(shardRowToUser);
+};
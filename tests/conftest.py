@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# The generators are top-level scripts in the repository root
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Rows for the tests marked scale, e.g. MOCK_SCALE_ROWS=50000000 python -m pytest -m scale;
+# without it they are skipped so the default run stays fast
+SCALE_ROWS = os.environ.get('MOCK_SCALE_ROWS')
+
+def pytest_configure(config):
+    config.addinivalue_line('markers', 'scale: slow end-to-end runs at MOCK_SCALE_ROWS rows')
+
+def pytest_collection_modifyitems(config, items):
+    if SCALE_ROWS:
+        return
+    skip = pytest.mark.skip(reason='set MOCK_SCALE_ROWS to run the scale tests')
+    for item in items:
+        if 'scale' in item.keywords:
+            item.add_marker(skip)
+
+@pytest.fixture
+def scale_rows():
+    return int(SCALE_ROWS)
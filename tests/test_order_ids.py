@@ -0,0 +1,43 @@
+import random
+
+import pytest
+
+from mock_schema import ORDER_ID_MAX_LENGTH, STORE_IDS
+from order_ids import SEQUENCE_DIGITS, make_order_id
+
+CREATE_TIME = '2023-11-11 20:15:09'
+
+# store_id + yymmddHHMMSS
+PREFIX_LENGTH = len(STORE_IDS[0]) + 12
+
+def test_layout():
+    assert make_order_id('SH0002', CREATE_TIME, 42) == 'SH0002231111201509000042'
+
+def test_width_at_the_end_of_the_zero_padding():
+    widths = {sequence: len(make_order_id('SH0001', CREATE_TIME, sequence))
+              for sequence in (1, 999999, 1000000, 9999999, 10000000)}
+    assert widths == {1: 24, 999999: 24, 1000000: 25, 9999999: 25, 10000000: 26}
+    assert make_order_id('SH0001', CREATE_TIME, 1000000).endswith('1000000')
+
+def test_fits_the_order_id_column():
+    # 14 digits of sequence, far beyond any id a load reaches
+    assert len(make_order_id('SH0001', CREATE_TIME, 10 ** 14 - 1)) <= ORDER_ID_MAX_LENGTH
+
+# Ids on both sides of the padding boundary, with the same and with different prefixes
+@pytest.mark.parametrize('same_prefix', [True, False])
+def test_distinct_ids_give_distinct_order_ids(same_prefix):
+    rng = random.Random(7)
+    ids = list(range(1, 2000)) + list(range(10 ** SEQUENCE_DIGITS - 2000, 10 ** SEQUENCE_DIGITS + 2000))
+    order_ids = []
+    for sequence in ids:
+        store_id = STORE_IDS[0] if same_prefix else rng.choice(STORE_IDS)
+        create_time = CREATE_TIME if same_prefix else f"2023-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 10:00:00"
+        order_ids.append(make_order_id(store_id, create_time, sequence))
+    assert len(set(order_ids)) == len(ids)
+    # The prefix is fixed width, so the sequence reads back as the id
+    assert [int(order_id[PREFIX_LENGTH:]) for order_id in order_ids] == ids
+
+@pytest.mark.scale
+def test_ten_million_order_ids_are_unique():
+    order_ids = {make_order_id(STORE_IDS[j % 3], CREATE_TIME, j) for j in range(1, 10 ** 7 + 1)}
+    assert len(order_ids) == 10 ** 7
@@ -0,0 +1,18 @@
+import argparse
+
+import pytest
+
+import benchmark_suite
+
+# Peak RSS in MB a streamed run may reach however many rows it generates
+RSS_CEILING_MB = 150
+
+# Generation streams through bounded queues (mock_pipeline.py), so even 50M orders
+# stay under the ceiling
+@pytest.mark.scale
+def test_orders_stay_under_rss_ceiling(tmp_path, scale_rows):
+    args = argparse.Namespace(seed=benchmark_suite.SEED, workers=1, sink='null')
+    report = benchmark_suite.run_case('orders', scale_rows, args, str(tmp_path))
+    assert report['rows'] == scale_rows
+    assert report['peak_rss_mb'] < RSS_CEILING_MB
+    assert report['peak_worker_rss_mb'] < RSS_CEILING_MB
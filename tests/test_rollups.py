@@ -0,0 +1,30 @@
+from generate_service_order_data import generate_order_chunk, init_order_worker
+from mock_schema import ORDER_TABLE
+from order_rollups import OrderRollups
+
+def active_days(rows):
+    rollups = OrderRollups()
+    rollups.add_rows(ORDER_TABLE, rows)
+    return {(unionid, month): (days, bits)
+            for unionid, month, days, bits in rollups.tables()['customer_month_active_days']}
+
+def test_day_bits_hold_the_active_days():
+    init_order_worker(['ojqzL0000000000000000000001', 'ojqzL0000000000000000000002'], None)
+    for days, bits in active_days(generate_order_chunk((5, 0, 0, 3000))).values():
+        assert 0 < bits < 1 << 31
+        assert bin(bits).count('1') == days
+
+# Two runs with orders on the same days merge (as the upsert does) into the rollup of one run,
+# where adding their active_days would count the shared days twice
+def test_runs_sharing_days_merge_to_the_active_days_of_one_run():
+    init_order_worker(['ojqzL0000000000000000000001'], None)
+    rows = generate_order_chunk((5, 0, 0, 3000))
+    first, second = active_days(rows[::2]), active_days(rows[1::2])
+    merged = dict(first)
+    for key, (_, bits) in second.items():
+        stored = merged.get(key, (0, 0))[1]
+        merged[key] = (bin(stored | bits).count('1'), stored | bits)
+    whole = active_days(rows)
+    assert merged == whole
+    added = sum(days for days, _ in first.values()) + sum(days for days, _ in second.values())
+    assert added > sum(days for days, _ in whole.values())
@@ -0,0 +1,93 @@
+import sqlite3
+import sys
+
+import pytest
+
+import generate_service_order_data
+from generate_mock_data import generate_customer_chunk
+from generate_service_order_data import generate_order_chunk, init_order_worker
+from mock_loader import PROGRESS_TABLE, DbSink, SqlFileSink, TsvSink, read_rows
+from mock_schema import CUSTOMER_COLUMNS, CUSTOMER_TABLE, ORDER_COLUMNS, ORDER_TABLE
+
+@pytest.fixture
+def order_rows():
+    init_order_worker(['ojqzL0000000000000000000001'], None)
+    return generate_order_chunk((5, 0, 0, 25))
+
+# The ';' closing an INSERT is not a value of the statement's last row
+def test_sql_rows_read_back_with_every_column(tmp_path, order_rows):
+    path = str(tmp_path / 'orders.sql')
+    with SqlFileSink(path, ORDER_TABLE, ORDER_COLUMNS) as sink:
+        for start in range(0, len(order_rows), 10):
+            sink.write_batch(order_rows[start:start + 10])
+    read_back = list(read_rows(path))
+    assert [len(row) for row in read_back] == [len(ORDER_COLUMNS)] * len(order_rows)
+    assert [row[0] for row in read_back] == [str(row[0]) for row in order_rows]
+    assert [row[-1] for row in read_back] == [row[-1] for row in order_rows]
+
+# Values that break naive quoting: quotes, backslashes (also right before a quote or
+# at the end), control characters, SQL and TSV syntax, and multi-codepoint emoji
+ADVERSARIAL_VALUES = [
+    "O'Brien", "''", "\\", "end\\", "\\'", "\\\\'", '"quoted"', "a\nb", "a\r\nb", "tab\there",
+    "nul\0byte", "ctrl-z\x1a", "back\bspace", "'); DROP TABLE app_customer_info; --", "NULL", "\\N", "(1, 2)",
+    ", ,", "semi;colon", "❤️小可爱❤️", "👩‍👩‍👧", "🇨🇳", "1️⃣", "", " ",
+]
+
+# Function to render a value the way read_rows returns it
+def as_read(value):
+    if value is None:
+        return None
+    return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+@pytest.mark.parametrize('sink_type, name', [(SqlFileSink, 'customers.sql'), (SqlFileSink, 'customers.sql.gz'),
+                                             (TsvSink, 'customers.tsv'), (TsvSink, 'customers.tsv.gz')])
+def test_adversarial_values_round_trip(tmp_path, sink_type, name):
+    nickname = CUSTOMER_COLUMNS.index('wechat_nickname')
+    user_name = CUSTOMER_COLUMNS.index('user_name')
+    rows = generate_customer_chunk((5, 0, 0, len(ADVERSARIAL_VALUES), False))
+    rows = [row[:nickname] + (value,) + row[nickname + 1:user_name] + (value[::-1],) + row[user_name + 1:]
+            for row, value in zip(rows, ADVERSARIAL_VALUES)]
+    path = str(tmp_path / name)
+    with sink_type(path, CUSTOMER_TABLE, CUSTOMER_COLUMNS) as sink:
+        sink.write_batch(rows[:10])
+        sink.write_batch(rows[10:])
+    assert list(read_rows(path)) == [[as_read(value) for value in row] for row in rows]
+
+# Function to run generate_service_order_data.py into the SQLite db at path
+def load_orders(monkeypatch, path, records, *options):
+    monkeypatch.setattr(sys, 'argv', ['generate_service_order_data.py', '--records', str(records), '--seed', '5',
+                                      '--sink', 'db', '--db-url', f"sqlite:///{path}", '--batch-size', '1000',
+                                      '--commit-batches', '3', *options])
+    generate_service_order_data.main()
+
+def test_db_load_resumes_after_the_last_committed_batch(tmp_path, monkeypatch):
+    records = 25000
+    path = tmp_path / 'resumed.db'
+    write_batch = DbSink.write_batch
+
+    # The 8th batch fails, so batches 7 and 8 are rolled back and 6000 rows stay committed
+    def failing_write_batch(sink, rows):
+        if sink.written_rows == 7000:
+            raise RuntimeError('connection lost')
+        write_batch(sink, rows)
+    with monkeypatch.context() as patch:
+        patch.setattr(DbSink, 'write_batch', failing_write_batch)
+        with pytest.raises(RuntimeError):
+            load_orders(patch, path, records, '--job', 'nightly')
+    with sqlite3.connect(path) as connection:
+        assert connection.execute(f"SELECT COUNT(*) FROM {ORDER_TABLE}").fetchone() == (6000,)
+
+    # The same --job resumes after the committed rows, and gives the rows of an uninterrupted load
+    load_orders(monkeypatch, path, records, '--job', 'nightly')
+    load_orders(monkeypatch, tmp_path / 'clean.db', records)
+    with sqlite3.connect(path) as connection:
+        count, first, last, distinct = connection.execute(
+            f"SELECT COUNT(*), MIN(id), MAX(id), COUNT(DISTINCT id) FROM {ORDER_TABLE}").fetchone()
+        assert count == distinct == records
+        assert last - first + 1 == records
+        progress = connection.execute(f"SELECT committed_rows FROM {PROGRESS_TABLE} WHERE job = ?",
+                                      (f"nightly:{ORDER_TABLE}",)).fetchone()
+        assert progress == (records,)
+        resumed = connection.execute(f"SELECT * FROM {ORDER_TABLE} ORDER BY id").fetchall()
+    with sqlite3.connect(tmp_path / 'clean.db') as connection:
+        assert resumed == connection.execute(f"SELECT * FROM {ORDER_TABLE} ORDER BY id").fetchall()
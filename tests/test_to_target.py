@@ -0,0 +1,75 @@
+import json
+import sqlite3
+import sys
+
+import pytest
+
+import generate_to_target
+from generate_to_target import read_snapshot
+from mock_loader import DbSink, ensure_sqlite_table
+from mock_schema import CUSTOMER_COLUMNS, CUSTOMER_TABLE, ORDER_COLUMNS, ORDER_TABLE
+
+TARGET = {
+    'customers': 4000,
+    'orders': 10000,
+    'frequent_users_by_month': {'2023-02': 40, '2023-05': 60},
+    'revenue': 654321.09,
+}
+
+@pytest.fixture
+def target(tmp_path, monkeypatch):
+    # Jobs keep their snapshot in the working directory
+    monkeypatch.chdir(tmp_path)
+    path = tmp_path / 'target.json'
+    path.write_text(json.dumps(TARGET))
+    return path
+
+def empty_database(path):
+    with sqlite3.connect(path) as connection:
+        ensure_sqlite_table(connection, CUSTOMER_TABLE, CUSTOMER_COLUMNS)
+        ensure_sqlite_table(connection, ORDER_TABLE, ORDER_COLUMNS)
+    return f"sqlite:///{path}"
+
+def load_target(monkeypatch, target, url):
+    monkeypatch.setattr(sys, 'argv', ['generate_to_target.py', str(target), '--snapshot', url, '--seed', '3',
+                                      '--sink', 'db', '--db-url', url, '--batch-size', '1000',
+                                      '--commit-batches', '2'])
+    generate_to_target.main()
+
+def table_rows(path, table):
+    with sqlite3.connect(path) as connection:
+        return connection.execute(f"SELECT * FROM {table} ORDER BY rowid").fetchall()
+
+def test_load_reaches_frequent_users_per_month(tmp_path, monkeypatch, target):
+    url = empty_database(tmp_path / 'mall.db')
+    load_target(monkeypatch, target, url)
+    snapshot = read_snapshot(url)
+    assert (snapshot['customers'], snapshot['orders'], snapshot['revenue']) == (4000, 10000, 654321.09)
+    assert snapshot['frequent_users_by_month'] == TARGET['frequent_users_by_month']
+    assert snapshot['frequent_users'] == 100
+
+# An interrupted load continues from the snapshot it started from, not from one that
+# includes its own committed rows, and writes the rows of an uninterrupted load
+def test_interrupted_load_resumes_with_the_same_target_and_seed(tmp_path, monkeypatch, target):
+    url = empty_database(tmp_path / 'resumed.db')
+    write_batch = DbSink.write_batch
+
+    def failing_write_batch(sink, rows):
+        if sink.job.endswith(ORDER_TABLE) and sink.written_rows >= 5000:
+            raise RuntimeError('connection lost')
+        write_batch(sink, rows)
+    with monkeypatch.context() as patch:
+        patch.setattr(DbSink, 'write_batch', failing_write_batch)
+        with pytest.raises(RuntimeError):
+            load_target(patch, target, url)
+    committed = len(table_rows(tmp_path / 'resumed.db', ORDER_TABLE))
+    assert 0 < committed < TARGET['orders']
+
+    load_target(monkeypatch, target, url)
+    # Once the load is complete, running it again writes nothing
+    load_target(monkeypatch, target, url)
+    load_target(monkeypatch, target, empty_database(tmp_path / 'clean.db'))
+    for table in (CUSTOMER_TABLE, ORDER_TABLE):
+        assert table_rows(tmp_path / 'resumed.db', table) == table_rows(tmp_path / 'clean.db', table)
+    order_ids = [row[0] for row in table_rows(tmp_path / 'resumed.db', ORDER_TABLE)]
+    assert order_ids == list(range(1, TARGET['orders'] + 1))
@@ -0,0 +1,154 @@
+import argparse
+import os
+import random
+
+from mock_loader import read_rows
+from mock_schema import CUSTOMER_COLUMNS, ORDER_COLUMNS
+from sql_encoder import plain_path
+
+# Uniqueness guard for generated keys (--guard), across runs and against existing data.
+# Every kind of key (phone, unionid, mini_openid, order_id) has a Bloom filter:
+# a key is hashed to k of m bits, which adding it sets, so a key whose bits are all
+# set has probably been seen. There are no false negatives, and the false positive
+# rate stays near the target until more than `capacity` keys are added; at 1e-6 a
+# filter takes 28.8 bits (3.6 MB) per million keys against about 100 bytes per key
+# for a Python set of the strings. Keys are checked a chunk at a time with numpy
+# (bloom_filter.py, imported only when a guard is used).
+# The filters live in one .npz file, seeded from a dump of the keys already in
+# relle_mall_release (python uniqueness_guard.py guard.npz --phones phones.txt ...)
+# and updated by every generator run that uses it.
+# A generator redraws a customer key that was seen before from a generator seeded
+# by the key itself, so output stays deterministic for a given guard file; order_ids
+# are built from the row id and cannot be redrawn, so probable repeats are counted
+# and reported instead (usually a sign that --starting ids overlap existing rows).
+
+DEFAULT_CAPACITY = 10000000
+DEFAULT_FP_RATE = 1e-6
+
+# Kinds of keys, with the column they are read from in generated .sql/.tsv files
+KINDS = {
+    'phone': (CUSTOMER_COLUMNS, 'wechat_phone'),
+    'unionid': (CUSTOMER_COLUMNS, 'unionid'),
+    'mini_openid': (CUSTOMER_COLUMNS, 'mini_openid'),
+    'order_id': (ORDER_COLUMNS, 'order_id'),
+}
+
+# Bloom filters for every kind of key, kept in one .npz file
+class UniquenessGuard:
+    def __init__(self, filters):
+        self.filters = filters
+        # Keys redrawn (or, for order_ids, reported) by this run
+        self.repeats = dict.fromkeys(filters, 0)
+
+    # Function to start a guard with empty filters sized for capacity keys per kind
+    @classmethod
+    def create(cls, capacity=DEFAULT_CAPACITY, fp_rate=DEFAULT_FP_RATE):
+        from bloom_filter import BloomFilter
+        return cls({kind: BloomFilter(capacity, fp_rate) for kind in KINDS})
+
+    @classmethod
+    def load(cls, path):
+        from bloom_filter import load_filters
+        return cls(load_filters(path))
+
+    def save(self, path):
+        from bloom_filter import save_filters
+        save_filters(path, self.filters)
+
+    # Function to add keys of kind and return the mask of new ones
+    def add_new(self, kind, keys):
+        return self.filters[kind].add_new(keys)
+
+    # Function to print keys, memory and false positive rate per kind
+    def report(self):
+        for kind, bloom in self.filters.items():
+            print(f"{kind:<12} {bloom.count:>12,} keys {bloom.bits.nbytes / 1e6:>8.1f} MB  k={bloom.k:<3} "
+                  f"fp rate ~{bloom.estimated_fp_rate():.1e}  repeats this run {self.repeats[kind]:,}"
+                  + ('  (over capacity)' if bloom.count > bloom.capacity else ''))
+
+# Function to redraw a key from a generator seeded by the key and attempt, so reruns redraw the same way
+def redraw(key, attempt, draw):
+    return draw(random.Random(f"{key}:{attempt}"))
+
+# Function to make the pipeline stage that keeps the keys of row lists unique.
+# columns are (kind, position, draw) triples; draw(rng) makes a replacement key, or is
+# None for keys that are only reported. A replaced key is replaced in every field of the
+# row holding it, e.g. create_by/update_by of a customer are its unionid.
+def unique_rows(guard, columns):
+    def stage(chunks):
+        for rows in chunks:
+            for kind, position, draw in columns:
+                # Empty fields (no phone) are not keys
+                indexes = [i for i, row in enumerate(rows) if row[position]]
+                new = guard.add_new(kind, [rows[i][position] for i in indexes])
+                for i in (i for i, is_new in enumerate(new) if not is_new):
+                    guard.repeats[kind] += 1
+                    if draw is None:
+                        continue
+                    row = rows[indexes[i]]
+                    old = row[position]
+                    attempt = 0
+                    while True:
+                        key = redraw(old, attempt, draw)
+                        if guard.add_new(kind, [key])[0]:
+                            break
+                        attempt += 1
+                    rows[indexes[i]] = tuple(key if value == old else value for value in row)
+            yield rows
+    return stage
+
+# Function to register the guard options on a generator's argument parser
+def add_guard_arguments(parser):
+    parser.add_argument('--guard', help='.npz uniqueness guard to check generated keys against and update '
+                                        '(created if missing, see uniqueness_guard.py)')
+    parser.add_argument('--guard-capacity', type=int, default=DEFAULT_CAPACITY,
+                        help='keys per kind a new guard is sized for')
+    parser.add_argument('--guard-fp-rate', type=float, default=DEFAULT_FP_RATE,
+                        help='false positive rate of a new guard at capacity')
+
+# Function to load the --guard file, or start a new one; None without --guard
+def open_guard(args):
+    if not args.guard:
+        return None
+    if os.path.exists(args.guard):
+        return UniquenessGuard.load(args.guard)
+    return UniquenessGuard.create(args.guard_capacity, args.guard_fp_rate)
+
+# Function to save the guard after a run and print what it caught
+def close_guard(args, guard):
+    if guard is None:
+        return
+    guard.save(args.guard)
+    guard.report()
+
+# Function to read the keys of kind from a dump: one key per line, or a generated .sql/.tsv file
+def read_keys(path, kind):
+    if plain_path(path).endswith(('.sql', '.tsv')):
+        columns, column = KINDS[kind]
+        return (row[0] for row in read_rows(path, [columns.index(column)]) if row[0])
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip()]
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Create or extend a uniqueness guard from dumps of existing keys, e.g. '
+                                                 'mysql -N -e "SELECT wechat_phone FROM app_customer_info" > phones.txt')
+    parser.add_argument('guard', help='.npz guard file to create or extend')
+    for kind in KINDS:
+        parser.add_argument(f"--{kind.replace('_', '-')}s", dest=kind, nargs='*', default=[],
+                            help=f"files with {kind}s: one per line, or generated .sql/.tsv files")
+    parser.add_argument('--capacity', type=int, default=DEFAULT_CAPACITY, help='keys per kind of a new guard')
+    parser.add_argument('--fp-rate', type=float, default=DEFAULT_FP_RATE, help='false positive rate of a new guard')
+    args = parser.parse_args()
+
+    guard = (UniquenessGuard.load(args.guard) if os.path.exists(args.guard)
+             else UniquenessGuard.create(args.capacity, args.fp_rate))
+    for kind in KINDS:
+        for path in getattr(args, kind):
+            keys = iter(read_keys(path, kind))
+            while True:
+                block = [key for _, key in zip(range(100000), keys)]
+                if not block:
+                    break
+                guard.repeats[kind] += int((~guard.add_new(kind, block)).sum())
+    guard.save(args.guard)
+    guard.report()